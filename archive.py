@@ -0,0 +1,87 @@
+"""PDF以外的归档格式：MHTML快照和内联图片的单文件HTML
+
+只需要离线副本时，直接截取已加载的页面，省去最耗CPU的 Page.printToPDF；
+需要PDF时可以之后用 main.py --to-pdf 在单独的批处理中打印保存的快照。
+"""
+import base64
+import hashlib
+import os
+
+FORMATS = ("pdf", "mhtml", "html", "both")
+
+# 每种 --format 依次保存的文件类型。快照先于PDF截取，
+# 正文打印模式替换页面后截取到的就不再是原页面
+OUTPUTS = {
+    "pdf": ("pdf",),
+    "mhtml": ("mhtml",),
+    "html": ("html",),
+    "both": ("mhtml", "pdf"),
+}
+CAPTURE_KINDS = ("mhtml", "html")  # 可由 --to-pdf 转换的快照类型，按优先顺序
+
+INLINE_TYPES = ("Image", "Stylesheet")  # 单文件HTML中内联的资源类型
+MAX_INLINE_BYTES = 8 << 20  # 超过该大小的资源保留原地址
+
+
+def primary_kind(output_format):
+    """缓存和爬取状态中记录的文件类型：包含PDF时为PDF"""
+    kinds = OUTPUTS[output_format]
+    return "pdf" if "pdf" in kinds else kinds[0]
+
+
+def inline_targets(resource_tree):
+    """从 Page.getResourceTree 的结果中取出主框架已加载的图片和样式表，返回 [(frameId, 资源)]"""
+    tree = resource_tree["frameTree"]
+    frame_id = tree["frame"]["id"]
+    return [(frame_id, resource) for resource in tree.get("resources", ())
+            if resource.get("type") in INLINE_TYPES and resource["url"].startswith(("http:", "https:"))
+            and not resource.get("failed") and not resource.get("canceled")
+            and resource.get("contentSize", 0) <= MAX_INLINE_BYTES]
+
+
+def add_inline(images, styles, resource, content):
+    """将 Page.getResourceContent 的结果加入内联表：图片转为 data URI，样式表保留CSS文本"""
+    body = content.get("content")
+    if not body:
+        return
+    if resource["type"] == "Stylesheet":
+        if content.get("base64Encoded"):
+            body = base64.b64decode(body).decode("utf-8", "replace")
+        styles[resource["url"]] = body
+        return
+    if not content.get("base64Encoded"):
+        body = base64.b64encode(body.encode("utf-8")).decode("ascii")  # 例如SVG
+    mime = resource.get("mimeType") or "application/octet-stream"
+    images[resource["url"]] = f"data:{mime};base64,{body}"
+
+
+def write_capture(path, text):
+    """写入临时文件后原子重命名，返回 (内容哈希, 字节数)"""
+    data = text.encode("utf-8")
+    tmp_path = path + ".part"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return hashlib.sha256(data).hexdigest(), len(data)
+
+
+def pending_captures(root):
+    """列出 root 下还没有同名PDF的快照；同一篇文章同时有MHTML和HTML时只取MHTML"""
+    captures = []
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(name for name in dirs if not name.startswith("."))
+        names = set(files)
+        stems = {}
+        for name in sorted(files):
+            stem, ext = os.path.splitext(name)
+            kind = ext[1:].lower()
+            if kind not in CAPTURE_KINDS or f"{stem}.pdf" in names:
+                continue
+            if stem not in stems or CAPTURE_KINDS.index(kind) < CAPTURE_KINDS.index(stems[stem][0]):
+                stems[stem] = (kind, os.path.join(directory, name))
+        captures.extend(path for _, path in stems.values())
+    return captures
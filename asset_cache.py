@@ -0,0 +1,140 @@
+"""跨浏览器实例和多次运行共享的静态资源缓存（图片、二维码、表情、CSS等）
+
+使用Chrome自身的HTTP磁盘缓存：每个浏览器进程占用一个槽位目录（--disk-cache-dir），
+Chrome同时打开同一个缓存目录会互相破坏，所以并行的浏览器各用一个槽位，
+槽位在多次运行之间复用。每个槽位的容量由 --disk-cache-size 限制，由Chrome按LRU淘汰条目；
+总容量超限时按最近使用时间淘汰整个空闲槽位。
+"""
+import os
+import shutil
+import socket
+import threading
+import time
+
+LOCK_FILE = ".lock"
+HOSTNAME = socket.gethostname()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _lock_held(lock_path):
+    """锁文件内容为 "主机名:pid"。只有本机写入且进程已退出的锁才视为失效，
+    缓存目录放在共享存储上时，其他主机的锁无法在本机检查，一律视为有效"""
+    try:
+        with open(lock_path) as f:
+            owner = f.read().strip()
+    except OSError:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host and host != HOSTNAME:
+        return True
+    try:
+        pid = int(pid or 0)
+    except ValueError:
+        return False
+    return bool(pid) and _pid_alive(pid)
+
+
+def dir_size(path):
+    """目录下所有文件的字节数"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class AssetCache:
+    """管理缓存根目录下的 slot-N 槽位目录"""
+
+    def __init__(self, root, max_bytes=1 << 30, slots=1):
+        self.root = os.path.abspath(root)  # Chrome 的 --disk-cache-dir 需要绝对路径
+        self.max_bytes = max_bytes
+        self.slots = max(1, slots)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def slot_bytes(self):
+        """每个槽位的容量上限"""
+        return max(self.max_bytes // self.slots, 1 << 20)
+
+    def _slot_dirs(self):
+        names = [name for name in os.listdir(self.root) if name.startswith("slot-")]
+        return [os.path.join(self.root, name) for name in sorted(names, key=lambda n: int(n[5:]))]
+
+    def _try_lock(self, slot_dir):
+        lock_path = os.path.join(slot_dir, LOCK_FILE)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if _lock_held(lock_path):
+                return False
+            # 上次运行异常退出留下的锁
+            os.remove(lock_path)
+            return self._try_lock(slot_dir)
+        with os.fdopen(fd, "w") as f:
+            f.write(f"{HOSTNAME}:{os.getpid()}")
+        return True
+
+    def _in_use(self, slot_dir):
+        return _lock_held(os.path.join(slot_dir, LOCK_FILE))
+
+    def acquire(self):
+        """占用一个空闲槽位并返回其目录，同一进程的多个浏览器各得到不同的槽位"""
+        with self._lock:
+            slot_dirs = self._slot_dirs()
+            for slot_dir in slot_dirs:
+                if self._try_lock(slot_dir):
+                    return slot_dir
+            index = len(slot_dirs)
+            while True:
+                slot_dir = os.path.join(self.root, f"slot-{index}")
+                os.makedirs(slot_dir, exist_ok=True)
+                if self._try_lock(slot_dir):
+                    return slot_dir
+                index += 1
+
+    def release(self, slot_dir):
+        """释放槽位，目录的修改时间记录为最近使用时间"""
+        try:
+            os.remove(os.path.join(slot_dir, LOCK_FILE))
+            now = time.time()
+            os.utime(slot_dir, (now, now))
+        except OSError:
+            pass
+
+    def chrome_args(self, slot_dir):
+        """使用该槽位作为HTTP磁盘缓存的Chrome启动参数"""
+        return [f"--disk-cache-dir={slot_dir}", f"--disk-cache-size={self.slot_bytes}"]
+
+    def size(self):
+        return dir_size(self.root)
+
+    def prune(self, max_bytes=None):
+        """总大小超过上限时，按最近使用时间从旧到新删除空闲槽位。返回 (删除槽位数, 释放字节数)"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            sizes = {slot_dir: dir_size(slot_dir) for slot_dir in self._slot_dirs()}
+            total = sum(sizes.values())
+            removed, freed = 0, 0
+            idle = [slot_dir for slot_dir in sizes if not self._in_use(slot_dir)]
+            for slot_dir in sorted(idle, key=os.path.getmtime):
+                if total <= max_bytes:
+                    break
+                shutil.rmtree(slot_dir, ignore_errors=True)
+                total -= sizes[slot_dir]
+                freed += sizes[slot_dir]
+                removed += 1
+            return removed, freed
@@ -0,0 +1,208 @@
+"""离线爬取基准：用无头Chrome爬取本地合成站点，报告吞吐量、单页延迟和内存峰值
+
+用法:
+    python benchmarks/crawl_bench.py                  # 默认 4 叉、3 层的站点
+    python benchmarks/crawl_bench.py -f 5 -d 2 -w 4   # 4 个浏览器并行
+    python benchmarks/crawl_bench.py -- -p -S         # -- 之后的参数原样传给 WebCrawler 对应选项
+    python benchmarks/crawl_bench.py -- -P light      # 与默认的 full 对比吞吐量
+    python benchmarks/crawl_bench.py -- -W 1          # PDF在写入线程中写盘，与默认的直接写盘对比
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import ParallelCrawler, WebCrawler  # noqa: E402
+from metrics import Instrumentation, percentile  # noqa: E402
+from pipeline import PdfWriter  # noqa: E402
+from render_profile import PROFILES  # noqa: E402
+from wechat_site import BenchmarkSite, SiteConfig  # noqa: E402
+
+
+class RssSampler:
+    """周期性统计当前进程及其全部子进程（chromedriver、Chrome）的常驻内存之和"""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _children():
+        children = {}
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(pid))
+        return children
+
+    def _tree_rss(self):
+        children = self._children()
+        pending, total = [os.getpid()], 0
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        while pending:
+            pid = pending.pop()
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * page_size
+            except (OSError, IndexError, ValueError):
+                pass
+            pending.extend(children.get(pid, ()))
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._tree_rss())
+
+    def start(self):
+        if os.path.isdir("/proc"):
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if not self.peak:
+            # 没有 /proc 时只能取得本进程的峰值
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return self.peak
+
+
+def timed(crawler, latencies):
+    """记录每次 process_page 的耗时"""
+    process_page = crawler.process_page
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return process_page(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    crawler.process_page = wrapper
+
+
+def run(args, crawler_options):
+    config = SiteConfig(fanout=args.fanout, depth=args.depth, images=args.images,
+                        image_latency=args.image_latency, page_latency=args.page_latency,
+                        widget_latency=args.widget_latency)
+    latencies = []
+    with BenchmarkSite(config) as site, tempfile.TemporaryDirectory() as out:
+        metrics = Instrumentation(args.metrics)
+        writers = crawler_options.pop("writers", 0)
+        writer = None
+        if writers and not crawler_options["stream_pdf"]:
+            writer = PdfWriter(workers=writers, browsers=args.workers)
+        kwargs = dict(max_depth=args.depth, delay=args.delay, metrics=metrics,
+                      cache=None, writer=writer, **crawler_options)
+        seeds = [site.url(0)]
+
+        sampler = RssSampler().start()
+        start = time.perf_counter()
+        if args.workers > 1:
+            crawler = ParallelCrawler(workers=args.workers, **kwargs)
+            for worker in crawler.workers:
+                timed(worker, latencies)
+            try:
+                crawler.run(seeds, parent_dir=out)
+            finally:
+                crawler.close()
+        else:
+            crawler = WebCrawler(**kwargs)
+            timed(crawler, latencies)
+            try:
+                for url in seeds:
+                    crawler.crawl_page(url, 0, out)
+            finally:
+                crawler.close()
+        if writer:
+            writer.close()
+        elapsed = time.perf_counter() - start
+        peak = sampler.stop()
+
+        pdfs = sum(1 for _, _, files in os.walk(out) for name in files if name.endswith(".pdf"))
+        metrics.close()
+
+    latencies.sort()
+    return {
+        "articles": config.article_count,
+        "workers": args.workers,
+        "pages": len(latencies),
+        "pdfs": pdfs,
+        "elapsed": round(elapsed, 2),
+        "pages_per_sec": round(len(latencies) / elapsed, 3) if elapsed else 0,
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+        "latency_max": round(latencies[-1], 3) if latencies else 0,
+        "peak_rss_mb": round(peak / 1048576, 1),
+        "stages": metrics.summary()["stages"],
+    }
+
+
+def parse_crawler_options(extra):
+    """将 -- 之后的 main.py 选项转换为 WebCrawler 参数"""
+    parser = argparse.ArgumentParser(prog="crawler options", add_help=False)
+    parser.add_argument('-p', '--prefetch', action='store_true')
+    parser.add_argument('-S', '--stream-pdf', action='store_true')
+    parser.add_argument('-i', '--image-timeout', type=int, default=10)
+    parser.add_argument('-P', '--render-profile', choices=PROFILES, default='full')
+    parser.add_argument('-b', '--block', action='append', default=[])
+    parser.add_argument('-W', '--writers', type=int, default=0)
+    options = parser.parse_args(extra)
+    return dict(prefetch=options.prefetch, stream_pdf=options.stream_pdf,
+                image_timeout=options.image_timeout, render_profile=options.render_profile,
+                block_patterns=options.block, writers=options.writers)
+
+
+def main():
+    argv = sys.argv[1:]
+    extra = []
+    if "--" in argv:
+        index = argv.index("--")
+        argv, extra = argv[:index], argv[index + 1:]
+
+    parser = argparse.ArgumentParser(description='离线爬取基准')
+    parser.add_argument('-f', '--fanout', type=int, default=4, metavar='num', help='每篇文章的子链接数 (默认: 4)')
+    parser.add_argument('-d', '--depth', type=int, default=3, metavar='num', help='站点及爬取深度 (默认: 3)')
+    parser.add_argument('-n', '--images', type=int, default=6, metavar='num', help='每篇文章的懒加载图片数 (默认: 6)')
+    parser.add_argument('-w', '--workers', type=int, default=1, metavar='num', help='并行浏览器数量 (默认: 1)')
+    parser.add_argument('-t', '--delay', type=int, default=3, metavar='sec', help='页面就绪最长等待秒数 (默认: 3)')
+    parser.add_argument('--image-latency', type=float, default=0.05, metavar='sec',
+                        help='每张图片的模拟延迟 (默认: 0.05)')
+    parser.add_argument('--page-latency', type=float, default=0.0, metavar='sec',
+                        help='每个页面的模拟延迟 (默认: 0)')
+    parser.add_argument('--widget-latency', type=float, default=0.2, metavar='sec',
+                        help='评论/统计/字体等非必要资源的模拟延迟，0表示页面不引用这些资源 (默认: 0.2)')
+    parser.add_argument('-m', '--metrics', metavar='file', help='同时写出各阶段耗时 (JSON Lines)')
+    parser.add_argument('-j', '--json', action='store_true', help='以JSON格式输出结果')
+    args = parser.parse_args(argv)
+
+    result = run(args, parse_crawler_options(extra))
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    print()
+    print(f"站点文章: {result['articles']}, 处理页面: {result['pages']}, 生成PDF: {result['pdfs']}")
+    print(f"浏览器数: {result['workers']}, 总耗时: {result['elapsed']} 秒, "
+          f"吞吐: {result['pages_per_sec']} 页/秒")
+    print(f"单页延迟: p50 {result['latency_p50']} 秒, p95 {result['latency_p95']} 秒, "
+          f"最大 {result['latency_max']} 秒")
+    print(f"内存峰值 (含浏览器进程): {result['peak_rss_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""微基准：统计处理单个页面所需的WebDriver往返次数（逐项检查 vs 一次性探测）
+
+用法:
+    python benchmarks/roundtrips.py            # 默认页面包含300个链接
+    python benchmarks/roundtrips.py -n 1000    # 指定链接数量
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import WebCrawler  # noqa: E402
+
+
+def build_page(link_count):
+    """生成一个类似微信文章的本地页面"""
+    links = "\n".join(
+        f'<p><a href="article_{i}.html">相关文章 {i}</a></p>' for i in range(link_count)
+    )
+    return f"""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>基准测试页面</title></head>
+<body>
+<h1 class="rich_media_title">基准测试文章</h1>
+<div id="js_content">
+<p>正文内容</p>
+{links}
+</div>
+</body>
+</html>"""
+
+
+class RoundTripCounter:
+    """包装 driver.execute，统计发往chromedriver的命令数"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.count = 0
+        self._execute = driver.execute
+
+        def counting_execute(driver_command, params=None):
+            self.count += 1
+            return self._execute(driver_command, params)
+
+        driver.execute = counting_execute
+
+    def reset(self):
+        self.count = 0
+
+
+def legacy_pass(crawler, driver, url):
+    """逐项检查：状态XPath、迁移XPath、登录检查、标题和逐个链接读取"""
+    crawler.check_article_status(driver)
+    crawler.check_article_migration(driver)
+    crawler.needs_login(driver)
+    crawler.get_page_title(driver)
+    return crawler.get_page_links(url)
+
+
+def probe_pass(crawler, driver, url):
+    """一次性探测后由各方法消费同一个结果"""
+    probe = crawler.probe_page(driver)
+    crawler.check_article_status(driver, probe)
+    crawler.check_article_migration(driver, probe)
+    crawler.needs_login(driver, probe)
+    crawler.get_page_title(driver, probe)
+    return crawler.get_page_links(url, probe)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebDriver往返次数微基准')
+    parser.add_argument('-n', '--links', type=int, default=300, metavar='num',
+                        help='页面中的链接数量 (默认: 300)')
+    parser.add_argument('-r', '--repeat', type=int, default=5, metavar='num',
+                        help='每种方式重复次数 (默认: 5)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        page = os.path.join(tmp, "article.html")
+        with open(page, "w", encoding="utf-8") as f:
+            f.write(build_page(args.links))
+        url = "file://" + page
+
+        crawler = WebCrawler(max_depth=1, delay=1)
+        driver = crawler.setup_driver()
+        try:
+            driver.get(url)
+            counter = RoundTripCounter(driver)
+
+            print(f"页面链接数: {args.links}")
+            for name, run in (("逐项检查", legacy_pass), ("一次性探测", probe_pass)):
+                counter.reset()
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    links = run(crawler, driver, url)
+                elapsed = (time.perf_counter() - start) / args.repeat
+                print(f"{name}: 每页 {counter.count // args.repeat} 次往返, "
+                      f"耗时 {elapsed * 1000:.1f} ms, 链接 {len(links)} 个")
+        finally:
+            crawler.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""本地合成的类微信文章站点，用于离线基准测试
+
+站点是一棵完全树：文章 i 的子文章为 i*fanout+1 .. i*fanout+fanout，深度不超过 depth。
+按文章编号确定性地生成以下情况：
+    - 被删除/屏蔽的文章（命中 ERROR_PATTERNS 的提示文本）
+    - "该公众号已迁移" 页面，"访问文章" 按钮指向迁移后的新文章
+    - 同一篇文章的重复分享链接（不同的 chksm/scene 参数）
+    - 正文图片放在 data-src 中，需要懒加载
+    - 文章页返回 ETag，带 If-None-Match 的条件请求命中时返回304
+
+用法:
+    python benchmarks/wechat_site.py -f 4 -d 3    # 在 http://127.0.0.1:8800 启动站点
+"""
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prefetch import ERROR_PATTERNS, MIGRATION_BUTTON_TEXT, MIGRATION_TEXT  # noqa: E402
+
+BIZ = "MzBenchmark=="
+MIGRATED_OFFSET = 1000000  # 迁移后新文章的编号偏移
+
+
+def _png(width, height, seed):
+    """生成一张纯色PNG图片"""
+    color = hashlib.md5(str(seed).encode()).digest()[:3]
+    row = b"\x00" + color * width
+    raw = row * height
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+class SiteConfig:
+    """站点参数"""
+
+    def __init__(self, fanout=4, depth=3, images=6, deleted_every=7, blocked_every=11,
+                 migrated_every=13, duplicate_every=5, image_latency=0.05, page_latency=0.0,
+                 widget_latency=0.2):
+        self.fanout = fanout
+        self.depth = depth
+        self.images = images
+        self.deleted_every = deleted_every
+        self.blocked_every = blocked_every
+        self.migrated_every = migrated_every
+        self.duplicate_every = duplicate_every
+        self.image_latency = image_latency
+        self.page_latency = page_latency
+        self.widget_latency = widget_latency  # 评论、统计上报、网页字体等非必要资源的延迟，0表示不加载
+
+    @property
+    def article_count(self):
+        return sum(self.fanout ** level for level in range(self.depth + 1))
+
+    def depth_of(self, article_id):
+        level, first, size = 0, 0, 1
+        while article_id >= first + size:
+            first += size
+            size *= self.fanout
+            level += 1
+        return level
+
+    def children(self, article_id):
+        if self.depth_of(article_id) >= self.depth:
+            return []
+        start = article_id * self.fanout + 1
+        return list(range(start, start + self.fanout))
+
+    def kind(self, article_id):
+        """文章类型：normal / deleted / blocked / migrated（根文章总是正常）"""
+        if article_id == 0:
+            return "normal"
+        if self.deleted_every and article_id % self.deleted_every == 0:
+            return "deleted"
+        if self.blocked_every and article_id % self.blocked_every == 0:
+            return "blocked"
+        if self.migrated_every and article_id % self.migrated_every == 0:
+            return "migrated"
+        return "normal"
+
+
+def article_path(article_id, share=None):
+    """文章链接；share 不为None时附加分享参数，模拟同一文章的不同分享链接"""
+    sn = hashlib.md5(f"sn-{article_id}".encode()).hexdigest()
+    path = f"/s?__biz={BIZ}&mid={article_id}&idx=1&sn={sn}"
+    if share is not None:
+        path += f"&chksm={share:08x}&scene={share % 100}"
+    return path
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    config = SiteConfig()
+
+    def log_message(self, format, *args):  # noqa: A002 - 覆盖父类签名
+        pass
+
+    def _send(self, body, content_type="text/html; charset=utf-8", status=200, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "max-age=3600")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path.startswith("/img/"):
+            time.sleep(self.config.image_latency)
+            seed = parsed.path.rsplit("/", 1)[-1].split(".")[0]
+            return self._send(_png(64, 48, seed), "image/png")
+        if parsed.path.startswith("/mp/"):
+            time.sleep(self.config.widget_latency)
+            return self._send(b"/* widget */", "application/javascript")
+        if parsed.path.startswith("/fonts/"):
+            time.sleep(self.config.widget_latency)
+            return self._send(b"\0" * 2048, "font/woff2")
+        if parsed.path == "/s":
+            query = parse_qs(parsed.query)
+            try:
+                article_id = int(query["mid"][0])
+            except (KeyError, ValueError):
+                return self._send(b"not found", "text/plain", 404)
+            body = self.render_article(article_id).encode("utf-8")
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return None
+            time.sleep(self.config.page_latency)
+            return self._send(body, headers={"ETag": etag})
+        return self._send(b"not found", "text/plain", 404)
+
+    def render_article(self, article_id):
+        config = self.config
+        original_id = article_id - MIGRATED_OFFSET if article_id >= MIGRATED_OFFSET else article_id
+        kind = config.kind(original_id) if article_id < MIGRATED_OFFSET else "normal"
+
+        if kind == "deleted":
+            return _page("提示", f'<div class="weui-msg"><p>{ERROR_PATTERNS[0]}</p></div>')
+        if kind == "blocked":
+            return _page("提示", f'<div class="weui-msg"><p>{ERROR_PATTERNS[2]}</p></div>')
+        if kind == "migrated":
+            target = article_path(article_id + MIGRATED_OFFSET)
+            return _page("提示", f'<div class="weui-msg"><p>{MIGRATION_TEXT}</p>'
+                               f'<p><a href="{target}">{MIGRATION_BUTTON_TEXT}</a></p></div>')
+
+        images = "\n".join(
+            f'<p><img data-src="/img/{original_id}-{n}.png" '
+            f'src="data:image/gif;base64,R0lGODlhAQABAAAAACw=" style="width:320px;height:240px"></p>'
+            for n in range(config.images)
+        )
+        paragraphs = "\n".join(
+            f"<p>第 {original_id} 篇文章的第 {n} 段正文。" + "内容" * 40 + "</p>" for n in range(8)
+        )
+        links = []
+        for child in config.children(original_id):
+            links.append(f'<p><a href="{article_path(child)}">相关文章 {child}</a></p>')
+            if config.duplicate_every and child % config.duplicate_every == 0:
+                links.append(f'<p><a href="{article_path(child, share=child * 7919)}">分享链接 {child}</a></p>')
+        widgets = ""
+        if config.widget_latency:
+            # 与打印无关的评论组件、统计上报和网页字体，渲染配置 light 会拦截这些请求
+            widgets = f"""
+<style>@font-face {{ font-family: bench; src: url(/fonts/article.woff2) format("woff2"); }}
+body {{ font-family: bench, sans-serif; }}</style>
+<script async src="/mp/appmsg_comment?mid={original_id}"></script>
+<script async src="/mp/jsmonitor?mid={original_id}"></script>"""
+        body = f"""{widgets}
+<div id="img-content">
+<h1 class="rich_media_title" id="activity-name">基准文章 {original_id}</h1>
+<div class="rich_media_meta_list"><span id="js_name">基准公众号</span><em id="publish_time">2024-01-01</em></div>
+<div class="rich_media_content" id="js_content">
+{paragraphs}
+{images}
+{''.join(links)}
+</div>
+</div>"""
+        return _page(f"基准文章 {original_id}", body)
+
+
+def _page(title, body):
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body>{body}</body></html>"""
+
+
+class BenchmarkSite:
+    """在后台线程中运行的本地站点"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        handler = type("Handler", (SiteHandler,), {"config": config or SiteConfig()})
+        self.config = handler.config
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, article_id=0, share=None):
+        return self.base_url + article_path(article_id, share)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地类微信文章站点')
+    parser.add_argument('-f', '--fanout', type=int, default=4, metavar='num', help='每篇文章的子链接数 (默认: 4)')
+    parser.add_argument('-d', '--depth', type=int, default=3, metavar='num', help='站点深度 (默认: 3)')
+    parser.add_argument('-p', '--port', type=int, default=8800, metavar='port', help='监听端口 (默认: 8800)')
+    args = parser.parse_args()
+
+    site = BenchmarkSite(SiteConfig(fanout=args.fanout, depth=args.depth), port=args.port).start()
+    print(f"站点已启动: {site.url(0)} (共 {site.config.article_count} 篇文章)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""按内容寻址的PDF缓存：以规范化文章URL和内容指纹定位已保存的PDF"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+
+WECHAT_HOST = "mp.weixin.qq.com"
+ARTICLE_KEYS = ("__biz", "mid", "idx", "sn")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    canonical_url TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    pdf_path TEXT NOT NULL,
+    content_hash TEXT,
+    links TEXT NOT NULL DEFAULT '[]',
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_hash ON articles(content_hash);
+CREATE INDEX IF NOT EXISTS idx_articles_path ON articles(pdf_path);
+"""
+
+# 增量爬取使用的校验信息，旧版本的索引在打开时补充这些列
+VALIDATOR_COLUMNS = (
+    ("etag", "TEXT"),
+    ("last_modified", "TEXT"),
+    ("body_hash", "TEXT"),                       # #js_content 文本的哈希
+    ("is_index", "INTEGER NOT NULL DEFAULT 0"),  # 非文章页面（合集、主页等），增量爬取时重新渲染
+    ("validated_at", "REAL"),
+)
+
+
+def canonical_article_url(url):
+    """将微信文章链接规范化为 __biz + mid + idx + sn，去掉 chksm/scene 等分享参数
+
+    非微信文章链接只去掉片段标识（#...）。
+    """
+    parsed = urlparse(url)
+    if parsed.netloc == WECHAT_HOST and parsed.path == "/s":
+        query = parse_qs(parsed.query)
+        if all(query.get(key) for key in ARTICLE_KEYS):
+            canonical_query = urlencode([(key, query[key][0]) for key in ARTICLE_KEYS])
+            return urlunparse(("https", WECHAT_HOST, "/s", "", canonical_query, ""))
+    if parsed.netloc == WECHAT_HOST and parsed.path.startswith("/s/"):
+        # 短链接形式 /s/<id>，查询参数只与分享来源有关
+        return urlunparse(("https", WECHAT_HOST, parsed.path, "", "", ""))
+    return urlunparse(parsed._replace(fragment=""))
+
+
+def article_id(url):
+    """微信文章的稳定ID：__biz:mid:idx，短链接为路径中的ID；其他链接返回None"""
+    parsed = urlparse(canonical_article_url(url))
+    if parsed.netloc != WECHAT_HOST:
+        return None
+    if parsed.path == "/s":
+        query = parse_qs(parsed.query)
+        if all(query.get(key) for key in ARTICLE_KEYS):
+            return ":".join(query[key][0] for key in ARTICLE_KEYS[:3])
+        return None
+    if parsed.path.startswith("/s/"):
+        return parsed.path[3:]
+    return None
+
+
+def link_file(src, dst):
+    """优先创建硬链接，跨文件系统等情况下退回复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class PdfCache:
+    """SQLite索引：规范化URL -> (标题, PDF路径, 内容指纹, 页面链接)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(articles)")}
+        for name, definition in VALIDATOR_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE articles ADD COLUMN {name} {definition}")
+        self._conn.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def lookup(self, url, kind="pdf"):
+        """按规范化URL查找已保存的文章，文件已不存在或不是 kind 类型（pdf/mhtml/html）时返回None"""
+        canonical = canonical_article_url(url)
+        row = self._execute("SELECT * FROM articles WHERE canonical_url = ?", (canonical,)).fetchone()
+        if not row or not row["pdf_path"].endswith(f".{kind}") or not os.path.exists(row["pdf_path"]):
+            return None
+        self._execute("UPDATE articles SET last_used = ? WHERE canonical_url = ?", (time.time(), canonical))
+        entry = dict(row)
+        entry["links"] = json.loads(entry["links"])
+        return entry
+
+    def find_by_hash(self, content_hash, kind="pdf"):
+        """按内容指纹查找已存在的 kind 类型文件路径"""
+        if not content_hash:
+            return None
+        rows = self._execute("SELECT pdf_path FROM articles WHERE content_hash = ?", (content_hash,)).fetchall()
+        for row in rows:
+            if row["pdf_path"].endswith(f".{kind}") and os.path.exists(row["pdf_path"]):
+                return row["pdf_path"]
+        return None
+
+    def owner_of(self, pdf_path):
+        """返回占用该PDF路径的文章记录"""
+        row = self._execute("SELECT * FROM articles WHERE pdf_path = ?", (pdf_path,)).fetchone()
+        return dict(row) if row else None
+
+    def store(self, url, title, pdf_path, content_hash=None, links=(), validators=None, is_index=False):
+        """记录文章与PDF的对应关系，validators 为下次增量爬取的校验信息"""
+        now = time.time()
+        validators = validators or {}
+        self._execute(
+            "INSERT INTO articles (canonical_url, title, pdf_path, content_hash, links, created_at, last_used, "
+            "etag, last_modified, body_hash, is_index, validated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(canonical_url) DO UPDATE SET title = excluded.title, pdf_path = excluded.pdf_path, "
+            "content_hash = excluded.content_hash, links = excluded.links, last_used = excluded.last_used, "
+            "etag = excluded.etag, last_modified = excluded.last_modified, body_hash = excluded.body_hash, "
+            "is_index = excluded.is_index, validated_at = excluded.validated_at",
+            (canonical_article_url(url), title, pdf_path, content_hash,
+             json.dumps(list(links), ensure_ascii=False), now, now,
+             validators.get("etag"), validators.get("last_modified"), validators.get("body_hash"),
+             int(bool(is_index)), now if validators else None),
+        )
+
+    def revalidated(self, url, validators):
+        """条件请求确认文章未变化后，更新校验信息和确认时间"""
+        self._execute(
+            "UPDATE articles SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), "
+            "body_hash = COALESCE(?, body_hash), validated_at = ? WHERE canonical_url = ?",
+            (validators.get("etag"), validators.get("last_modified"), validators.get("body_hash"),
+             time.time(), canonical_article_url(url)),
+        )
+
+    def gc(self, max_age_days=None):
+        """清理PDF已不存在的记录；指定 max_age_days 时同时淘汰长期未使用的记录
+
+        只删除缓存索引，不删除PDF文件。返回 (失效记录数, 淘汰记录数)。
+        """
+        rows = self._execute("SELECT canonical_url, pdf_path FROM articles").fetchall()
+        missing = [row["canonical_url"] for row in rows if not os.path.exists(row["pdf_path"])]
+        for canonical in missing:
+            self._execute("DELETE FROM articles WHERE canonical_url = ?", (canonical,))
+
+        evicted = 0
+        if max_age_days is not None:
+            cutoff = time.time() - max_age_days * 86400
+            evicted = self._execute("DELETE FROM articles WHERE last_used < ?", (cutoff,)).rowcount
+
+        with self._lock:
+            self._conn.execute("VACUUM")
+        return len(missing), evicted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
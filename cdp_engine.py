@@ -0,0 +1,762 @@
+"""CDP原生爬虫引擎：不经过Selenium/chromedriver，直接通过DevTools websocket控制Chrome
+
+一个Chrome进程内同时打开多个标签页，每个标签页独立完成加载、检查和打印。
+页面检查脚本、目录结构、状态库、PDF缓存和运行指标与 Selenium 引擎完全一致，
+通过 --engine cdp 选用。需要额外安装 websockets 包。
+"""
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+import traceback
+from collections import defaultdict
+
+from archive import add_inline, inline_targets, write_capture
+from page_scripts import (ARTICLE_DOCUMENT_JS, ARTICLE_PRINT_CSS, ARTICLE_PRINT_OPTIONS, LAZY_IMAGES_JS,
+                          NETWORK_IDLE_SECONDS, PAGE_PROBE_JS, PDF_STREAM_CHUNK, PRINT_OPTIONS,
+                          READY_POLL_INTERVAL, READY_STATE_JS, SINGLE_FILE_HTML_JS)
+from prefetch import ERROR_PATTERNS, LOGIN_PATTERNS, MIGRATION_BUTTON_TEXT, MIGRATION_TEXT
+from resilience import CRASH, KIND_LABELS, THROTTLE_PATTERNS, Throttled, classify_error, is_throttled
+from render_profile import chrome_args, fetch_patterns
+from startup import profile
+
+CHROME_CANDIDATES = (
+    "google-chrome",
+    "google-chrome-stable",
+    "chromium",
+    "chromium-browser",
+    "chrome",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+)
+
+COMMAND_TIMEOUT = 60  # 单条CDP命令的超时秒数
+
+
+class CDPError(Exception):
+    """CDP命令返回错误或连接断开"""
+
+
+class TabLost(Exception):
+    """标签页失效后无法打开新的标签页"""
+
+
+def find_chrome():
+    """查找Chrome可执行文件，可通过环境变量 CHROME_PATH 指定"""
+    candidates = [os.environ.get("CHROME_PATH")] + list(CHROME_CANDIDATES)
+    for candidate in candidates:
+        if not candidate:
+            continue
+        path = shutil.which(candidate) or (candidate if os.path.isfile(candidate) else None)
+        if path:
+            return path
+    raise CDPError("未找到Chrome浏览器，请安装Chrome或设置环境变量 CHROME_PATH")
+
+
+class CDPConnection:
+    """一条DevTools websocket连接，按 sessionId 将事件分发给各标签页"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._listeners = defaultdict(list)
+        self._reader = None
+
+    @classmethod
+    async def connect(cls, url):
+        try:
+            import websockets
+        except ImportError:
+            raise CDPError("CDP引擎需要 websockets 包，请运行：pip install websockets")
+        ws = await websockets.connect(url, max_size=None, ping_interval=None)
+        connection = cls(ws)
+        connection._reader = asyncio.create_task(connection._read_loop())
+        return connection
+
+    async def send(self, method, params=None, session_id=None, timeout=COMMAND_TIMEOUT):
+        """发送命令并等待结果"""
+        message_id = next(self._ids)
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self.ws.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    def on(self, method, callback, session_id=None):
+        """注册事件回调"""
+        self._listeners[(method, session_id)].append(callback)
+
+    def off(self, session_id):
+        """移除某个会话的全部事件回调"""
+        for key in [key for key in self._listeners if key[1] == session_id]:
+            del self._listeners[key]
+
+    async def _read_loop(self):
+        error = CDPError("DevTools连接已断开")
+        try:
+            async for raw in self.ws:
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self._pending.get(message["id"])
+                    if not future or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(CDPError(message["error"].get("message", "未知错误")))
+                    else:
+                        future.set_result(message.get("result", {}))
+                    continue
+                key = (message.get("method"), message.get("sessionId"))
+                for callback in list(self._listeners.get(key, ())):
+                    callback(message.get("params", {}))
+        except Exception as e:
+            error = CDPError(f"DevTools连接已断开: {e}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+    async def close(self):
+        await self.ws.close()
+        if self._reader:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+
+class CDPTab:
+    """浏览器中的一个标签页（target），拥有独立的会话和网络事件跟踪"""
+
+    def __init__(self, connection, target_id, session_id):
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+        self.inflight = set()
+        self.idle_since = time.monotonic()
+        self.crashed = False
+        self.blocked = 0  # 被渲染配置拦截的请求数
+        self._fetch_tasks = set()
+
+    @classmethod
+    async def open(cls, connection, profile="full", block_patterns=()):
+        target = await connection.send("Target.createTarget", {"url": "about:blank"})
+        attached = await connection.send("Target.attachToTarget",
+                                         {"targetId": target["targetId"], "flatten": True})
+        tab = cls(connection, target["targetId"], attached["sessionId"])
+        await tab._enable(profile, block_patterns)
+        return tab
+
+    async def _enable(self, profile="full", block_patterns=()):
+        on = self.connection.on
+        on("Network.requestWillBeSent", self._request_started, self.session_id)
+        on("Network.loadingFinished", self._request_finished, self.session_id)
+        on("Network.loadingFailed", self._request_finished, self.session_id)
+        on("Inspector.targetCrashed", self._target_crashed, self.session_id)
+        await self.send("Page.enable")
+        await self.send("Network.enable")
+        await self.send("Inspector.enable")
+        if block_patterns:
+            await self.send("Network.setBlockedURLs", {"urls": list(block_patterns)})
+        patterns = fetch_patterns(profile)
+        if patterns:
+            # 只有匹配资源类型的请求会暂停，直接以 BlockedByClient 失败
+            on("Fetch.requestPaused", self._request_paused, self.session_id)
+            await self.send("Fetch.enable", {"patterns": patterns})
+
+    def _request_started(self, params):
+        self.inflight.add(params.get("requestId"))
+        self.idle_since = None
+
+    def _request_finished(self, params):
+        self.inflight.discard(params.get("requestId"))
+        if params.get("blockedReason") or params.get("errorText") == "net::ERR_BLOCKED_BY_CLIENT":
+            self.blocked += 1
+        if not self.inflight:
+            self.idle_since = time.monotonic()
+
+    def _target_crashed(self, params):
+        self.crashed = True
+
+    def _request_paused(self, params):
+        task = asyncio.ensure_future(self.send("Fetch.failRequest", {
+            "requestId": params["requestId"], "errorReason": "BlockedByClient"}))
+        self._fetch_tasks.add(task)
+        task.add_done_callback(self._fetch_done)
+
+    def _fetch_done(self, task):
+        self._fetch_tasks.discard(task)
+        if not task.cancelled():
+            task.exception()  # 页面已跳转时请求可能已失效，忽略错误
+
+    async def send(self, method, params=None, timeout=COMMAND_TIMEOUT):
+        return await self.connection.send(method, params, self.session_id, timeout)
+
+    async def navigate(self, url, timeout=COMMAND_TIMEOUT):
+        """开始导航，不等待 load 事件，由 wait_ready 判断何时就绪"""
+        self.inflight.clear()
+        self.idle_since = time.monotonic()
+        result = await self.send("Page.navigate", {"url": url}, timeout)
+        if result.get("errorText"):
+            raise CDPError(f"页面加载失败: {result['errorText']}")
+
+    async def evaluate(self, script, *args, await_promise=False, timeout=COMMAND_TIMEOUT):
+        """按 Selenium execute_script 的约定执行脚本；await_promise 时以最后一个参数作为完成回调"""
+        arguments = json.dumps(list(args), ensure_ascii=False)
+        if await_promise:
+            expression = (f"new Promise(function (resolve) {{ (function () {{ {script} }})"
+                          f".apply(null, {arguments}.concat([resolve])); }})")
+        else:
+            expression = f"(function () {{ {script} }}).apply(null, {arguments})"
+        result = await self.send("Runtime.evaluate", {
+            "expression": expression,
+            "returnByValue": True,
+            "awaitPromise": await_promise,
+        }, timeout)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise CDPError(details.get("exception", {}).get("description") or details.get("text", "脚本执行失败"))
+        return result.get("result", {}).get("value")
+
+    def network_idle(self):
+        return not self.inflight and self.idle_since is not None \
+            and time.monotonic() - self.idle_since >= NETWORK_IDLE_SECONDS
+
+    async def wait_ready(self, timeout):
+        """与 WebCrawler.wait_for_page_ready 相同的就绪条件，网络事件由CDP直接推送"""
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            try:
+                state = await self.evaluate(READY_STATE_JS)
+            except CDPError:
+                state = None
+            if state and self.network_idle() and state["pendingImages"] == 0:
+                if state["readyState"] == "complete" or (
+                        state["readyState"] == "interactive" and state["hasContent"]):
+                    return True, time.monotonic() - start
+            if time.monotonic() >= deadline:
+                return False, time.monotonic() - start
+            await asyncio.sleep(READY_POLL_INTERVAL)
+
+    async def print_pdf(self, pdf_path, options):
+        """以流方式打印PDF，分块写入临时文件后原子重命名，返回 (内容哈希, 字节数)"""
+        loop = asyncio.get_running_loop()
+        result = await self.send("Page.printToPDF", dict(options, transferMode="ReturnAsStream"))
+        handle = result["stream"]
+        tmp_path = pdf_path + ".part"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    chunk = await self.send("IO.read", {"handle": handle, "size": PDF_STREAM_CHUNK})
+                    data = chunk.get("data", "")
+                    if data:
+                        raw = base64.b64decode(data) if chunk.get("base64Encoded") else data.encode("utf-8")
+                        await loop.run_in_executor(None, f.write, raw)
+                        digest.update(raw)
+                        size += len(raw)
+                    if chunk.get("eof"):
+                        break
+            os.replace(tmp_path, pdf_path)
+        finally:
+            try:
+                await self.send("IO.close", {"handle": handle})
+            except CDPError:
+                pass
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest.hexdigest(), size
+
+    async def close(self):
+        self.connection.off(self.session_id)
+        try:
+            await self.connection.send("Target.closeTarget", {"targetId": self.target_id}, timeout=10)
+        except (CDPError, asyncio.TimeoutError):
+            pass
+
+
+class ChromeBrowser:
+    """直接启动的Chrome进程及其DevTools连接"""
+
+    def __init__(self, visible=False, extra_args=()):
+        self.visible = visible
+        self.extra_args = list(extra_args)
+        self.process = None
+        self.connection = None
+        self.user_data_dir = None
+
+    async def start(self, timeout=30):
+        self.user_data_dir = tempfile.mkdtemp(prefix="webpagetopdf-cdp-")
+        args = [
+            find_chrome(),
+            "--remote-debugging-port=0",
+            f"--user-data-dir={self.user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--disable-gpu",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--window-size=1920,1080",
+            # 多个标签页同时工作，避免后台标签页被降速
+            "--disable-background-timer-throttling",
+            "--disable-backgrounding-occluded-windows",
+            "--disable-renderer-backgrounding",
+        ] + self.extra_args
+        if not self.visible:
+            args.append("--headless=new")
+        args.append("about:blank")
+
+        self.process = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+
+        # Chrome 启动后将实际端口和浏览器websocket路径写入 DevToolsActivePort
+        port_file = os.path.join(self.user_data_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + timeout
+        while True:
+            if os.path.exists(port_file):
+                with open(port_file) as f:
+                    lines = f.read().split()
+                if len(lines) >= 2:
+                    break
+            if self.process.returncode is not None or time.monotonic() > deadline:
+                await self.close()
+                raise CDPError("Chrome启动失败，未能取得DevTools端口")
+            await asyncio.sleep(0.05)
+
+        self.connection = await CDPConnection.connect(f"ws://127.0.0.1:{lines[0]}{lines[1]}")
+        return self
+
+    async def close(self):
+        if self.connection:
+            try:
+                await self.connection.send("Browser.close", timeout=5)
+            except (CDPError, asyncio.TimeoutError):
+                pass
+            await self.connection.close()
+            self.connection = None
+        if self.process and self.process.returncode is None:
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+            self.user_data_dir = None
+
+
+class CDPCrawler:
+    """--engine cdp：一个Chrome进程中的多个标签页并发爬取
+
+    crawler 是一个配置好的 WebCrawler，这里只复用它的配置、日志、链接过滤、
+    目录规则、状态库、PDF缓存和运行指标，不会启动它的Selenium驱动。
+    """
+
+    def __init__(self, crawler, tabs=4):
+        self.crawler = crawler
+        self.tabs = max(1, tabs)
+        self.browser = None
+        self._stop = False
+        self._active = 0
+        self._idle = None
+
+    def run(self, urls, parent_dir="pdfs", jobs=()):
+        """处理所有起始URL（及续爬的待处理任务），直到队列清空或被中断"""
+        try:
+            asyncio.run(self._run(urls, parent_dir, jobs))
+        except KeyboardInterrupt:
+            print("\n\n爬取过程被用户中断...")
+            self._stop = True
+
+    async def _run(self, urls, parent_dir, jobs):
+        crawler = self.crawler
+        extra_args = chrome_args(crawler.render_profile)
+        if crawler.asset_cache:
+            # 所有标签页在同一个Chrome进程中，共用一个缓存槽位
+            crawler._asset_slot = crawler.asset_cache.acquire()
+            extra_args += crawler.asset_cache.chrome_args(crawler._asset_slot)
+        try:
+            with crawler.metrics.span("driver_start", engine="cdp"):
+                self.browser = await ChromeBrowser(visible=crawler.visible, extra_args=extra_args).start()
+        except BaseException:
+            self._release_asset_slot()
+            raise
+        crawler.log_success(f"Chrome已启动（CDP引擎，{self.tabs} 个标签页）")
+        profile.finish("浏览器可用，开始处理首个页面")
+        await self._load_cookies()
+
+        # 与Selenium引擎共用 WebCrawler 的 frontier：入队去重、调度顺序和页数预算一致
+        frontier = crawler.frontier
+        for url, depth, job_parent in jobs:
+            frontier.push(url, depth, job_parent)
+        for url in urls:
+            frontier.push(url, 0, parent_dir)
+
+        self._idle = asyncio.Event()
+        workers = [asyncio.create_task(self._worker(frontier)) for _ in range(self.tabs)]
+        joined = asyncio.create_task(self._idle.wait())
+        try:
+            pending = {joined, *workers}
+            while not joined.done():
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if not joined.done() and all(worker.done() for worker in workers):
+                    crawler.log_error("所有标签页均已失效，停止爬取")
+                    break
+        finally:
+            self._stop = True
+            for task in workers + [joined]:
+                task.cancel()
+            await asyncio.gather(*workers, joined, return_exceptions=True)
+            await self._save_cookies()
+            await self.browser.close()
+            self._release_asset_slot()
+
+    async def _load_cookies(self):
+        """导入已保存的登录Cookie，所有标签页共用同一个浏览器上下文"""
+        store = self.crawler.cookie_store
+        cookies = store.load() if store else []
+        if not cookies:
+            return
+        try:
+            await self.browser.connection.send("Storage.setCookies", {"cookies": cookies})
+            self.crawler.log_debug(f"已导入 {len(cookies)} 个Cookie")
+        except (CDPError, asyncio.TimeoutError) as e:
+            self.crawler.log_warning(f"导入Cookie失败: {e}")
+
+    async def _save_cookies(self):
+        store = self.crawler.cookie_store
+        if not store or not self.browser.connection:
+            return
+        try:
+            result = await self.browser.connection.send("Storage.getCookies", timeout=10)
+            await self._blocking(store.save, result.get("cookies", []))
+        except (CDPError, asyncio.TimeoutError, OSError) as e:
+            self.crawler.log_warning(f"保存Cookie失败: {e}")
+
+    def _release_asset_slot(self):
+        crawler = self.crawler
+        if crawler._asset_slot:
+            crawler.asset_cache.release(crawler._asset_slot)
+            crawler._asset_slot = None
+
+    async def _worker(self, frontier):
+        crawler = self.crawler
+        tab = await self._open_tab()
+        try:
+            while not self._stop:
+                job = frontier.pop()
+                if job is None:
+                    # 队列为空且没有标签页在处理页面时爬取结束
+                    if not self._active:
+                        self._idle.set()
+                    await asyncio.sleep(0.05)
+                    continue
+                url, depth, parent_dir = job
+                self._active += 1
+                try:
+                    if depth > crawler.max_depth or not crawler.claim_url(url):
+                        crawler.log_debug(f"跳过URL (深度: {depth}): {url}")
+                        continue
+                    crawler.log_highlight(f"\n当前深度: {depth}, 处理页面: {url} (待处理: {len(frontier)})")
+                    try:
+                        result, tab = await self._process_with_retry(tab, url, depth, parent_dir)
+                    except TabLost as e:
+                        # 旧标签页已关闭：任务放回队列交给其他标签页，本工作协程退出
+                        crawler.log_error(f"无法打开新的标签页，该标签页停止工作: {e}")
+                        tab = None
+                        crawler.release_url(url)
+                        frontier.retry(url, depth, parent_dir)
+                        return
+                    if result:
+                        # 未入队的链接由 on_drop 写入状态库，放到线程池中执行
+                        save_dir, links = result
+                        await self._blocking(self._push_links, frontier, links, depth + 1, save_dir)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if crawler.state:
+                        await self._blocking(crawler.state.mark_failed, url, str(e))
+                    crawler.metrics.failure(url, depth, type(e).__name__)
+                    if crawler.debug:
+                        print(f"处理页面时出错 {url}: {str(e)}")
+                        print(traceback.format_exc())
+                    else:
+                        print(f"处理页面时出错: {url}")
+                finally:
+                    self._active -= 1
+        finally:
+            if tab:
+                await tab.close()
+
+    @staticmethod
+    async def _blocking(func, *args):
+        """在线程池中执行SQLite读写、文件操作等阻塞调用，不让事件循环上的其他标签页停顿"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    @staticmethod
+    def _push_links(frontier, links, depth, save_dir):
+        for link in links:
+            frontier.push(link, depth, save_dir)
+
+    async def _process_with_retry(self, tab, url, depth, parent_dir):
+        """处理页面，临时性错误按退避策略重试；标签页崩溃或无响应时换一个新标签页。返回 (结果, 标签页)
+
+        新标签页打不开时抛出 TabLost，旧标签页此时已关闭
+        """
+        crawler = self.crawler
+        attempt = 0
+        while True:
+            try:
+                return await self._guarded(tab, url, depth, parent_dir), tab
+            except Exception as e:
+                kind = CRASH if tab.crashed else classify_error(e)
+                if tab.crashed or isinstance(e, (CDPError, asyncio.TimeoutError)):
+                    await tab.close()
+                    try:
+                        tab = await self._open_tab()
+                    except Exception as reopen_error:
+                        raise TabLost(reopen_error) from e
+                if self._stop or not crawler.retry_policy.should_retry(kind, attempt):
+                    raise
+                delay = crawler.retry_policy.delay(attempt)
+                attempt += 1
+                crawler.metrics.retry(url, depth, kind, attempt, delay)
+                crawler.log_warning(f"{KIND_LABELS[kind]}，{delay:.1f} 秒后第 {attempt} 次重试: {url}")
+                await asyncio.sleep(delay)
+
+    async def _guarded(self, tab, url, depth, parent_dir):
+        """等待主机限速和熔断放行后处理页面，并把结果反馈给该主机的状态"""
+        guard = self.crawler.host_guard
+        with self.crawler.metrics.span("host_wait", url=url, depth=depth):
+            while not self._stop:
+                wait = guard.reserve(url)
+                if not wait:
+                    break
+                await asyncio.sleep(min(wait, 1.0))
+        try:
+            result = await self.process_page(tab, url, depth, parent_dir)
+        except BaseException as e:
+            guard.failure(url, classify_error(e))
+            raise
+        guard.success(url)
+        return result
+
+    async def _open_tab(self):
+        crawler = self.crawler
+        return await CDPTab.open(self.browser.connection, crawler.render_profile, crawler.block_patterns)
+
+    async def _span(self, stage, url, depth, coroutine, **fields):
+        with self.crawler.metrics.span(stage, url=url, depth=depth, **fields):
+            return await coroutine
+
+    async def _wait_ready(self, tab, url, depth):
+        crawler = self.crawler
+        ready, elapsed = await self._span("ready_wait", url, depth, tab.wait_ready(crawler.delay))
+        stats = crawler.ready_stats
+        stats["pages"] += 1
+        stats["waited"] += elapsed
+        stats["saved"] += max(0.0, crawler.delay - elapsed)
+        stats["blocked"] += tab.blocked
+        tab.blocked = 0
+        if not ready:
+            stats["timeouts"] += 1
+            crawler.log_debug(f"等待页面就绪超时 ({crawler.delay} 秒)，继续处理")
+
+    async def _probe(self, tab, url, depth):
+        return await self._span("probe", url, depth, tab.evaluate(
+            PAGE_PROBE_JS, ERROR_PATTERNS + THROTTLE_PATTERNS, MIGRATION_TEXT, MIGRATION_BUTTON_TEXT,
+            LOGIN_PATTERNS))
+
+    async def process_page(self, tab, url, depth, parent_dir):
+        """加载并保存单个页面，返回 (保存目录, 待爬取链接)；页面无效时返回None"""
+        crawler = self.crawler
+        metrics = crawler.metrics
+        if crawler.state:
+            await self._blocking(crawler.state.mark_running, url, depth, parent_dir)
+
+        loop = asyncio.get_running_loop()
+        refresh = False  # 增量模式下已更新的文章和索引页重新渲染后覆盖旧文件
+        if crawler.cache:
+            cached = await self._blocking(crawler.cache.lookup, url, crawler.primary_kind)
+            if cached and crawler.incremental:
+                cached = await self._blocking(crawler.revalidate, url, cached, depth)
+                refresh = cached is None
+            if cached:
+                with metrics.span("cache_restore", url=url, depth=depth):
+                    result = await self._blocking(crawler.restore_from_cache, url, cached, depth, parent_dir)
+                metrics.page_done(url, depth)
+                return result
+
+        prefetched = None
+        target_url = url
+        if crawler.prefetcher:
+            prefetched = await self._span("prefetch", url, depth,
+                                          loop.run_in_executor(None, crawler.prefetcher.fetch, url))
+            if prefetched.status == "throttled":
+                raise Throttled(prefetched.reason)
+            if prefetched.status == "invalid":
+                crawler.log_warning(f"文章无法访问: {prefetched.reason}")
+                if crawler.state:
+                    await self._blocking(crawler.state.mark_skipped, url, prefetched.reason)
+                metrics.failure(url, depth, f"文章失效: {prefetched.reason}")
+                return None
+            if prefetched.status == "ok" and prefetched.migrated:
+                crawler.log_box(f"原文已迁移到新链接: {prefetched.url}")
+                target_url = prefetched.url
+
+        await self._span("page_load", url, depth, tab.navigate(target_url, crawler.page_load_timeout))
+        await self._wait_ready(tab, url, depth)
+        probe = await self._probe(tab, url, depth)
+
+        if is_throttled(probe["status"]):
+            raise Throttled(probe["status"])
+        if probe["status"]:
+            crawler.log_warning(f"文章无法访问: {probe['status']}")
+            if crawler.state:
+                await self._blocking(crawler.state.mark_skipped, url, probe["status"])
+            metrics.failure(url, depth, f"文章失效: {probe['status']}")
+            return None
+
+        if probe["migrated"]:
+            if not probe["migrationUrl"]:
+                crawler.log_error("未能获取新的文章链接")
+            else:
+                crawler.log_box(f"原文已迁移到新链接: {probe['migrationUrl']}")
+                await self._span("migration_check", url, depth, tab.navigate(probe["migrationUrl"]))
+                await self._wait_ready(tab, url, depth)
+                probe = await self._probe(tab, url, depth)
+
+        if probe["needsLogin"]:
+            # 多标签页并发时不阻塞等待登录，记录后跳过，由登录报告列出
+            await self._blocking(crawler.defer_login, url, depth, parent_dir)
+            return None
+
+        page_title = crawler.sanitize_filename(probe["title"])
+        crawler.log_highlight(f"页面标题: {page_title}")
+        save_dir = await self._blocking(crawler.make_save_dir, page_title, depth, parent_dir)
+        fingerprint = crawler.article_fingerprint(page_title, probe)
+
+        # 按 --format 依次保存，快照在打印前截取
+        outputs = {}
+        size = 0
+        for kind in crawler.output_kinds:
+            path, reused = await self._blocking(crawler.resolve_output_path, url, save_dir, page_title,
+                                                fingerprint, kind, refresh)
+            digest = written = None
+            if not reused:
+                save = self._print(tab, url, depth, path) if kind == "pdf" else \
+                    self._capture(tab, url, depth, path, kind)
+                digest, written = await save
+                size += written
+            await self._blocking(crawler.record_output, path, page_title, url, depth, parent_dir, written, digest)
+            if kind == "pdf" and not reused and crawler.postprocessor:
+                crawler.postprocess(path)  # 登记之后再提交，后处理改写文件时清单中的校验和随之更新
+            outputs[kind] = (path, fingerprint or digest)
+        output = outputs[crawler.primary_kind]
+
+        links = []
+        if depth < crawler.max_depth:
+            with metrics.span("link_extraction", url=url, depth=depth) as record:
+                if prefetched and prefetched.status == "ok" and prefetched.is_article:
+                    links = crawler.filter_links(url, prefetched.links)
+                else:
+                    links = crawler.filter_links(url, probe["links"])
+                record["links"] = len(links)
+            crawler.log_highlight(f"找到 {len(links)} 个有效链接")
+
+        metrics.page_done(url, depth, size)
+        validators, is_index = crawler.page_validators(prefetched, probe)
+        await self._blocking(self._record_page, url, depth, page_title, save_dir, fingerprint, links, output,
+                             validators, is_index)
+        return save_dir, links
+
+    def _record_page(self, url, depth, page_title, save_dir, fingerprint, links, output, validators, is_index):
+        """更新PDF缓存和爬取状态（在线程池中执行）"""
+        crawler = self.crawler
+        if crawler.cache:
+            crawler.cache.store(url, page_title, output[0], fingerprint, links, validators, is_index)
+        if crawler.state:
+            for link in links:
+                crawler.state.add_pending(link, depth + 1, save_dir)
+            crawler.state.mark_done(url, *output)
+
+    async def _print(self, tab, url, depth, pdf_path):
+        crawler = self.crawler
+        await self._load_images(tab, url, depth)
+        print_options = PRINT_OPTIONS
+        if crawler.print_mode == "article" and \
+                await self._span("article_document", url, depth, self._article_document(tab)):
+            await self._load_images(tab, url, depth)
+            print_options = ARTICLE_PRINT_OPTIONS
+        digest, size = await self._span("print_pdf", url, depth, tab.print_pdf(pdf_path, print_options),
+                                        streamed=True)
+        crawler.log_success(f"PDF已保存: {pdf_path}")
+        return digest, size
+
+    async def _capture(self, tab, url, depth, path, kind):
+        """保存MHTML快照或单文件HTML，不经过打印"""
+        await self._load_images(tab, url, depth)
+        if kind == "mhtml":
+            snapshot = self._span("capture", url, depth, tab.send("Page.captureSnapshot", {"format": "mhtml"}),
+                                  format=kind)
+            text = (await snapshot)["data"]
+        else:
+            text = await self._span("capture", url, depth, self._single_file_html(tab), format=kind)
+        loop = asyncio.get_running_loop()
+        digest, size = await self._span("write_capture", url, depth,
+                                        loop.run_in_executor(None, write_capture, path, text))
+        self.crawler.log_success(f"{kind.upper()}已保存: {path}")
+        return digest, size
+
+    async def _single_file_html(self, tab):
+        """序列化页面，图片和样式表取自标签页中已加载的资源并内联"""
+        images, styles = {}, {}
+        for frame_id, resource in inline_targets(await tab.send("Page.getResourceTree")):
+            try:
+                content = await tab.send("Page.getResourceContent", {"frameId": frame_id, "url": resource["url"]})
+            except CDPError:
+                continue  # 资源已不在缓存中，保留原地址
+            add_inline(images, styles, resource, content)
+        return await tab.evaluate(SINGLE_FILE_HTML_JS, images, styles)
+
+    async def _load_images(self, tab, url, depth):
+        crawler = self.crawler
+        timeout = crawler.image_timeout
+        loaded = await self._span("lazy_images", url, depth, tab.evaluate(
+            LAZY_IMAGES_JS, int(timeout * 1000), await_promise=True, timeout=timeout + 5))
+        if loaded and loaded["timedOut"]:
+            crawler.log_warning(f"图片加载超时 ({timeout} 秒)：已加载 {loaded['loaded']}/{loaded['total']} 张")
+
+    async def _article_document(self, tab):
+        """将标签页替换为只含标题、作者信息和正文的精简文档，失败时返回False按整页打印"""
+        try:
+            html = await tab.evaluate(ARTICLE_DOCUMENT_JS, ARTICLE_PRINT_CSS)
+            if not html:
+                self.crawler.log_debug("页面没有文章正文，按整页打印")
+                return False
+            tree = await tab.send("Page.getFrameTree")
+            await tab.send("Page.setDocumentContent", {"frameId": tree["frameTree"]["frame"]["id"], "html": html})
+        except CDPError as e:
+            self.crawler.log_warning(f"生成正文打印文档失败，按整页打印: {e}")
+            return False
+        return True
+
+    def print_summary(self):
+        self.crawler.print_summary()
+
+    def stop(self):
+        self._stop = True
+
+    def close(self):
+        """浏览器在 run 结束时已关闭，这里只设置停止标志"""
+        self._stop = True
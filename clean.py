@@ -3,14 +3,20 @@ import shutil
 import argparse
 from pathlib import Path
 
-def clean_cache():
+from asset_cache import AssetCache
+from cache import PdfCache
+
+def clean_cache(asset_cache=os.path.join('pdfs', '.asset_cache')):
     """清理浏览器缓存和临时文件"""
     cache_paths = [
+        # 爬虫的静态资源缓存
+        asset_cache,
         # Chrome缓存目录
         os.path.expanduser('~/.cache/chromium'),
         os.path.expanduser('~/.cache/google-chrome'),
         # ChromeDriver缓存
         os.path.expanduser('~/.wdm'),
+        os.path.join('pdfs', '.driver_paths.json'),
         # 其他可能的缓存目录
         './__pycache__',
         './chromedriver_win32',
@@ -39,25 +45,70 @@ def clean_pdfs():
         except Exception as e:
             print(f"清理PDF目录时出错: {e}")
 
+def gc_pdf_cache(cache_path, max_age_days=None):
+    """清理PDF缓存索引中失效的记录，并按最近使用时间淘汰旧记录"""
+    if not os.path.exists(cache_path):
+        print(f"PDF缓存不存在: {cache_path}")
+        return
+    try:
+        cache = PdfCache(cache_path)
+        missing, evicted = cache.gc(max_age_days)
+        cache.close()
+        print(f"已清理PDF缓存: 失效记录 {missing} 条，淘汰记录 {evicted} 条")
+    except Exception as e:
+        print(f"清理PDF缓存时出错: {e}")
+
+def prune_asset_cache(root, max_mb):
+    """将静态资源缓存裁剪到指定容量以内，按最近使用时间淘汰空闲槽位"""
+    if not os.path.exists(root):
+        print(f"静态资源缓存不存在: {root}")
+        return
+    try:
+        cache = AssetCache(root, max_mb << 20)
+        removed, freed = cache.prune()
+        print(f"已裁剪静态资源缓存: 删除槽位 {removed} 个，释放 {freed / 1048576:.1f} MB，"
+              f"当前 {cache.size() / 1048576:.1f} MB")
+    except Exception as e:
+        print(f"裁剪静态资源缓存时出错: {e}")
+
 def main():
     parser = argparse.ArgumentParser(description='清理工具')
     parser.add_argument('-a', '--all', action='store_true',
                       help='清理所有内容（缓存和PDF）')
     parser.add_argument('-c', '--cache', action='store_true',
                       help='仅清理缓存')
+    parser.add_argument('-g', '--gc', action='store_true',
+                      help='清理PDF缓存索引中失效的记录（不删除PDF）')
+    parser.add_argument('--max-age', type=float, metavar='days',
+                      help='与 -g 同用，淘汰超过指定天数未使用的缓存记录')
+    parser.add_argument('--pdf-cache', default=os.path.join('pdfs', '.pdf_cache.db'), metavar='file',
+                      help='PDF缓存索引路径 (默认: pdfs/.pdf_cache.db)')
+    parser.add_argument('--asset-cache', default=os.path.join('pdfs', '.asset_cache'), metavar='dir',
+                      help='静态资源缓存目录 (默认: pdfs/.asset_cache)')
+    parser.add_argument('--asset-cache-size', type=int, metavar='MB',
+                      help='与 -g 同用，将静态资源缓存裁剪到指定容量以内')
     args = parser.parse_args()
 
-    if not (args.all or args.cache):
+    if not (args.all or args.cache or args.gc):
         parser.print_help()
         return
 
+    if args.gc:
+        print("清理PDF缓存索引...")
+        gc_pdf_cache(args.pdf_cache, args.max_age)
+        if args.asset_cache_size is not None:
+            prune_asset_cache(args.asset_cache, args.asset_cache_size)
+        if not (args.all or args.cache):
+            print("清理完成！")
+            return
+
     if args.all:
         print("清理所有内容...")
-        clean_cache()
+        clean_cache(args.asset_cache)
         clean_pdfs()
     elif args.cache:
         print("清理缓存...")
-        clean_cache()
+        clean_cache(args.asset_cache)
 
     print("清理完成！")
 
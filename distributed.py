@@ -0,0 +1,553 @@
+"""分布式爬取：多台机器从共享任务队列领取 (url, 深度, 父目录) 任务
+
+协调者 (coordinator) 写入起始URL并监控进度；工作节点 (worker) 以租约方式领取任务，
+处理期间定时续约，完成后把发现的链接和结果写回队列。工作节点崩溃或失联时租约过期，
+任务自动回到待处理状态，由其他节点重新领取；反复过期的任务标记为失败，避免拖垮整个集群。
+
+队列后端可替换：
+    sqlite:///共享路径/queue.db  - 多台机器挂载同一目录即可，无需额外服务
+    redis://host:6379/0         - Redis或兼容服务（需要 redis 包）
+
+父目录以相对输出根目录的路径保存，各节点可以把共享的输出目录挂载在不同位置。
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from collections import Counter, namedtuple
+
+from frontier import canonicalize_url
+
+PENDING = "pending"    # 等待领取
+LEASED = "leased"      # 已被工作节点领取，租约未过期
+DONE = "done"          # 已保存
+SKIPPED = "skipped"    # 文章失效等原因跳过
+LOGIN = "login"        # 需要登录，协调者写入登录报告，登录后用 -R 重新排队
+FAILED = "failed"      # 处理出错，或租约反复过期
+
+Job = namedtuple("Job", "key url depth parent_dir attempts")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    parent_dir TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    output_path TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, depth);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(status, lease_until);
+"""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class SqliteQueue:
+    """基于SQLite的任务队列，数据库放在各节点都能访问的共享路径上
+
+    多台机器通过网络文件系统共享时WAL模式不可用，使用默认的回滚日志，
+    每次领取在 BEGIN IMMEDIATE 事务中完成，保证同一任务只被一个节点领取。
+    """
+
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+
+    def _transaction(self, work):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def reset(self):
+        self._transaction(lambda conn: conn.execute("DELETE FROM jobs"))
+
+    @staticmethod
+    def _insert(conn, url, depth, parent_dir):
+        return conn.execute(
+            "INSERT OR IGNORE INTO jobs (key, url, depth, parent_dir, status, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (canonicalize_url(url), url, depth, parent_dir, PENDING, time.time()),
+        ).rowcount
+
+    def push(self, url, depth, parent_dir):
+        """加入一个任务，规范化URL已存在时忽略并返回False"""
+        return bool(self._transaction(lambda conn: self._insert(conn, url, depth, parent_dir)))
+
+    def claim(self, worker, lease):
+        """领取一个待处理或租约已过期的任务（浅层优先），没有任务时返回None"""
+        def work(conn):
+            now = time.time()
+            while True:
+                row = conn.execute(
+                    "SELECT key, url, depth, parent_dir, attempts FROM jobs "
+                    "WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY depth, rowid LIMIT 1",
+                    (PENDING, LEASED, now),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["attempts"] >= self.max_attempts:
+                    conn.execute("UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, error = ?, "
+                                 "updated_at = ? WHERE key = ?",
+                                 (FAILED, "租约多次过期", now, row["key"]))
+                    continue
+                conn.execute("UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, "
+                             "updated_at = ? WHERE key = ?",
+                             (LEASED, worker, now + lease, now, row["key"]))
+                return Job(row["key"], row["url"], row["depth"], row["parent_dir"], row["attempts"] + 1)
+        return self._transaction(work)
+
+    def renew(self, job, worker, lease):
+        """延长租约；任务已被其他节点重新领取时返回False"""
+        return bool(self._transaction(lambda conn: conn.execute(
+            "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE key = ? AND status = ? AND worker = ?",
+            (time.time() + lease, time.time(), job.key, LEASED, worker),
+        ).rowcount))
+
+    def complete(self, job, worker, status, links=(), output_path=None, error=None):
+        """写回处理结果，并在同一事务中加入发现的链接 [(url, 深度, 父目录)]
+
+        只有仍持有租约的节点能写回；租约已过期、任务已被重新领取或已有结果时返回False，
+        迟到的结果和链接都被丢弃。
+        """
+        def work(conn):
+            applied = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, output_path = ?, "
+                "error = ?, updated_at = ? WHERE key = ? AND status = ? AND worker = ?",
+                (status, output_path, error, time.time(), job.key, LEASED, worker),
+            ).rowcount
+            if applied:
+                for url, depth, parent_dir in links:
+                    self._insert(conn, url, depth, parent_dir)
+            return bool(applied)
+        return self._transaction(work)
+
+    def jobs(self, status):
+        """某个状态的全部任务 [(url, 深度, 父目录)]"""
+        with self._lock:
+            rows = self._conn.execute("SELECT url, depth, parent_dir FROM jobs WHERE status = ? ORDER BY rowid",
+                                      (status,)).fetchall()
+        return [(row["url"], row["depth"], row["parent_dir"]) for row in rows]
+
+    def retry(self, status):
+        """将某个状态的任务放回待处理，并清零租约次数，返回数量"""
+        return self._transaction(lambda conn: conn.execute(
+            "UPDATE jobs SET status = ?, attempts = 0, error = NULL, updated_at = ? WHERE status = ?",
+            (PENDING, time.time(), status),
+        ).rowcount)
+
+    def requeue_expired(self):
+        """将租约已过期的任务放回待处理状态，返回数量"""
+        return self._transaction(lambda conn: conn.execute(
+            "UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE status = ? AND lease_until < ?",
+            (PENDING, time.time(), LEASED, time.time()),
+        ).rowcount)
+
+    def stats(self):
+        """各状态的任务数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall()
+        return Counter({row["status"]: row["count"] for row in rows})
+
+    def finished(self):
+        """没有待处理和处理中的任务"""
+        stats = self.stats()
+        return not stats[PENDING] and not stats[LEASED]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Redis后端的Lua脚本：领取、续约和入队都在服务端原子执行
+_REQUEUE_LUA = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, key in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], key)
+    redis.call('HDEL', KEYS[3], key)
+    redis.call('HSET', KEYS[4], key, 'pending')
+    redis.call('ZADD', KEYS[1], redis.call('HGET', KEYS[6], key), key)
+end
+"""
+
+REQUEUE_LUA = _REQUEUE_LUA + "return #expired"
+
+CLAIM_LUA = _REQUEUE_LUA + """
+while true do
+    local key = redis.call('ZRANGE', KEYS[1], 0, 0)[1]
+    if not key then return false end
+    redis.call('ZREM', KEYS[1], key)
+    local attempts = redis.call('HINCRBY', KEYS[5], key, 1)
+    if attempts > tonumber(ARGV[4]) then
+        redis.call('HSET', KEYS[4], key, 'failed')
+        redis.call('HSET', KEYS[7], key, ARGV[5])
+    else
+        redis.call('ZADD', KEYS[2], ARGV[2], key)
+        redis.call('HSET', KEYS[3], key, ARGV[3])
+        redis.call('HSET', KEYS[4], key, 'leased')
+        return {key, attempts}
+    end
+end
+"""
+
+PUSH_LUA = """
+if redis.call('HSETNX', KEYS[1], ARGV[1], 'pending') == 0 then return 0 end
+local score = tonumber(ARGV[2]) * 1000000000 + redis.call('INCR', KEYS[2])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+redis.call('HSET', KEYS[4], ARGV[1], score)
+redis.call('ZADD', KEYS[5], score, ARGV[1])
+return 1
+"""
+
+RENEW_LUA = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then return 0 end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+return 1
+"""
+
+COMPLETE_LUA = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] or redis.call('HGET', KEYS[3], ARGV[1]) ~= 'leased' then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+redis.call('HSET', KEYS[4], ARGV[1], ARGV[4])
+return 1
+"""
+
+RETRY_LUA = """
+local count = 0
+local entries = redis.call('HGETALL', KEYS[1])
+for i = 1, #entries, 2 do
+    local key = entries[i]
+    if entries[i + 1] == ARGV[1] then
+        redis.call('HSET', KEYS[1], key, 'pending')
+        redis.call('HDEL', KEYS[2], key)
+        redis.call('HDEL', KEYS[3], key)
+        redis.call('ZADD', KEYS[4], redis.call('HGET', KEYS[5], key), key)
+        count = count + 1
+    end
+end
+return count
+"""
+
+
+class RedisQueue:
+    """基于Redis（或兼容服务）的任务队列
+
+    待处理任务按 深度 * 10^9 + 序号 排序（浅层优先），租约保存在以过期时间排序的集合中。
+    """
+
+    def __init__(self, url, max_attempts=3, namespace="webpagetopdf", client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("Redis任务队列需要 redis 包，请运行：pip install redis")
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.max_attempts = max_attempts
+        self.keys = {name: f"{namespace}:{name}" for name in
+                     ("jobs", "pending", "score", "leases", "owner", "status", "attempts", "results", "seq")}
+        self._claim = client.register_script(CLAIM_LUA)
+        self._requeue = client.register_script(REQUEUE_LUA)
+        self._push = client.register_script(PUSH_LUA)
+        self._renew = client.register_script(RENEW_LUA)
+        self._complete = client.register_script(COMPLETE_LUA)
+        self._retry = client.register_script(RETRY_LUA)
+
+    def _lease_keys(self):
+        k = self.keys
+        return [k["pending"], k["leases"], k["owner"], k["status"], k["attempts"], k["score"], k["results"]]
+
+    def reset(self):
+        self.client.delete(*self.keys.values())
+
+    def push(self, url, depth, parent_dir):
+        k = self.keys
+        payload = json.dumps([url, depth, parent_dir], ensure_ascii=False)
+        return bool(self._push(keys=[k["status"], k["seq"], k["jobs"], k["score"], k["pending"]],
+                               args=[canonicalize_url(url), depth, payload]))
+
+    def claim(self, worker, lease):
+        now = time.time()
+        error = json.dumps({"error": "租约多次过期"}, ensure_ascii=False)
+        result = self._claim(keys=self._lease_keys(), args=[now, now + lease, worker, self.max_attempts, error])
+        if not result:
+            return None
+        key, attempts = result
+        url, depth, parent_dir = json.loads(self.client.hget(self.keys["jobs"], key))
+        return Job(key, url, depth, parent_dir, int(attempts))
+
+    def renew(self, job, worker, lease):
+        return bool(self._renew(keys=[self.keys["leases"], self.keys["owner"]],
+                                args=[job.key, worker, time.time() + lease]))
+
+    def complete(self, job, worker, status, links=(), output_path=None, error=None):
+        k = self.keys
+        if self.client.hget(k["owner"], job.key) != worker:
+            return False  # 租约已失效，丢弃迟到的结果
+        # 先加入发现的链接再写结果：中途崩溃时任务会被重新处理，链接入队是幂等的
+        for url, depth, parent_dir in links:
+            self.push(url, depth, parent_dir)
+        result = json.dumps({"output_path": output_path, "error": error}, ensure_ascii=False)
+        return bool(self._complete(keys=[k["leases"], k["owner"], k["status"], k["results"]],
+                                   args=[job.key, worker, status, result]))
+
+    def jobs(self, status):
+        k = self.keys
+        keys = [key for key, value in self.client.hgetall(k["status"]).items() if value == status]
+        keys.sort(key=lambda key: float(self.client.hget(k["score"], key)))
+        return [tuple(json.loads(self.client.hget(k["jobs"], key))) for key in keys]
+
+    def retry(self, status):
+        k = self.keys
+        return int(self._retry(keys=[k["status"], k["attempts"], k["results"], k["pending"], k["score"]],
+                               args=[status]))
+
+    def requeue_expired(self):
+        return int(self._requeue(keys=self._lease_keys(), args=[time.time()]))
+
+    def stats(self):
+        return Counter(self.client.hvals(self.keys["status"]))
+
+    def finished(self):
+        return not self.client.zcard(self.keys["pending"]) and not self.client.zcard(self.keys["leases"])
+
+    def close(self):
+        self.client.close()
+
+
+def open_queue(spec, max_attempts=3):
+    """按地址打开队列：redis://... 使用Redis，sqlite:///路径 或普通路径使用SQLite"""
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisQueue(spec, max_attempts=max_attempts)
+    if spec.startswith("sqlite:///"):
+        spec = spec[len("sqlite:///"):]
+    return SqliteQueue(spec, max_attempts=max_attempts)
+
+
+def format_stats(stats):
+    return "，".join(f"{label} {stats[status]}" for status, label in (
+        (PENDING, "待处理"), (LEASED, "处理中"), (DONE, "完成"), (SKIPPED, "跳过"), (LOGIN, "需要登录"),
+        (FAILED, "失败")))
+
+
+class Coordinator:
+    """写入起始URL，定期回收过期租约并报告进度，直到队列中的任务全部处理完"""
+
+    def __init__(self, queue, interval=10, log=print):
+        self.queue = queue
+        self.interval = interval
+        self.log = log
+        self._stop = False
+
+    def seed(self, urls, parent_dir="."):
+        """加入起始URL（深度0），返回新加入的数量"""
+        return sum(self.queue.push(url, 0, parent_dir) for url in urls)
+
+    def monitor(self):
+        while not self._stop:
+            requeued = self.queue.requeue_expired()
+            if requeued:
+                self.log(f"回收了 {requeued} 个过期租约，任务已重新排队")
+            stats = self.queue.stats()
+            self.log(f"队列进度：{format_stats(stats)}")
+            if not stats[PENDING] and not stats[LEASED]:
+                return stats
+            deadline = time.monotonic() + self.interval
+            while not self._stop and time.monotonic() < deadline:
+                time.sleep(0.5)
+        return self.queue.stats()
+
+    def write_login_report(self, path, output_root):
+        """将需要登录的任务写入报告（与单机模式格式相同），返回数量"""
+        jobs = self.queue.jobs(LOGIN)
+        if not jobs:
+            if os.path.exists(path):
+                os.remove(path)
+            return 0
+        with open(path, "w", encoding="utf-8") as f:
+            for url, depth, parent_dir in jobs:
+                f.write(f"{url}\t{depth}\t{os.path.normpath(os.path.join(output_root, parent_dir))}\n")
+        return len(jobs)
+
+    def stop(self):
+        self._stop = True
+
+    def close(self):
+        self._stop = True
+
+
+class _LeaseKeeper:
+    """处理页面期间在后台线程中定时续约"""
+
+    def __init__(self, queue, job, worker, lease, log):
+        self.queue, self.job, self.worker, self.lease, self.log = queue, job, worker, lease, log
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"lease-{worker}")
+
+    def _run(self):
+        while not self._done.wait(self.lease / 3):
+            try:
+                if not self.queue.renew(self.job, self.worker, self.lease):
+                    self.log(f"租约已失效，任务可能已被其他节点领取: {self.job.url}")
+                    return
+            except Exception as e:
+                self.log(f"续约失败: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+
+
+class DistributedWorker:
+    """工作节点：每个爬虫实例（一个浏览器）一个线程，从共享队列领取任务
+
+    PDF写入共享的输出根目录，队列中保存相对该目录的父目录。
+    """
+
+    def __init__(self, queue, crawlers, output_root="pdfs", lease=300, poll=2.0, worker_id=None):
+        self.queue = queue
+        self.crawlers = crawlers
+        self.output_root = output_root
+        self.lease = lease
+        self.poll = poll
+        self.worker_id = worker_id or default_worker_id()
+        self.processed = Counter()
+        self._lock = threading.Lock()
+        self._stop = False
+
+    def _local_dir(self, parent_dir):
+        return os.path.normpath(os.path.join(self.output_root, parent_dir))
+
+    def _shared_dir(self, save_dir):
+        return os.path.relpath(save_dir, self.output_root)
+
+    def _loop(self, crawler, worker_id):
+        while not self._stop and not crawler._stop:
+            job = self.queue.claim(worker_id, self.lease)
+            if job is None:
+                # 其他节点仍在处理时可能产生新任务，全部处理完才退出
+                if self.queue.finished():
+                    return
+                time.sleep(self.poll)
+                continue
+            self._process(crawler, worker_id, job)
+
+    def _complete(self, crawler, worker_id, job, status, **result):
+        """写回结果；租约已被其他节点接手时结果作废，以接手节点的结果为准"""
+        if not self.queue.complete(job, worker_id, status, **result):
+            crawler.log_warning(f"租约已失效，处理结果未写回队列: {job.url}")
+            return
+        self._count(status)
+
+    def _process(self, crawler, worker_id, job):
+        if job.depth > crawler.max_depth:
+            self._complete(crawler, worker_id, job, SKIPPED, error="超过最大深度")
+            return
+        if job.attempts > 1:
+            crawler.log_warning(f"重新处理租约过期的任务（第 {job.attempts} 次）: {job.url}")
+        crawler.log_highlight(f"\n当前深度: {job.depth}, 处理页面: {job.url}")
+        try:
+            with _LeaseKeeper(self.queue, job, worker_id, self.lease, crawler.log_warning):
+                result = crawler.process_with_retry(job.url, job.depth, self._local_dir(job.parent_dir))
+                if result and crawler.pending_write:
+                    # PDF落盘后才写回完成，节点在写入前崩溃时任务随租约过期重新处理
+                    crawler.pending_write.result()
+        except Exception as e:
+            crawler.metrics.failure(job.url, job.depth, type(e).__name__)
+            if crawler.debug:
+                print(f"处理页面时出错 {job.url}: {str(e)}")
+                print(traceback.format_exc())
+            else:
+                print(f"处理页面时出错: {job.url}")
+            if crawler._stop:
+                return  # 中断时不写回结果，租约过期后由其他节点重新处理
+            self._complete(crawler, worker_id, job, FAILED, error=str(e))
+            return
+        if not result:
+            if job.url in crawler.deferred_logins:
+                self._complete(crawler, worker_id, job, LOGIN, error="需要登录")
+            else:
+                self._complete(crawler, worker_id, job, SKIPPED)
+            return
+        save_dir, links = result
+        shared = self._shared_dir(save_dir)
+        self._complete(crawler, worker_id, job, DONE, links=[(link, job.depth + 1, shared) for link in links],
+                       output_path=crawler.last_output[0])
+
+    def _count(self, status):
+        with self._lock:
+            self.processed[status] += 1
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self._loop, args=(crawler, f"{self.worker_id}-{i}"),
+                             name=f"crawler-{i}", daemon=True)
+            for i, crawler in enumerate(self.crawlers, 1)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            print("\n\n爬取过程被用户中断...")
+        finally:
+            self._stop = True
+            for crawler in self.crawlers:
+                crawler._stop = True
+            for thread in threads:
+                thread.join(timeout=10)
+
+    def print_summary(self):
+        stats = {'pages': 0, 'waited': 0.0, 'saved': 0.0, 'timeouts': 0, 'blocked': 0}
+        for crawler in self.crawlers:
+            for key in stats:
+                stats[key] += crawler.ready_stats[key]
+        self.crawlers[0].print_summary(stats)
+        self.crawlers[0].log_box(
+            f"分布式队列\n\n"
+            f"本节点 ({self.worker_id}) 处理: 完成 {self.processed[DONE]}，"
+            f"跳过 {self.processed[SKIPPED]}，需要登录 {self.processed[LOGIN]}，失败 {self.processed[FAILED]}\n"
+            f"整个队列: {format_stats(self.queue.stats())}"
+        )
+
+    def stop(self):
+        self._stop = True
+
+    def close(self):
+        self._stop = True
+        for crawler in self.crawlers:
+            crawler.close()
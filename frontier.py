@@ -0,0 +1,143 @@
+"""爬取边界（frontier）：入队时按规范化URL去重，按 BFS / DFS / 优先级顺序调度
+
+与递归深度优先相比，链接在发现时即被占用，同一链接出现在多个页面上也只会入队一次；
+每层页数预算和总页数上限让大规模爬取的内存和耗时可预期。
+"""
+import heapq
+import itertools
+import threading
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from cache import ARTICLE_KEYS, WECHAT_HOST, article_id, canonical_article_url
+
+ORDERS = ("bfs", "dfs", "priority")
+
+# 微信分享、统计相关的参数，不影响页面内容。key、from、lang 等名称在其他站点上
+# 往往是真正的页面参数，只在微信域名下去除
+WECHAT_TRACKING_PARAMS = {
+    "chksm", "scene", "subscene", "srcid", "sharer_sharetime", "sharer_shareid",
+    "sharer_shareinfo", "sharer_shareinfo_first", "from", "isappinstalled",
+    "clicktime", "enterid", "ascene", "devicetype", "version", "nettype", "lang",
+    "exportkey", "pass_ticket", "wx_header", "key", "uin", "sessionid",
+    "share_token", "abtest_cookie", "poc_token", "mpshare", "realreporttime",
+}
+
+
+def is_tracking_param(key, host):
+    """utm_* 在所有站点上去除，微信分享参数只在微信域名下去除"""
+    return key.startswith("utm_") or (host == WECHAT_HOST and key in WECHAT_TRACKING_PARAMS)
+
+
+def canonicalize_url(url):
+    """去掉片段标识和跟踪参数；微信文章规范化为 __biz + mid + idx + sn"""
+    parsed = urlparse(url)
+    if parsed.netloc == WECHAT_HOST and article_id(url):
+        return canonical_article_url(url)
+    query = sorted((key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+                   if not is_tracking_param(key, parsed.netloc))
+    return urlunparse(parsed._replace(query=urlencode(query), fragment=""))
+
+
+def default_priority(url, depth):
+    """默认优先级：浅层优先，同层中微信文章链接优先于其他页面"""
+    query = dict(parse_qsl(urlparse(url).query))
+    is_article = all(query.get(key) for key in ARTICLE_KEYS)
+    return depth * 2 + (0 if is_article else 1)
+
+
+def parse_depth_budgets(text):
+    """解析 "1:50,2:200" 形式的每层页数预算"""
+    budgets = {}
+    if not text:
+        return budgets
+    for item in text.split(","):
+        depth, _, limit = item.partition(":")
+        budgets[int(depth)] = int(limit)
+    return budgets
+
+
+class Frontier:
+    """线程安全的爬取边界，元素为 (url, 深度, 父目录) 任务"""
+
+    def __init__(self, order="bfs", max_pages=0, depth_budgets=None, priority=None, on_drop=None):
+        if order not in ORDERS:
+            raise ValueError(f"未知的调度顺序: {order}")
+        self.order = order
+        self.max_pages = max_pages
+        self.depth_budgets = dict(depth_budgets or {})
+        self.priority = priority or default_priority
+        self.on_drop = on_drop  # on_drop(url, 原因)：链接未被接受时调用，例如在状态库中标记，续爬时不再重放
+        self.seen = {}  # 规范化URL -> 入队时的原始URL
+        self.admitted = 0
+        self.admitted_by_depth = {}
+        self.dropped = 0
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    def _key(self, url, depth, seq):
+        if self.order == "bfs":
+            return (depth, seq)
+        if self.order == "dfs":
+            return (-seq,)
+        return (self.priority(url, depth), seq)
+
+    def mark_seen(self, finished):
+        """标记已完成的URL {url: 深度}（续爬时使用），之后不再入队，并计入总页数和每层预算"""
+        with self._cond:
+            for url, depth in finished.items():
+                canonical = canonicalize_url(url)
+                if canonical in self.seen:
+                    continue
+                self.seen[canonical] = url
+                self.admitted += 1
+                self.admitted_by_depth[depth] = self.admitted_by_depth.get(depth, 0) + 1
+
+    def push(self, url, depth, parent_dir):
+        """入队一个任务；重复的URL或超出预算时返回False"""
+        canonical = canonicalize_url(url)
+        with self._cond:
+            reason = None
+            if canonical in self.seen:
+                if self.seen[canonical] == url:
+                    return False  # 同一个链接，状态由第一次入队的任务记录
+                reason = "重复链接"
+            elif self.max_pages and self.admitted >= self.max_pages:
+                reason = "超出总页数上限"
+            else:
+                budget = self.depth_budgets.get(depth)
+                if budget is not None and self.admitted_by_depth.get(depth, 0) >= budget:
+                    reason = f"超出第 {depth} 层页数预算"
+            if not reason:
+                self.seen[canonical] = url
+                self.admitted += 1
+                self.admitted_by_depth[depth] = self.admitted_by_depth.get(depth, 0) + 1
+                seq = next(self._counter)
+                heapq.heappush(self._heap, (self._key(url, depth, seq), (url, depth, parent_dir)))
+                self._cond.notify()
+                return True
+            if canonical not in self.seen:
+                self.dropped += 1
+        if self.on_drop:
+            self.on_drop(url, reason)
+        return False
+
+    def retry(self, url, depth, parent_dir):
+        """重新入队一个已处理过的任务（例如登录后重试），不受去重和预算限制"""
+        with self._cond:
+            seq = next(self._counter)
+            heapq.heappush(self._heap, (self._key(url, depth, seq), (url, depth, parent_dir)))
+            self._cond.notify()
+
+    def pop(self, timeout=None):
+        """取出下一个任务；队列为空时最多等待 timeout 秒，仍为空则返回None"""
+        with self._cond:
+            if not self._heap and timeout:
+                self._cond.wait(timeout)
+            if not self._heap:
+                return None
+            return heapq.heappop(self._heap)[1]
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
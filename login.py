@@ -0,0 +1,105 @@
+"""登录状态：持久化Cookie，以及需要登录的页面的延后队列和报告
+
+Cookie通过CDP导出导入（Network.getAllCookies / Network.setCookies），
+保存在本地JSON文件中，所有浏览器实例和后续运行共用，只需登录一次。
+"""
+import json
+import os
+import threading
+import time
+
+# Network.setCookies 接受的字段
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires",
+                 "priority", "sourceScheme", "sourcePort")
+
+
+def _cookie_key(cookie):
+    return cookie.get("domain"), cookie.get("path"), cookie.get("name")
+
+
+class CookieStore:
+    """本地Cookie文件，多个浏览器写入时按 (域名, 路径, 名称) 合并"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self):
+        """读取未过期的Cookie，转换为 Network.setCookies 的参数格式"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                cookies = json.load(f)
+        except (OSError, ValueError):
+            return []
+        now = time.time()
+        result = []
+        for cookie in cookies:
+            if cookie.get("session") or cookie.get("expires", -1) < 0:
+                cookie = {key: value for key, value in cookie.items() if key != "expires"}
+            elif cookie["expires"] < now:
+                continue
+            result.append({key: cookie[key] for key in COOKIE_FIELDS if key in cookie})
+        return result
+
+    def save(self, cookies):
+        """与已保存的Cookie合并后写入，文件权限仅限当前用户"""
+        if not cookies:
+            return 0
+        with self._lock:
+            merged = {_cookie_key(cookie): cookie for cookie in self.load()}
+            for cookie in cookies:
+                merged[_cookie_key(cookie)] = {key: cookie[key] for key in COOKIE_FIELDS + ("session",)
+                                               if key in cookie}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".part"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(list(merged.values()), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            return len(merged)
+
+
+class DeferredLogins:
+    """需要登录的页面：爬取时先跳过，结束后统一重试，仍未解决的写入报告"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}  # url -> (url, 深度, 父目录)
+        self._resolved = set()
+
+    def add(self, url, depth, parent_dir):
+        with self._lock:
+            self._jobs.setdefault(url, (url, depth, parent_dir))
+
+    def resolve(self, url):
+        """页面已成功保存"""
+        with self._lock:
+            if url in self._jobs:
+                self._resolved.add(url)
+
+    def pending(self):
+        """尚未解决的任务 (url, 深度, 父目录)"""
+        with self._lock:
+            return [job for url, job in self._jobs.items() if url not in self._resolved]
+
+    def __len__(self):
+        return len(self.pending())
+
+    def __contains__(self, url):
+        """页面需要登录且尚未解决"""
+        with self._lock:
+            return url in self._jobs and url not in self._resolved
+
+    def write_report(self, path):
+        """将仍需登录的页面写入报告，每行一个: URL<TAB>深度<TAB>保存目录"""
+        pending = self.pending()
+        if not pending:
+            if os.path.exists(path):
+                os.remove(path)
+            return 0
+        with open(path, "w", encoding="utf-8") as f:
+            for url, depth, parent_dir in pending:
+                f.write(f"{url}\t{depth}\t{parent_dir}\n")
+        return len(pending)
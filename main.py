@@ -1,29 +1,34 @@
 import sys
 import signal
+import time
+
+STARTED = time.perf_counter()  # 启动耗时统计的起点，早于其他模块的导入
 
 # 添加信号处理函数
 def signal_handler(signum, frame):
+    # 抛出异常而不是直接退出，让主程序关闭浏览器和状态库；
+    # 正在处理的页面在状态库中保持 running，续爬时会重新处理
     print("\n\n程序被用户中断，正在清理资源并退出...")
-    sys.exit(0)
+    raise KeyboardInterrupt
 
 # 注册信号处理器
 signal.signal(signal.SIGINT, signal_handler)  # 处理 Ctrl+C
 signal.signal(signal.SIGTERM, signal_handler) # 处理终止信号
 
 def check_dependencies():
-    """检查必要的依赖是否已安装"""
+    """检查必要的依赖是否已安装（只查找模块，不导入，避免拖慢启动）"""
+    from importlib.util import find_spec
+
     required_packages = {
         'selenium': 'selenium',
-        'webdriver_manager': 'webdriver-manager',
-        'colorama': 'colorama'
+        'colorama': 'colorama',
+        'requests': 'requests'
     }
     
     missing_packages = []
     
     for module, package in required_packages.items():
-        try:
-            __import__(module)
-        except ImportError:
+        if find_spec(module) is None:
             missing_packages.append(package)
     
     if missing_packages:
@@ -39,40 +44,298 @@ def check_dependencies():
 # 在程序开始时检查依赖
 check_dependencies()
 
-import time
 import os
 import json
 import base64
 import traceback
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+import threading
+import hashlib
+import tracemalloc
+from pathlib import Path
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import WebDriverException
-from concurrent.futures import ProcessPoolExecutor
-from webdriver_manager.chrome import ChromeDriverManager
 import argparse
 from urllib.parse import urlparse
 from colorama import init, Fore, Style
+from state import CrawlState
+from cache import PdfCache, canonical_article_url, link_file
+from metrics import Instrumentation
+from frontier import Frontier, ORDERS, parse_depth_budgets
+from asset_cache import AssetCache
+from pipeline import PdfWriter, write_pdf
+from login import CookieStore, DeferredLogins
+from resilience import CRASH, KIND_LABELS, NETWORK, THROTTLED, THROTTLE_PATTERNS, HostGuard, RetryPolicy, Throttled, \
+    classify_error, is_throttled, sleep
+from render_profile import PROFILES, blocked_url_patterns, chrome_args
+from manifest import Manifest
+from archive import FORMATS, OUTPUTS, add_inline, inline_targets, pending_captures, primary_kind, write_capture
+from page_scripts import (READY_STATE_JS, LAZY_IMAGES_JS, PAGE_PROBE_JS, PRINT_OPTIONS, PRINT_MODES,
+                          ARTICLE_DOCUMENT_JS, ARTICLE_PRINT_CSS, ARTICLE_PRINT_OPTIONS, SINGLE_FILE_HTML_JS,
+                          NETWORK_IDLE_SECONDS, READY_POLL_INTERVAL, PDF_STREAM_CHUNK)
+from prefetch import (ERROR_PATTERNS, LOGIN_PATTERNS, MIGRATION_TEXT, MIGRATION_BUTTON_TEXT, VALIDATOR_KEYS,
+                      Prefetcher)
+from startup import DriverPaths, profile
+
+profile.started = STARTED
+profile.mark("导入模块", time.perf_counter() - STARTED)
 
 init()  # 初始化colorama
 
+active_crawlers = []  # 运行中的爬虫，退出时统一关闭浏览器
+active_stores = []    # 打开的状态库和缓存索引，退出时统一关闭
+active_postprocessors = []  # PDF后处理进程池，退出时等待完成
+active_manifests = []  # 输出清单，后处理完成后最后关闭
+
+# 默认放在输出根目录下的文件：命令行参数名 -> 相对输出目录的路径
+OUTPUT_FILES = {
+    'state': '.crawl_state.db',
+    'cache': '.pdf_cache.db',
+    'asset_cache': '.asset_cache',
+    'cookies': '.cookies.json',
+    'login_report': 'login_required.txt',
+    'driver_cache': '.driver_paths.json',
+}
+# 分布式模式 (--queue) 下只供本节点使用的文件，默认放在本机目录而不是共享的输出根目录：
+# 网络文件系统上SQLite的WAL不可用，静态资源缓存的槽位锁和驱动路径也只对本机有效
+NODE_LOCAL_FILES = ('cache', 'asset_cache', 'driver_cache')
+NODE_LOCAL_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'webpagetopdf')
+
+
+class DriverSession:
+    """持久化浏览器会话，在多个起始URL之间复用同一个浏览器
+
+    每次取用前做健康检查，崩溃或卡死的会话会被自动替换；
+    服务页数达到上限后主动回收，避免浏览器内存持续增长。
+    """
+
+    def __init__(self, factory, max_pages=200, health_timeout=10, log=None, before_recycle=None):
+        self.factory = factory
+        self.before_recycle = before_recycle  # 回收健康的浏览器前调用，例如导出Cookie
+        self.max_pages = max_pages
+        self.health_timeout = health_timeout
+        self.log = log or (lambda message: None)
+        self.driver = None
+        self.pages_served = 0
+        self.restarts = 0
+        self._warming = None  # 预热线程
+        self._warm_error = None
+
+    def prewarm(self):
+        """在后台线程中启动浏览器，让主线程同时完成读取URL列表等准备工作"""
+        if self.driver or self._warming:
+            return
+
+        def launch():
+            try:
+                self.driver = self.factory()
+                self.pages_served = 0
+            except Exception as e:
+                self._warm_error = e
+
+        self._warming = threading.Thread(target=launch, name="browser-prewarm", daemon=True)
+        self._warming.start()
+
+    def _join_warming(self):
+        """等待预热中的浏览器启动完成；预热失败时由 acquire 重新启动并报告错误"""
+        warming, self._warming = self._warming, None
+        if not warming:
+            return
+        with profile.span("等待浏览器预热"):
+            warming.join()
+        if self._warm_error:
+            self.log(f"浏览器预热失败，重新启动: {self._warm_error}")
+            self._warm_error = None
+
+    def acquire(self):
+        """返回一个可用的驱动，必要时创建、替换或回收"""
+        self._join_warming()
+        if self.driver and self.max_pages and self.pages_served >= self.max_pages:
+            self.log(f"会话已服务 {self.pages_served} 个页面，回收浏览器")
+            if self.before_recycle:
+                self.before_recycle(self.driver)
+            self.quit()
+        elif self.driver and not self.is_healthy():
+            self.log("浏览器会话无响应或已崩溃，正在替换")
+            self.quit()
+            self.restarts += 1
+
+        if not self.driver:
+            self.driver = self.factory()
+            self.pages_served = 0
+        return self.driver
+
+    def discard(self):
+        """丢弃已崩溃或会话丢失的浏览器，下次取用时重新启动"""
+        self.quit()
+        self.restarts += 1
+
+    def mark_served(self):
+        """记录会话已服务一个页面"""
+        self.pages_served += 1
+
+    def is_healthy(self):
+        """在限定时间内执行一条简单脚本，判断浏览器是否仍然可用"""
+        result = {}
+
+        def ping():
+            try:
+                result['ok'] = self.driver.execute_script("return 1") == 1
+            except Exception:
+                result['ok'] = False
+
+        probe = threading.Thread(target=ping, daemon=True)
+        probe.start()
+        probe.join(self.health_timeout)
+        return result.get('ok', False)
+
+    def quit(self):
+        """关闭浏览器，卡死时直接结束驱动进程"""
+        self._join_warming()
+        driver, self.driver = self.driver, None
+        if not driver:
+            return
+        closer = threading.Thread(target=self._safe_quit, args=(driver,), daemon=True)
+        closer.start()
+        closer.join(self.health_timeout)
+        if closer.is_alive():
+            try:
+                driver.service.process.kill()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _safe_quit(driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+
 class WebCrawler:
-    def __init__(self, max_depth=3, delay=3, debug=False, visible=False):
+    def __init__(self, max_depth=3, delay=3, debug=False, visible=False, max_pages_per_session=200,
+                 image_timeout=10, prefetch=False, state=None, cache=None, stream_pdf=False,
+                 metrics=None, frontier=None, render_profile="full", block_patterns=(),
+                 asset_cache=None, postprocessor=None, writer=None, cookie_store=None,
+                 deferred_logins=None, login_timeout=120, login_report=None, profile_dir=None,
+                 page_load_timeout=30, script_timeout=30, retry_policy=None, host_guard=None,
+                 incremental=False, print_mode="full", output_format="pdf", manifest=None,
+                 driver_paths=None):
         self.max_depth = max_depth
         self.delay = delay
+        self.image_timeout = image_timeout
         self.visited_urls = set()
         self.driver = None
         self.debug = debug
         self.visible = visible
         self._stop = False  # 添加停止标志
+        self._visited_lock = threading.Lock()
+        self._inflight = set()  # 当前页面进行中的网络请求
+        self.ready_stats = {'pages': 0, 'waited': 0.0, 'saved': 0.0, 'timeouts': 0, 'blocked': 0}
+        self.render_profile = render_profile  # full / light，见 render_profile.py
+        self.block_patterns = blocked_url_patterns(render_profile, block_patterns)
+        self.asset_cache = asset_cache  # 跨运行共享的HTTP磁盘缓存 (AssetCache)，为None时使用临时缓存
+        self._asset_slot = None
+        self.postprocessor = postprocessor  # PDF后处理进程池 (PostProcessor)，为None时不处理
+        self.writer = writer  # PDF写入阶段 (PdfWriter)，为None时在浏览器线程中直接写盘
+        self.pending_write = None  # 当前页面尚未完成的写入 (Future)
+        self._login_retried = False
+        self.cookie_store = cookie_store  # 跨浏览器、跨运行共享的Cookie (CookieStore)
+        self.cookies_stale = False  # 其他浏览器登录后，当前浏览器需要重新导入Cookie
+        self.deferred_logins = deferred_logins if deferred_logins is not None else DeferredLogins()
+        self.login_timeout = login_timeout  # 结束时等待用户登录的最长秒数，0表示不等待
+        self.login_report = login_report  # 仍需登录的页面报告路径
+        self.profile_dir = profile_dir  # 持久的Chrome用户目录，登录状态随目录保存
+        self.page_load_timeout = page_load_timeout  # driver.get 的最长等待秒数，避免卡死的页面拖住整个运行
+        self.script_timeout = script_timeout
+        self.retry_policy = retry_policy or RetryPolicy()  # 临时性错误的重试次数和退避
+        self.host_guard = host_guard or HostGuard()  # 按主机限速和熔断，并行时各工作线程共享
+        self.incremental = incremental  # 增量模式：已保存且未变化的文章只做条件请求，索引页重新渲染
+        self.prefetcher = Prefetcher() if prefetch or incremental else None
+        self.state = state  # 持久化爬取状态 (CrawlState)，为None时不记录
+        self.cache = cache  # 按内容寻址的PDF缓存 (PdfCache)，为None时不使用
+        self.stream_pdf = stream_pdf
+        self.print_mode = print_mode  # full 打印整个页面，article 只打印标题、作者信息和正文
+        self.output_kinds = OUTPUTS[output_format]  # 依次保存的文件类型：pdf / mhtml / html
+        self.primary_kind = primary_kind(output_format)  # 缓存和爬取状态中记录的文件类型
+        self.manifest = manifest  # 输出清单 (Manifest)，为None时不记录，跳过检查直接查看磁盘
+        self.driver_paths = driver_paths  # 缓存的驱动路径 (DriverPaths)，为None时每次由Selenium Manager解析
+        self.metrics = metrics or Instrumentation()  # 阶段耗时统计，并行时各工作线程共享
+        # 待爬取任务，所有起始URL共享同一个边界；空的 Frontier 为假值，不能用 or 判断
+        self.frontier = frontier if frontier is not None else Frontier()
+        self._page = (None, None)  # 当前处理的 (url, 深度)，用于标注阶段记录
+        self._parent = None  # 当前页面的父目录，记入输出清单
+        self._refresh = False  # 增量模式下当前页面需要覆盖之前保存的文件
+        self.last_bytes = 0  # 最近一次写入的PDF字节数
+        self.last_output = (None, None)  # 最近一次保存的 (PDF路径, 内容哈希)
+        self.session = DriverSession(self.create_driver, max_pages=max_pages_per_session,
+                                     log=self.log_warning, before_recycle=self.save_cookies)
+
+    def span(self, stage, **fields):
+        """记录当前页面某个阶段的耗时"""
+        url, depth = self._page
+        return self.metrics.span(stage, url=url, depth=depth, **fields)
+
+    def prewarm(self):
+        """在后台提前启动浏览器，首个页面开始处理时直接使用"""
+        self.session.prewarm()
 
     def setup_driver(self):
-        """设置并返回WebDriver实例"""
-        if self.driver:
-            return self.driver
+        """从持久会话中取得WebDriver实例"""
+        self.driver = self.session.acquire()
+        profile.finish("浏览器可用，开始处理首个页面")
+        if self.cookies_stale:
+            self.cookies_stale = False
+            self.load_cookies(self.driver)
+        return self.driver
+
+    def load_cookies(self, driver):
+        """导入保存的Cookie，新浏览器无需重新登录"""
+        if not self.cookie_store:
+            return
+        cookies = self.cookie_store.load()
+        if not cookies:
+            return
+        try:
+            driver.execute_cdp_cmd('Network.setCookies', {'cookies': cookies})
+            self.log_debug(f"已导入 {len(cookies)} 个Cookie")
+        except Exception as e:
+            self.log_warning(f"导入Cookie失败: {str(e)}")
+
+    def save_cookies(self, driver):
+        """导出浏览器当前的全部Cookie"""
+        if not self.cookie_store or not driver:
+            return
+        try:
+            cookies = driver.execute_cdp_cmd('Network.getAllCookies', {}).get('cookies', [])
+            self.cookie_store.save(cookies)
+        except Exception as e:
+            self.log_debug(f"导出Cookie失败: {str(e)}")
+
+    def launch_driver(self, chrome_options):
+        """启动Chrome；使用缓存的驱动路径时跳过Selenium Manager，路径失效则重新解析一次"""
+        with profile.span("导入WebDriver模块"):
+            from selenium import webdriver
+            from selenium.webdriver.chrome.service import Service
+
+        if not self.driver_paths:
+            return webdriver.Chrome(options=chrome_options)
+        while True:
+            paths = self.driver_paths.get(chrome_options)
+            chrome_options.binary_location = paths['browser_path']
+            try:
+                return webdriver.Chrome(service=Service(executable_path=paths['driver_path']),
+                                        options=chrome_options)
+            except Exception:
+                if self.driver_paths.resolved:
+                    raise
+                self.log_warning("缓存的浏览器驱动路径已失效，重新解析")
+                self.driver_paths.invalidate()
+                chrome_options.binary_location = ""
 
+    def create_driver(self):
+        """启动一个新的浏览器并返回WebDriver实例"""
         try:
+            from selenium.webdriver.chrome.options import Options
+
             chrome_options = Options()
             if not self.visible:
                 chrome_options.add_argument("--headless")
@@ -87,6 +350,21 @@ class WebCrawler:
             chrome_options.add_argument("--no-sandbox")
             chrome_options.add_argument("--disable-dev-shm-usage")
             chrome_options.add_argument("--window-size=1920,1080")
+            for arg in chrome_args(self.render_profile):
+                chrome_options.add_argument(arg)
+            if self.profile_dir:
+                chrome_options.add_argument(f"--user-data-dir={os.path.abspath(self.profile_dir)}")
+            if self.asset_cache:
+                # 回收后的新浏览器继续使用同一个缓存槽位
+                if not self._asset_slot:
+                    self._asset_slot = self.asset_cache.acquire()
+                for arg in self.asset_cache.chrome_args(self._asset_slot):
+                    chrome_options.add_argument(arg)
+
+            # DOMContentLoaded后即返回，由 wait_for_page_ready 判断页面何时真正就绪
+            chrome_options.page_load_strategy = 'eager'
+            # 通过性能日志接收CDP Network事件，用于判断网络空闲
+            chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
 
             prefs = {
                 'printing.print_preview_sticky_settings.appState': json.dumps({
@@ -98,10 +376,15 @@ class WebCrawler:
             chrome_options.add_experimental_option('prefs', prefs)
 
             try:
-                self.driver = webdriver.Chrome(options=chrome_options)
+                with self.span('driver_start', profile=self.render_profile), profile.span("启动浏览器"):
+                    driver = self.launch_driver(chrome_options)
+                    driver.set_page_load_timeout(self.page_load_timeout)
+                    driver.set_script_timeout(self.script_timeout)
+                    self.apply_blocking(driver)
+                    self.load_cookies(driver)
                 if self.debug:
                     self.log_success("浏览器驱动初始化成功")
-                return self.driver
+                return driver
             except Exception as e:
                 if "chromedriver" in str(e).lower():
                     self.log_box(
@@ -122,8 +405,19 @@ class WebCrawler:
                 self.log_error("浏览器驱动初始化失败，请检查Chrome浏览器是否正确安装")
             raise e
 
-    def get_page_title(self, driver):
+    def apply_blocking(self, driver):
+        """通过CDP拦截渲染配置中的非必要请求，设置对该标签页之后的所有导航生效"""
+        if not self.block_patterns:
+            return
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.block_patterns})
+        self.log_debug(f"已启用请求拦截：{len(self.block_patterns)} 个URL模式")
+
+    def get_page_title(self, driver, probe=None):
         """获取页面标题"""
+        if probe:
+            return probe['title']
+
         try:
             # 尝试获取微信文章标题
             title = driver.find_element(By.CLASS_NAME, "rich_media_title").text.strip()
@@ -150,49 +444,278 @@ class WebCrawler:
             filename = filename.replace(char, '')
         return "".join(x for x in filename if x.isalnum() or x in (' ', '-', '_')).strip()
 
-    def save_page_as_pdf(self, url, save_dir):
+    def save_page(self, url, save_dir, title=None, fingerprint=None):
+        """按 --format 保存当前页面：先截取快照，再打印PDF，全部成功时返回True"""
+        title = title or self.sanitize_filename(self.get_page_title(self.driver))
+        saved = True
+        for kind in self.output_kinds:
+            if kind == 'pdf':
+                saved = self.save_page_as_pdf(url, save_dir, title, fingerprint) and saved
+            else:
+                saved = self.save_capture(url, save_dir, title, fingerprint, kind) and saved
+        return saved
+
+    def save_capture(self, url, save_dir, title, fingerprint, kind):
+        """将已加载的页面保存为MHTML快照或单文件HTML，不经过打印"""
+        try:
+            path, reused = self.resolve_output_path(url, save_dir, title, fingerprint, kind, self._refresh)
+            if reused:
+                self.record_output(path, title, *self._page, self._parent)
+                self.last_output = (path, fingerprint)
+                return True
+
+            # 快照只包含已加载的资源，先让懒加载图片加载完成
+            with self.span('lazy_images'):
+                self.load_lazy_images(self.driver)
+            with self.span('capture', format=kind) as record:
+                if kind == 'mhtml':
+                    text = self.driver.execute_cdp_cmd('Page.captureSnapshot', {'format': 'mhtml'})['data']
+                else:
+                    text = self.single_file_html(self.driver)
+                record['bytes'] = len(text)
+            with self.span('write_capture') as record:
+                digest, size = write_capture(path, text)
+                record['bytes'] = size
+
+            self.record_output(path, title, *self._page, self._parent, size, digest)
+            self.last_output = (path, fingerprint or digest)
+            self.last_bytes = size
+            self.log_success(f"{kind.upper()}已保存: {path}")
+            return True
+        except Exception as e:
+            self.log_error(f"保存{kind.upper()}时出错: {str(e)}")
+            return False
+
+    def single_file_html(self, driver):
+        """序列化当前页面，图片和样式表取自浏览器中已加载的资源并内联"""
+        driver.execute_cdp_cmd('Page.enable', {})
+        tree = driver.execute_cdp_cmd('Page.getResourceTree', {})
+        images, styles = {}, {}
+        for frame_id, resource in inline_targets(tree):
+            try:
+                content = driver.execute_cdp_cmd('Page.getResourceContent',
+                                                 {'frameId': frame_id, 'url': resource['url']})
+            except Exception:
+                continue  # 资源已不在缓存中，保留原地址
+            add_inline(images, styles, resource, content)
+        self.log_debug(f"内联图片 {len(images)} 张，样式表 {len(styles)} 个")
+        return driver.execute_script(SINGLE_FILE_HTML_JS, images, styles)
+
+    def save_page_as_pdf(self, url, save_dir, title=None, fingerprint=None):
         """将页面保存为PDF"""
         try:
             self.log_info(f"正在将页面转换为PDF: {url}")
             
             # 获取页面标题作为文件名
-            title = self.sanitize_filename(self.get_page_title(self.driver))
-            pdf_name = f"{title}.pdf"
-            
-            # 直接在当前目录保存PDF，不创建同名子目录
-            pdf_path = os.path.join(save_dir, pdf_name)
-
-            # 检查文件是否已存在
-            if os.path.exists(pdf_path):
-                self.log_warning(f"PDF已存在，跳过: {pdf_path}")
+            title = title or self.sanitize_filename(self.get_page_title(self.driver))
+            pdf_path, reused = self.resolve_output_path(url, save_dir, title, fingerprint, refresh=self._refresh)
+            if reused:
+                self.record_output(pdf_path, title, *self._page, self._parent)
+                self.last_output = (pdf_path, fingerprint)
                 return True
 
-            print_options = {
-                'landscape': False,
-                'displayHeaderFooter': False,
-                'printBackground': True,
-                'preferCSSPageSize': True,
-                'paperWidth': 8.27,
-                'paperHeight': 11.69,
-                'marginTop': 0,
-                'marginBottom': 0,
-                'marginLeft': 0,
-                'marginRight': 0,
-                'scale': 1.0,
-            }
-            result = self.driver.execute_cdp_cmd('Page.printToPDF', print_options)
-            
-            if 'data' in result:
-                pdf_data = base64.b64decode(result['data'])
-                with open(pdf_path, 'wb') as f:
-                    f.write(pdf_data)
-                self.log_success(f"PDF已保存: {pdf_path}")
-                return True
-            return False
+            # 打印前主动触发懒加载图片，避免PDF中出现空白图片框
+            with self.span('lazy_images'):
+                self.load_lazy_images(self.driver)
+
+            print_options = dict(PRINT_OPTIONS)
+            if self.print_mode == 'article':
+                with self.span('article_document'):
+                    if self.prepare_article_document(self.driver):
+                        print_options = dict(ARTICLE_PRINT_OPTIONS)
+            # 调试模式下统计本次打印和写入的Python内存峰值，只在测量期间开启跟踪
+            tracing = self.debug and not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+            size = 0
+            try:
+                if self.stream_pdf:
+                    digest, size = self.print_pdf_streamed(print_options, pdf_path)
+                else:
+                    with self.span('print_pdf') as record:
+                        result = self.driver.execute_cdp_cmd('Page.printToPDF', print_options)
+                        record['bytes'] = len(result.get('data', ''))
+                    if 'data' not in result:
+                        return False
+                    if self.writer:
+                        # 解码和写盘交给写入线程，浏览器立即处理下一个页面
+                        size = len(result['data']) * 3 // 4  # 解码后的大致字节数
+                        self.pending_write = self.writer.write(pdf_path, result['data'], self.metrics, *self._page)
+                        self.last_output = (pdf_path, fingerprint)
+                        self.log_success(f"PDF已提交写入: {pdf_path}")
+                        return True
+                    with self.span('write_pdf') as record:
+                        digest, size = write_pdf(pdf_path, result['data'])
+                        record['bytes'] = size
+            finally:
+                if tracing:
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    transfer = '流式' if self.stream_pdf else '写入线程' if self.writer else '整块'
+                    self.log_debug(f"PDF大小 {size / 1048576:.1f} MB，内存峰值 {peak / 1048576:.1f} MB（{transfer}传输）")
+
+            self.record_output(pdf_path, title, *self._page, self._parent, size, digest)
+            self.last_output = (pdf_path, fingerprint or digest)
+            self.last_bytes = size
+            self.log_success(f"PDF已保存: {pdf_path}")
+            if self.postprocessor:
+                self.postprocess(pdf_path)
+            return True
         except Exception as e:
             self.log_error(f"保存PDF时出错: {str(e)}")
             return False
 
+    def prepare_article_document(self, driver):
+        """将当前页面替换为只含标题、作者信息和正文的精简文档，打印时无需排版页面其余部分
+
+        页面没有 #js_content 或替换失败时返回False，按整页打印。
+        """
+        try:
+            html = driver.execute_script(ARTICLE_DOCUMENT_JS, ARTICLE_PRINT_CSS)
+            if not html:
+                self.log_debug("页面没有文章正文，按整页打印")
+                return False
+            frame_id = driver.execute_cdp_cmd('Page.getFrameTree', {})['frameTree']['frame']['id']
+            driver.execute_cdp_cmd('Page.setDocumentContent', {'frameId': frame_id, 'html': html})
+        except Exception as e:
+            self.log_warning(f"生成正文打印文档失败，按整页打印: {str(e)}")
+            return False
+        # 图片已由原页面加载，这里只等待新文档中的图片解码完成
+        self.load_lazy_images(driver)
+        return True
+
+    def resolve_output_path(self, url, save_dir, title, fingerprint=None, kind='pdf', refresh=False):
+        """确定 kind 类型（pdf/mhtml/html）文件的保存路径，返回 (路径, 是否已存在可复用)
+
+        文件已存在，或相同内容的文章已保存过（此时直接硬链接）时无需再保存。
+        refresh 为True（增量模式下已更新的文章或重新渲染的索引页）时，
+        本页面之前保存的同名文件不再复用，由新内容覆盖。
+        """
+        # 直接在当前目录保存，不创建同名子目录
+        pdf_path = os.path.join(save_dir, f"{title}.{kind}")
+
+        # 同名文件属于另一篇文章时，在文件名后附加指纹避免冲突
+        if self.cache and fingerprint and self.output_exists(pdf_path):
+            owner = self.cache.owner_of(pdf_path)
+            if (owner and owner['content_hash'] != fingerprint
+                    and owner['canonical_url'] != canonical_article_url(url)):
+                pdf_path = os.path.join(save_dir, f"{title}_{fingerprint[:8]}.{kind}")
+
+        # 检查文件是否已存在
+        if self.output_exists(pdf_path):
+            if refresh and self.owns_output(url, pdf_path, fingerprint):
+                self.log_info(f"内容已更新，覆盖{kind.upper()}: {pdf_path}")
+                return pdf_path, False
+            self.log_warning(f"{kind.upper()}已存在，跳过: {pdf_path}")
+            return pdf_path, True
+
+        # 相同内容的文章已保存过（例如不同的分享链接），直接硬链接
+        if self.cache and fingerprint:
+            existing = self.cache.find_by_hash(fingerprint, kind)
+            if existing:
+                link_file(existing, pdf_path)
+                self.log_success(f"相同内容已存在，已链接{kind.upper()}: {pdf_path}")
+                return pdf_path, True
+        return pdf_path, False
+
+    def owns_output(self, url, path, fingerprint):
+        """已存在的文件是否为本页面之前保存的版本且内容已变化
+
+        缓存只记录主文件（--format both 时为PDF），快照按同名主文件判断归属。
+        """
+        primary = os.path.splitext(path)[0] + f".{self.primary_kind}"
+        owner = self.cache.owner_of(primary) if self.cache else None
+        if not owner or owner['canonical_url'] != canonical_article_url(url):
+            return False
+        return fingerprint is None or owner['content_hash'] != fingerprint
+
+    def output_exists(self, path):
+        """文件是否已保存：先查输出清单（同时清理文件已不存在的记录），清单中没有时再检查磁盘（兼容建立清单之前保存的文件）"""
+        if self.manifest and self.manifest.has(path):
+            return True
+        return os.path.exists(path)
+
+    def record_output(self, path, title, url, depth, parent_dir, size=None, checksum=None):
+        """将保存的文件登记到输出清单；未给出大小时（复用或链接的文件）只登记清单中还没有的文件"""
+        if not self.manifest or (size is None and self.manifest.has(path)):
+            return
+        try:
+            self.manifest.record(path, url, title, depth, parent_dir, size, checksum)
+        except Exception as e:
+            self.log_warning(f"写入输出清单失败: {str(e)}")
+
+    def postprocess(self, pdf_path):
+        """提交PDF后处理；文件被改写后更新输出清单中的大小和校验和"""
+        future = self.postprocessor.submit(pdf_path)
+        if future is None or not self.manifest:
+            return
+
+        def rewritten(future):
+            try:
+                _, before, after = future.result()
+                if after != before:
+                    self.manifest.refresh(pdf_path)
+            except Exception:
+                pass  # 后处理失败时文件未改动
+
+        future.add_done_callback(rewritten)
+
+    def print_pdf_streamed(self, print_options, pdf_path):
+        """以流方式接收 Page.printToPDF 结果，分块解码写入临时文件，完成后原子重命名
+
+        返回 (内容哈希, 字节数)。
+        """
+        options = dict(print_options, transferMode='ReturnAsStream')
+        with self.span('print_pdf', streamed=True):
+            handle = self.driver.execute_cdp_cmd('Page.printToPDF', options)['stream']
+        tmp_path = pdf_path + '.part'
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with self.span('write_pdf', streamed=True) as record, open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = self.driver.execute_cdp_cmd('IO.read', {'handle': handle, 'size': PDF_STREAM_CHUNK})
+                    data = chunk.get('data', '')
+                    if data:
+                        raw = base64.b64decode(data) if chunk.get('base64Encoded') else data.encode('utf-8')
+                        f.write(raw)
+                        digest.update(raw)
+                        size += len(raw)
+                    if chunk.get('eof'):
+                        break
+                record['bytes'] = size
+            os.replace(tmp_path, pdf_path)
+        finally:
+            try:
+                self.driver.execute_cdp_cmd('IO.close', {'handle': handle})
+            except Exception:
+                pass
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest.hexdigest(), size
+
+    def load_lazy_images(self, driver, timeout=None):
+        """将正文图片的 data-src 提升为 src，只等待这些图片加载完成（有超时上限）"""
+        timeout = self.image_timeout if timeout is None else timeout
+        try:
+            driver.set_script_timeout(timeout + 5)
+            result = driver.execute_async_script(LAZY_IMAGES_JS, int(timeout * 1000))
+        except Exception as e:
+            self.log_warning(f"加载懒加载图片时出错: {str(e)}")
+            return False
+        finally:
+            try:
+                driver.set_script_timeout(self.script_timeout)
+            except Exception:
+                pass
+
+        if result['timedOut']:
+            self.log_warning(
+                f"图片加载超时 ({timeout} 秒)：已加载 {result['loaded']}/{result['total']} 张")
+        else:
+            self.log_debug(f"正文图片加载完成: {result['loaded']}/{result['total']} 张，失败 {result['failed']} 张")
+        return not result['timedOut']
+
     def is_valid_url(self, url):
         """检查URL是否有效且未访问过"""
         if not url:
@@ -207,33 +730,105 @@ class WebCrawler:
         """获取URL的域名"""
         return urlparse(url).netloc
 
-    def wait_for_login(self):
-        """等待用户登录"""
+    def needs_login(self, driver, probe=None):
+        """页面出现登录表单，或公众号文章页（/s 与 /s/...）缺少标题和正文时视为需要登录"""
+        if probe:
+            if probe['needsLogin']:
+                self.log_warning("页面可能需要登录")
+            return probe['needsLogin']
+        if driver.find_elements(By.CSS_SELECTOR, "input[type=password]"):
+            self.log_warning("页面包含密码输入框，需要登录")
+            return True
+        parsed = urlparse(driver.current_url)
+        if parsed.netloc != "mp.weixin.qq.com" or not (parsed.path == "/s" or parsed.path.startswith("/s/")):
+            return False  # 合集、主页等索引页没有文章标题
+        if driver.find_elements(By.CLASS_NAME, "rich_media_title") or driver.find_elements(By.ID, "js_content"):
+            return False
+        self.log_warning("未找到文章标题，可能需要登录")
+        return True
+
+    def wait_for_login(self, timeout=None):
+        """等待用户在浏览器窗口中登录，最多等待 timeout 秒，返回是否登录成功"""
+        timeout = self.login_timeout if timeout is None else timeout
         print("\n检测到需要登录...")
-        print("请在打开的浏览器窗口中完成登录")
+        print(f"请在打开的浏览器窗口中完成登录（最多等待 {timeout} 秒）")
         print("登录成功后程序将自动继续")
-        
-        while True:
-            try:
-                # 检查是否存在微信文章的特征元素
-                title = self.driver.find_element(By.CLASS_NAME, "rich_media_title")
-                if title:
-                    print("登录成功！继续处理...")
-                    return True
-            except:
-                time.sleep(1)  # 每秒检查一次
-
-    def check_article_migration(self, driver):
+
+        deadline = time.monotonic() + timeout
+        while not self._stop and time.monotonic() < deadline:
+            probe = self.probe_page(self.driver)
+            if probe is not None and not probe['needsLogin']:
+                print("登录成功！继续处理...")
+                self.save_cookies(self.driver)
+                return True
+            time.sleep(1)  # 每秒检查一次
+        self.log_warning("等待登录超时")
+        return False
+
+    def defer_login(self, url, current_depth, parent_dir):
+        """需要登录的页面先跳过，爬取结束后统一登录并重试"""
+        self.log_warning(f"页面需要登录，稍后重试: {url}")
+        self.deferred_logins.add(url, current_depth, parent_dir)
+        if self.state:
+            self.state.mark_login(url)
+        self.metrics.failure(url, current_depth, "需要登录")
+
+    def release_url(self, url):
+        """从已访问集合中移除URL，使其可以再次处理"""
+        with self._visited_lock:
+            self.visited_urls.discard(url)
+
+    def login_and_requeue(self, requeue):
+        """爬取结束后处理需要登录的页面：在可见浏览器中等待用户登录一次，成功后重新入队
+
+        requeue(url, 深度, 父目录) 负责把任务放回 frontier。返回是否有任务重新入队。
+        """
+        jobs = self.deferred_logins.pending()
+        if not jobs or self._stop or self._login_retried:
+            return False
+        self._login_retried = True  # 每次运行只重试一轮，避免反复等待
+        if not self.visible or not self.login_timeout:
+            self.log_warning(f"{len(jobs)} 个页面需要登录；使用 -v 显示浏览器窗口即可在爬取结束时登录")
+            return False
+
+        url = jobs[0][0]
+        self.log_box(f"有 {len(jobs)} 个页面需要登录，正在打开: {url}")
+        self.setup_driver()
+        self.driver.get(url)
+        self.wait_for_page_ready(self.driver)
+        if not self.wait_for_login():
+            return False
+        for job in jobs:
+            self.release_url(job[0])
+            requeue(*job)
+        return True
+
+    def check_article_migration(self, driver, probe=None):
         """检查文章是否已迁移，如果是则获取并访问新链接"""
+        if probe:
+            if not probe['migrated']:
+                return False
+            self.log_warning("\n检测到文章已迁移...")
+            if not probe['migrationUrl']:
+                self.log_error("未能获取新的文章链接")
+                return False
+            self.log_box(f"原文已迁移到新链接: {probe['migrationUrl']}")
+            self.log_info("正在访问新链接...")
+            self._inflight.clear()
+            self._drain_network_events(driver)
+            driver.get(probe['migrationUrl'])
+            self.wait_for_page_ready(driver)  # 等待页面加载
+            return True
+
         try:
             # 检查是否存在迁移提示文本
-            migration_text = driver.find_elements(By.XPATH, "//*[contains(text(), '该公众号已迁移')]")
+            migration_text = driver.find_elements(By.XPATH, f"//*[contains(text(), '{MIGRATION_TEXT}')]")
             if migration_text:
                 self.log_warning("\n检测到文章已迁移...")
                 
                 try:
                     # 查找并点击"访问文章"按钮
-                    article_button = driver.find_element(By.XPATH, "//a[contains(text(), '访问文章')]")
+                    article_button = driver.find_element(By.XPATH, f"//a[contains(text(), '{MIGRATION_BUTTON_TEXT}')]")
                     if article_button:
                         self.log_success("找到'访问文章'按钮，正在跳转...")
                         
@@ -247,8 +842,10 @@ class WebCrawler:
                             self.log_box(f"原文已迁移到新链接: {new_url}")
                             # 直接访问新链接
                             self.log_info("正在访问新链接...")
+                            self._inflight.clear()
+                            self._drain_network_events(driver)
                             driver.get(new_url)
-                            time.sleep(self.delay)  # 等待页面加载
+                            self.wait_for_page_ready(driver)  # 等待页面加载
                             return True
                         else:
                             self.log_error("未能获取新的文章链接")
@@ -261,19 +858,14 @@ class WebCrawler:
             return False
         return False
 
-    def check_article_status(self, driver):
+    def check_article_status(self, driver, probe=None):
         """检查文章状态（是否被删除或失效）"""
+        if probe:
+            return probe['status'] is None, probe['status']
+
         try:
             # 检查常见的错误提示
-            error_patterns = [
-                "该内容已被发布者删除",
-                "此内容因违规无法查看",
-                "该公众号已被屏蔽",
-                "该内容已被投诉",
-                "抱歉，此内容已被删除",
-            ]
-            
-            for pattern in error_patterns:
+            for pattern in ERROR_PATTERNS + THROTTLE_PATTERNS:
                 elements = driver.find_elements(By.XPATH, f"//*[contains(text(), '{pattern}')]")
                 if elements:
                     return False, pattern
@@ -284,108 +876,458 @@ class WebCrawler:
             self.log_error(f"检查文章状态时出错: {str(e)}")
             return False, str(e)
 
-    def crawl_page(self, url, current_depth=0, parent_dir="pdfs"):
-        """递归爬取页面"""
+    def _drain_network_events(self, driver):
+        """读取性能日志中的CDP Network事件，更新进行中的请求集合"""
         try:
-            if self._stop:  # 检查停止标志
-                return
+            entries = driver.get_log('performance')
+        except Exception:
+            return False
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method', '')
+            request_id = message.get('params', {}).get('requestId')
+            if not request_id:
+                continue
+            if method == 'Network.requestWillBeSent':
+                self._inflight.add(request_id)
+            elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+                self._inflight.discard(request_id)
+                if message['params'].get('blockedReason'):
+                    self.ready_stats['blocked'] += 1
+        return True
 
-            if current_depth > self.max_depth or url in self.visited_urls:
-                self.log_debug(f"跳过URL (深度: {current_depth}): {url}")
-                return
+    def wait_for_page_ready(self, driver, timeout=None):
+        """等待页面真正就绪后立即返回，delay只作为等待上限
 
-            self.visited_urls.add(url)
-            self.log_highlight(f"\n当前深度: {current_depth}, 处理页面: {url}")
+        就绪条件：document.readyState、网络空闲（CDP Network事件）、
+        文章正文元素出现，以及已开始加载的懒加载图片全部完成。
+        """
+        timeout = self.delay if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        idle_since = None
+        ready = False
+
+        while True:
+            now = time.monotonic()
+            tracked = self._drain_network_events(driver)
+            if not tracked or not self._inflight:
+                idle_since = idle_since or now
+            else:
+                idle_since = None
+            network_idle = idle_since is not None and now - idle_since >= NETWORK_IDLE_SECONDS
 
             try:
-                self.log_info("正在加载页面...")
-                self.driver.get(url)
-                self.log_success("页面加载完成，等待延迟...")
-                time.sleep(self.delay)
-
-                # 检查文章状态
-                is_valid, error_msg = self.check_article_status(self.driver)
-                if not is_valid:
-                    self.log_warning(f"文章无法访问: {error_msg}")
-                    self.log_box(f"已跳过无效链接: {url}")
-                    return
-
-                # 检查文章迁移
-                if self.check_article_migration(self.driver):
-                    self.log_success("已成功跳转到新链接")
-                    # 注意：此时driver已经在新页面上了，继续处理即可
-
-                # 检查登录状态
-                try:
-                    self.log_info("检查是否需要登录...")
-                    self.driver.find_element(By.CLASS_NAME, "rich_media_title")
-                    self.log_success("找到文章标题，无需登录")
-                except Exception as e:
-                    self.log_warning(f"未找到文章标题，可能需要登录: {str(e)}")
-                    self.wait_for_login()
-
-                # 获取页面标题
-                page_title = self.sanitize_filename(self.get_page_title(self.driver))
-                self.log_highlight(f"页面标题: {page_title}")
-
-                # 如果不是最大深度，创建目录
-                if current_depth < self.max_depth:
-                    save_dir = os.path.join(parent_dir, page_title)
-                    os.makedirs(save_dir, exist_ok=True)
-                    self.log_info(f"创建目录: {save_dir}")
-                else:
-                    # 在最大深度，直接使用父目录
-                    save_dir = parent_dir
+                state = driver.execute_script(READY_STATE_JS)
+            except Exception:
+                state = None
 
-                # 保存PDF
-                if self.save_page_as_pdf(url, save_dir):
-                    self.log_success("PDF保存成功")
-                else:
-                    self.log_error("PDF保存失败")
+            if state and network_idle and state['pendingImages'] == 0:
+                if state['readyState'] == 'complete' or (
+                        state['readyState'] == 'interactive' and state['hasContent']):
+                    ready = True
+                    break
+            if now >= deadline:
+                break
+            time.sleep(READY_POLL_INTERVAL)
+
+        elapsed = time.monotonic() - start
+        self.ready_stats['pages'] += 1
+        self.ready_stats['waited'] += elapsed
+        self.ready_stats['saved'] += max(0.0, self.delay - elapsed)
+        if ready:
+            self.log_debug(f"页面就绪，用时 {elapsed:.2f} 秒")
+        else:
+            self.ready_stats['timeouts'] += 1
+            self.log_debug(f"等待页面就绪超时 ({timeout} 秒)，继续处理")
+        return ready
+
+    def probe_page(self, driver):
+        """通过一次 execute_script 取得页面的全部检查结果，失败时返回None"""
+        try:
+            return driver.execute_script(PAGE_PROBE_JS, ERROR_PATTERNS + THROTTLE_PATTERNS, MIGRATION_TEXT, MIGRATION_BUTTON_TEXT,
+                                         LOGIN_PATTERNS)
+        except Exception as e:
+            self.log_debug(f"页面探测失败，改用逐项检查: {str(e)}")
+            return None
+
+    def claim_url(self, url):
+        """原子地将URL标记为已访问，已被其他任务占用时返回False"""
+        with self._visited_lock:
+            if url in self.visited_urls:
+                return False
+            self.visited_urls.add(url)
+            return True
 
-                # 如果还没到最大深度，继续获取链接
-                if current_depth < self.max_depth:
-                    self.log_info("开始获取页面链接...")
-                    links = self.get_page_links(url)
-                    self.log_highlight(f"找到 {len(links)} 个有效链接")
+    def process_page(self, url, current_depth, parent_dir):
+        """加载并保存单个页面，返回 (保存目录, 待爬取链接)；页面无效时返回None"""
+        if self.state:
+            self.state.mark_running(url, current_depth, parent_dir)
+        self.last_output = (None, None)
+        self.last_bytes = 0
+        self.pending_write = None
+        self._page = (url, current_depth)
+        self._parent = parent_dir
+        self._refresh = False
 
-                    for i, link in enumerate(links, 1):
-                        self.log_highlight(f"\n处理链接 [{i}/{len(links)}]: {link}")
-                        self.crawl_page(link, current_depth + 1, save_dir)
+        # 已缓存的文章无需加载页面，直接硬链接到当前目录
+        if self.cache:
+            cached = self.cache.lookup(url, self.primary_kind)
+            if cached and self.incremental:
+                cached = self.revalidate(url, cached, current_depth)
+                self._refresh = cached is None  # 已更新的文章和索引页重新渲染后覆盖旧文件
+            if cached:
+                with self.span('cache_restore'):
+                    result = self.restore_from_cache(url, cached, current_depth, parent_dir)
+                self.metrics.page_done(url, current_depth)
+                return result
+
+        # 同一主机的请求受限速和熔断控制，页面结果反馈给该主机的状态
+        with self.span('host_wait'):
+            self.host_guard.acquire(url, lambda: self._stop)
+        try:
+            result = self.load_page(url, current_depth, parent_dir)
+        except BaseException as e:
+            self.host_guard.failure(url, classify_error(e))
+            raise
+        self.host_guard.success(url)
+        return result
+
+    def revalidate(self, url, cached, current_depth):
+        """增量模式：文章用条件请求确认未变化后沿用缓存；索引页和已更新的文章返回None，重新渲染"""
+        if cached['is_index']:
+            self.log_info("索引页，重新加载以发现新文章")
+            return None
+        with self.metrics.span('host_wait', url=url, depth=current_depth):
+            self.host_guard.acquire(url, lambda: self._stop)
+        with self.metrics.span('revalidate', url=url, depth=current_depth) as record:
+            result = self.prefetcher.fetch(url, {key: cached[key] for key in VALIDATOR_KEYS})
+            record['result'] = result.status
+        if result.status == "throttled":
+            self.host_guard.failure(url, THROTTLED)
+            raise Throttled(result.reason)
+        if result.status == "error":
+            # 无法确认时沿用已保存的PDF，下次运行再检查
+            self.host_guard.failure(url, NETWORK)
+            self.log_debug(f"条件请求失败，沿用缓存: {result.reason}")
+            return cached
+        self.host_guard.success(url)
+
+        if result.status == "ok" and not result.migrated and any(cached[key] for key in VALIDATOR_KEYS):
+            self.log_info("文章已更新，重新加载")
+            return None
+        if result.status == "invalid":
+            self.log_warning(f"文章已无法访问（{result.reason}），保留已保存的PDF")
+        else:
+            self.log_success("文章未变化，跳过加载")
+            if not result.migrated:
+                # 旧版本缓存没有校验信息时，以本次结果为基准
+                self.cache.revalidated(url, result.validators)
+        return cached
+
+    def page_validators(self, prefetched, probe):
+        """返回 (下次增量爬取的校验信息, 是否为索引页)"""
+        if prefetched and prefetched.status == "ok" and not prefetched.migrated:
+            return prefetched.validators, not prefetched.is_article
+        return None, not (probe and probe.get('content'))
+
+    def load_page(self, url, current_depth, parent_dir):
+        """在浏览器中加载页面并保存PDF，返回 (保存目录, 待爬取链接)；页面无效时返回None"""
+        # 先用HTTP预取判断文章状态，失效文章无需打开浏览器
+        prefetched = None
+        target_url = url
+        if self.prefetcher:
+            with self.span('prefetch') as record:
+                prefetched = self.prefetcher.fetch(url)
+                record['bytes'] = len(prefetched.html or '')
+            if prefetched.status == "throttled":
+                raise Throttled(prefetched.reason)
+            if prefetched.status == "invalid":
+                self.log_warning(f"文章无法访问: {prefetched.reason}")
+                self.log_box(f"已跳过无效链接: {url}")
+                if self.state:
+                    self.state.mark_skipped(url, prefetched.reason)
+                self.metrics.failure(url, current_depth, f"文章失效: {prefetched.reason}")
+                return None
+            if prefetched.status == "error":
+                self.log_debug(f"预取失败，交由浏览器处理: {prefetched.reason}")
+            elif prefetched.migrated:
+                self.log_box(f"原文已迁移到新链接: {prefetched.url}")
+                target_url = prefetched.url
+
+        self.setup_driver()
+        self.session.mark_served()
+        self.log_info("正在加载页面...")
+        self._inflight.clear()
+        self._drain_network_events(self.driver)  # 丢弃上一个页面的网络事件
+        with self.span('page_load'):
+            self.driver.get(target_url)
+        self.log_success("页面开始加载，等待就绪...")
+        with self.span('ready_wait'):
+            self.wait_for_page_ready(self.driver)
+
+        # 一次性探测页面状态、标题和链接
+        with self.span('probe'):
+            probe = self.probe_page(self.driver)
+
+        # 检查文章状态
+        with self.span('status_check'):
+            is_valid, error_msg = self.check_article_status(self.driver, probe)
+        if not is_valid and is_throttled(error_msg):
+            raise Throttled(error_msg)
+        if not is_valid:
+            self.log_warning(f"文章无法访问: {error_msg}")
+            self.log_box(f"已跳过无效链接: {url}")
+            if self.state:
+                self.state.mark_skipped(url, error_msg)
+            self.metrics.failure(url, current_depth, f"文章失效: {error_msg}")
+            return None
+
+        # 检查文章迁移
+        with self.span('migration_check'):
+            migrated = self.check_article_migration(self.driver, probe)
+        if migrated:
+            self.log_success("已成功跳转到新链接")
+            # 注意：此时driver已经在新页面上了，重新探测即可
+            with self.span('probe'):
+                probe = self.probe_page(self.driver)
+
+        # 检查登录状态
+        self.log_info("检查是否需要登录...")
+        with self.span('login_check'):
+            login_required = self.needs_login(self.driver, probe)
+        if login_required:
+            # 不在此处阻塞等待，整个爬取继续进行
+            self.defer_login(url, current_depth, parent_dir)
+            return None
+        self.log_success("无需登录")
+
+        # 获取页面标题
+        with self.span('title'):
+            page_title = self.sanitize_filename(self.get_page_title(self.driver, probe))
+        self.log_highlight(f"页面标题: {page_title}")
+
+        save_dir = self.make_save_dir(page_title, current_depth, parent_dir)
+        fingerprint = self.article_fingerprint(page_title, probe)
+
+        # 按 --format 保存PDF或快照
+        if self.save_page(url, save_dir, page_title, fingerprint):
+            self.log_success("页面保存成功")
+        else:
+            self.log_error("页面保存失败")
+            self.metrics.failure(url, current_depth, "保存失败")
+            # 不记入缓存：增量模式下一次运行不会把未保存的新版本当作未变化
+            self.last_output = (None, None)
+            self.pending_write = None
+
+        # 如果还没到最大深度，继续获取链接
+        links = []
+        if current_depth < self.max_depth:
+            self.log_info("开始获取页面链接...")
+            with self.span('link_extraction') as record:
+                if prefetched and prefetched.status == "ok" and prefetched.is_article:
+                    links = self.filter_links(url, prefetched.links)
                 else:
-                    self.log_warning(f"已达到最大深度 {self.max_depth}，停止获取链接")
+                    links = self.get_page_links(url, probe)
+                record['links'] = len(links)
+            self.log_highlight(f"找到 {len(links)} 个有效链接")
+        else:
+            self.log_warning(f"已达到最大深度 {self.max_depth}，停止获取链接")
+
+        if self.state:
+            for link in links:
+                self.state.add_pending(link, current_depth + 1, save_dir)
+        validators, is_index = self.page_validators(prefetched, probe)
+        self.finish_page(url, current_depth, page_title, fingerprint, links, validators, is_index, parent_dir)
+        return save_dir, links
+
+    def finish_page(self, url, current_depth, page_title, fingerprint, links, validators=None, is_index=False,
+                    parent_dir=None):
+        """记录页面完成；PDF仍在写入队列中时，等写入完成后再记录，保证续爬时不会漏掉页面"""
+        pending, pdf_path = self.pending_write, self.last_output[0]
+        if pending is None:
+            self.record_page(url, current_depth, page_title, fingerprint, links,
+                             self.last_output, self.last_bytes, validators, is_index)
+            return
+
+        def written(future):
+            try:
+                digest, size = future.result()
+            except Exception as e:
+                self.log_error(f"写入PDF时出错: {pdf_path}: {str(e)}")
+                if self.state:
+                    self.state.mark_failed(url, str(e))
+                self.metrics.failure(url, current_depth, "PDF写入失败")
+                return
+            self.log_success(f"PDF已保存: {pdf_path}")
+            self.record_output(pdf_path, page_title, url, current_depth, parent_dir, size, digest)
+            if self.postprocessor:
+                self.postprocess(pdf_path)
+            self.record_page(url, current_depth, page_title, fingerprint, links,
+                             (pdf_path, fingerprint or digest), size, validators, is_index)
+
+        pending.add_done_callback(written)
+
+    def record_page(self, url, current_depth, page_title, fingerprint, links, output, size,
+                    validators=None, is_index=False):
+        """更新运行指标、PDF缓存和爬取状态"""
+        self.metrics.page_done(url, current_depth, size)
+        self.deferred_logins.resolve(url)
+        if self.cache and output[0]:
+            self.cache.store(url, page_title, output[0], fingerprint, links, validators, is_index)
+        if self.state:
+            self.state.mark_done(url, *output)
+
+    def render_page(self, url, current_depth, parent_dir):
+        """在浏览器线程中处理页面，并记录该线程的忙碌时间"""
+        start = time.perf_counter()
+        try:
+            return self.process_page(url, current_depth, parent_dir)
+        finally:
+            if self.writer:
+                self.writer.render.record(time.perf_counter() - start)
+
+    def process_with_retry(self, url, current_depth, parent_dir):
+        """处理页面，临时性错误按退避策略重试；浏览器崩溃或会话丢失时先重启浏览器"""
+        attempt = 0
+        while True:
+            try:
+                return self.render_page(url, current_depth, parent_dir)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == CRASH:
+                    self.log_warning("浏览器会话已失效，正在重启浏览器")
+                    self.session.discard()
+                if self._stop or not self.retry_policy.should_retry(kind, attempt):
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                attempt += 1
+                self.metrics.retry(url, current_depth, kind, attempt, delay)
+                self.log_warning(f"{KIND_LABELS[kind]}，{delay:.1f} 秒后第 {attempt} 次重试: {url}")
+                self.log_debug(f"错误信息: {str(e)}")
+                sleep(delay, lambda: self._stop)
+
+    def report_logins(self):
+        """列出仍需登录的页面，并写入报告文件"""
+        pending = self.deferred_logins.pending()
+        if self.login_report:
+            self.deferred_logins.write_report(self.login_report)
+        if not pending:
+            return
+        lines = [f"需要登录的页面: {len(pending)} 个"]
+        lines += [f"  {url}" for url, _, _ in pending[:20]]
+        if len(pending) > 20:
+            lines.append(f"  ... 其余 {len(pending) - 20} 个")
+        if self.login_report:
+            lines.append(f"\n完整列表: {self.login_report}（登录后使用 -R 续爬即可重新处理）")
+        self.log_box("\n".join(lines))
+
+    def report_hosts(self):
+        """列出发生过限流或熔断的主机"""
+        hosts = {host: item for host, item in self.host_guard.summary().items()
+                 if item['throttled'] or item['trips']}
+        if not hosts:
+            return
+        lines = ["主机限速与熔断", "", f"{'主机':<28}{'请求':>6}{'限流':>6}{'熔断':>6}{'当前间隔':>10}"]
+        for host, item in hosts.items():
+            lines.append(f"{host:<30}{item['requests']:>8}{item['throttled']:>8}{item['trips']:>8}"
+                         f"{item['interval']:>13.1f}s")
+        self.log_box("\n".join(lines))
+
+    def make_save_dir(self, page_title, current_depth, parent_dir):
+        """按深度决定保存目录：未到最大深度时创建同名子目录，否则使用父目录"""
+        # 如果不是最大深度，创建目录
+        if current_depth < self.max_depth:
+            save_dir = os.path.join(parent_dir, page_title)
+            os.makedirs(save_dir, exist_ok=True)
+            self.log_info(f"创建目录: {save_dir}")
+        else:
+            # 在最大深度，直接使用父目录
+            save_dir = parent_dir
+        return save_dir
+
+    def article_fingerprint(self, title, probe):
+        """以标题和正文文本计算文章指纹，无法取得正文时返回None"""
+        if not probe or not probe.get('content'):
+            return None
+        return hashlib.sha256(f"{title}\n{probe['content']}".encode('utf-8')).hexdigest()
+
+    def restore_from_cache(self, url, cached, current_depth, parent_dir):
+        """使用缓存中的标题、PDF和链接完成页面处理，不加载页面"""
+        page_title = cached['title']
+        self.log_success(f"缓存命中，跳过加载: {page_title}")
+        save_dir = self.make_save_dir(page_title, current_depth, parent_dir)
+        pdf_path = os.path.join(save_dir, os.path.basename(cached['pdf_path']))
+        if not self.output_exists(pdf_path):
+            link_file(cached['pdf_path'], pdf_path)
+            self.log_success(f"PDF已从缓存链接: {pdf_path}")
+        self.record_output(pdf_path, page_title, url, current_depth, parent_dir)
+        self.last_output = (pdf_path, cached['content_hash'])
+
+        links = []
+        if current_depth < self.max_depth:
+            links = self.filter_links(url, cached['links'])
+            self.log_highlight(f"找到 {len(links)} 个有效链接（来自缓存）")
+
+        if self.state:
+            for link in links:
+                self.state.add_pending(link, current_depth + 1, save_dir)
+            self.state.mark_done(url, *self.last_output)
+        return save_dir, links
+
+    def crawl_page(self, url, current_depth=0, parent_dir="pdfs"):
+        """从一个页面开始爬取，发现的链接交给 frontier 按配置的顺序调度"""
+        if not self.frontier.push(url, current_depth, parent_dir):
+            self.log_debug(f"跳过URL (深度: {current_depth}): {url}")
+            return
+        self.drain_frontier()
+
+    def drain_frontier(self):
+        """依次处理 frontier 中的任务，直到队列为空或被停止"""
+        while not self._stop:  # 检查停止标志
+            job = self.frontier.pop()
+            if job is None:
+                return
+            url, current_depth, parent_dir = job
+            try:
+                if current_depth > self.max_depth or not self.claim_url(url):
+                    self.log_debug(f"跳过URL (深度: {current_depth}): {url}")
+                    continue
+
+                self.log_highlight(f"\n当前深度: {current_depth}, 处理页面: {url} (待处理: {len(self.frontier)})")
+
+                result = self.process_with_retry(url, current_depth, parent_dir)
+                if not result:
+                    continue
+                save_dir, links = result
+                for link in links:
+                    self.frontier.push(link, current_depth + 1, save_dir)
 
             except KeyboardInterrupt:
                 print("\n\n爬取过程被用户中断...")
                 self.stop()
                 return
             except Exception as e:
+                if self.state:
+                    self.state.mark_failed(url, str(e))
+                self.metrics.failure(url, current_depth, type(e).__name__)
                 if self.debug:
                     print(f"处理页面时出错 {url}: {str(e)}")
                     print(traceback.format_exc())
                 else:
                     print(f"处理页面时出错: {url}")
 
-        except KeyboardInterrupt:
-            print("\n\n爬取过程被用户中断...")
-            self.stop()
-            return
-        except Exception as e:
-            if self.debug:
-                print(f"处理页面时出错 {url}: {str(e)}")
-                print(traceback.format_exc())
-            else:
-                print(f"处理页面时出错: {url}")
-
-    def process_url(self, url):
-        """处理单个起始URL"""
+    def process_url(self, url, parent_dir="pdfs"):
+        """处理单个起始URL，浏览器会话在多个起始URL之间复用"""
         try:
             print(f"\n开始处理URL: {url}")
-            self.driver = self.setup_driver()
-            print("浏览器驱动初始化成功")
-            self.crawl_page(url)
+            self.crawl_page(url, parent_dir=parent_dir)
         except KeyboardInterrupt:
             print("\n\n处理过程被用户中断...")
+            self.stop()
         except Exception as e:
             if self.debug:
                 print(f"处理URL时出错: {url}")
@@ -393,14 +1335,53 @@ class WebCrawler:
                 print(traceback.format_exc())
             else:
                 print(f"处理URL失败: {url}")
-        finally:
-            if self.driver:
-                print("正在关闭浏览器驱动...")
-                try:
-                    self.driver.quit()
-                except:
-                    pass
-                self.driver = None
+
+    def convert_captures(self, root):
+        """延后的打印任务：将 root 下已保存的MHTML/HTML快照打印为同名PDF，已有PDF的快照跳过
+
+        有输出清单时从清单中取待转换的快照，PDF沿用快照登记的URL、深度和父目录；否则遍历目录。
+        """
+        captures = self.manifest.pending_captures() if self.manifest else pending_captures(root)
+        self.log_info(f"待转换的快照: {len(captures)} 个")
+        for path in captures:
+            if self._stop:
+                break
+            url = Path(os.path.abspath(path)).as_uri()
+            save_dir, name = os.path.split(path)
+            title = os.path.splitext(name)[0]
+            entry = self.manifest.get(path) if self.manifest else None
+            self._page = (entry['url'] or url, entry['depth'] or 0) if entry else (url, 0)
+            self._parent = self.manifest.absolute(entry['parent']) if entry and entry['parent'] is not None else None
+            self.last_output = (None, None)
+            self.last_bytes = 0
+            self.pending_write = None
+            try:
+                self.setup_driver()
+                self.session.mark_served()
+                with self.span('page_load'):
+                    self.driver.get(url)
+                with self.span('ready_wait'):
+                    self.wait_for_page_ready(self.driver)
+                if self.save_page_as_pdf(url, save_dir, title):
+                    self.finish_page(*self._page, title, None, [], parent_dir=self._parent)
+                else:
+                    self.metrics.failure(*self._page, "PDF保存失败")
+            except Exception as e:
+                if classify_error(e) == CRASH:
+                    self.session.discard()
+                self.log_error(f"转换快照失败: {path}: {str(e)}")
+                self.metrics.failure(*self._page, "转换失败")
+
+    def close(self):
+        """关闭持久浏览器会话"""
+        if self.session.driver:
+            print("正在关闭浏览器驱动...")
+            self.save_cookies(self.session.driver)
+        self.session.quit()
+        self.driver = None
+        if self._asset_slot:
+            self.asset_cache.release(self._asset_slot)
+            self._asset_slot = None
 
     def log_info(self, message):
         """普通信息 - 白色"""
@@ -433,33 +1414,230 @@ class WebCrawler:
         print(f"{Style.BRIGHT}{message}{Style.RESET_ALL}")
         print("="*80 + "\n")
 
-    def get_page_links(self, url):
+    def get_page_links(self, url, probe=None):
         """获取页面中的所有有效链接"""
-        links = []
+        if probe:
+            return self.filter_links(url, probe['links'])
+
         try:
             elements = self.driver.find_elements(By.CSS_SELECTOR, "a")
-            original_domain = self.get_domain(url)
-
-            for element in elements:
-                link = element.get_attribute("href")
-                if self.is_valid_url(link) and self.get_domain(link) == original_domain:
-                    links.append(link)
+            return self.filter_links(url, [element.get_attribute("href") for element in elements])
         except Exception as e:
             self.log_error(f"获取页面链接时出错: {str(e)}")
-        
-        return links
+            return []
+
+    def filter_links(self, url, hrefs):
+        """保留与原页面同域、且未访问过的有效链接"""
+        original_domain = self.get_domain(url)
+        return [link for link in hrefs
+                if self.is_valid_url(link) and self.get_domain(link) == original_domain]
 
     def stop(self):
         """停止爬虫"""
         self._stop = True
-        if self.driver:
+        self.close()
+
+    def print_summary(self, stats=None):
+        """打印运行摘要：各阶段耗时分布、吞吐量，以及就绪等待相比固定延迟节省的时间"""
+        stats = stats or self.ready_stats
+        pages = stats['pages']
+        if self.writer:
+            self.writer.drain()  # 等待写入队列清空，汇总中才包含全部页面
+            self.log_box(f"流水线\n\n{self.writer.format_summary()}")
+        if self.metrics.pages or self.metrics.failures:
+            self.log_box(f"运行摘要\n\n{self.metrics.format_summary()}")
+        self.report_logins()
+        self.report_hosts()
+        if not pages:
+            return
+        self.log_box(
+            f"页面就绪\n\n"
+            f"加载页面: {pages} 个\n"
+            f"平均就绪等待: {stats['waited'] / pages:.2f} 秒 (上限 {self.delay} 秒)\n"
+            f"就绪超时: {stats['timeouts']} 次\n"
+            f"拦截请求: {stats['blocked']} 个 (渲染配置: {self.render_profile})\n"
+            f"相比固定延迟节省: {stats['saved']:.1f} 秒 (平均每页 {stats['saved'] / pages:.2f} 秒)"
+        )
+
+class ParallelCrawler:
+    """多浏览器并行爬虫：N个工作线程从共享 frontier 领取 (url, 深度, 父目录) 任务
+
+    每个工作线程持有独立的WebCrawler和浏览器会话，已访问集合与锁全局共享，
+    目录结构与 crawl_page 的结果保持一致。
+    """
+
+    def __init__(self, workers=4, **crawler_kwargs):
+        crawler_kwargs.setdefault('metrics', Instrumentation())
+        crawler_kwargs.setdefault('frontier', Frontier())
+        crawler_kwargs.setdefault('deferred_logins', DeferredLogins())
+        crawler_kwargs.setdefault('host_guard', HostGuard())
+        self.workers = [WebCrawler(**crawler_kwargs) for _ in range(workers)]
+        self.visited_urls = set()
+        self._visited_lock = threading.Lock()
+        for worker in self.workers:
+            worker.visited_urls = self.visited_urls
+            worker._visited_lock = self._visited_lock
+        self.max_depth = self.workers[0].max_depth
+        self.debug = self.workers[0].debug
+        self.frontier = crawler_kwargs['frontier']
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._done = threading.Event()
+        self._done.set()
+        self._stop = False
+
+    def prewarm(self):
+        """所有工作线程的浏览器同时在后台启动"""
+        for worker in self.workers:
+            worker.prewarm()
+
+    def submit(self, url, depth, parent_dir):
+        """将任务放入共享 frontier，重复或超出预算的任务被忽略"""
+        with self._pending_lock:
+            if not self.frontier.push(url, depth, parent_dir):
+                return False
+            self._pending += 1
+            self._done.clear()
+            return True
+
+    def _requeue(self, url, depth, parent_dir):
+        """登录后重新处理页面，不经过 frontier 的去重"""
+        with self._pending_lock:
+            self._pending += 1
+            self._done.clear()
+            self.frontier.retry(url, depth, parent_dir)
+
+    def _finish_job(self):
+        with self._pending_lock:
+            self._pending -= 1
+            if self._pending == 0:
+                self._done.set()
+
+    def _worker_loop(self, crawler):
+        """工作线程主循环：领取任务、处理页面、将子链接放回队列"""
+        while not self._stop:
+            job = self.frontier.pop(timeout=0.5)
+            if job is None:
+                continue
+            url, depth, parent_dir = job
             try:
-                self.driver.quit()
-            except:
-                pass
+                if depth > self.max_depth or not crawler.claim_url(url):
+                    crawler.log_debug(f"跳过URL (深度: {depth}): {url}")
+                    continue
+                crawler.log_highlight(f"\n当前深度: {depth}, 处理页面: {url} (待处理: {len(self.frontier)})")
+                result = crawler.process_with_retry(url, depth, parent_dir)
+                if result:
+                    save_dir, links = result
+                    for link in links:
+                        self.submit(link, depth + 1, save_dir)
+            except Exception as e:
+                if crawler.state:
+                    crawler.state.mark_failed(url, str(e))
+                crawler.metrics.failure(url, depth, type(e).__name__)
+                if self.debug:
+                    print(f"处理页面时出错 {url}: {str(e)}")
+                    print(traceback.format_exc())
+                else:
+                    print(f"处理页面时出错: {url}")
+            finally:
+                self._finish_job()
+
+    def run(self, urls, parent_dir="pdfs", jobs=()):
+        """并行处理所有起始URL（及续爬的待处理任务），直到队列清空或被中断"""
+        if not urls and not jobs:
+            return
+        for url, depth, job_parent in jobs:
+            self.submit(url, depth, job_parent)
+        for url in urls:
+            self.submit(url, 0, parent_dir)
+
+        threads = [
+            threading.Thread(target=self._worker_loop, args=(worker,),
+                             name=f"crawler-{i}", daemon=True)
+            for i, worker in enumerate(self.workers, 1)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self._wait()
+            # 需要登录的页面：由第一个浏览器等待用户登录，其余浏览器随后导入Cookie
+            if not self._stop and self.workers[0].login_and_requeue(self._requeue):
+                for worker in self.workers[1:]:
+                    worker.cookies_stale = True
+                self._wait()
+        except KeyboardInterrupt:
+            print("\n\n爬取过程被用户中断...")
+        finally:
+            self._stop = True
+            for thread in threads:
+                thread.join(timeout=10)
+
+    def _wait(self):
+        while not self._done.wait(0.5):
+            if self._stop:
+                break
+
+    def stop(self):
+        """停止所有工作线程"""
+        self._stop = True
+
+    def print_summary(self):
+        """汇总所有工作线程的统计并打印运行摘要"""
+        stats = {'pages': 0, 'waited': 0.0, 'saved': 0.0, 'timeouts': 0, 'blocked': 0}
+        for worker in self.workers:
+            for key in stats:
+                stats[key] += worker.ready_stats[key]
+        self.workers[0].print_summary(stats)
+
+    def close(self):
+        """关闭所有工作线程的浏览器会话"""
+        self._stop = True
+        for worker in self.workers:
+            worker.close()
+
+
+def run_distributed(args, urls, crawler_kwargs):
+    """分布式模式：协调者写入起始URL并监控进度，工作节点从共享队列领取任务"""
+    from distributed import LOGIN, Coordinator, DistributedWorker, open_queue
+    try:
+        queue = open_queue(args.queue)
+    except RuntimeError as e:
+        print(f"错误：{e}")
+        return
+    active_stores.append(queue)
+
+    if args.role == 'coordinator':
+        coordinator = Coordinator(queue)
+        active_crawlers.append(coordinator)
+        if not args.resume:
+            queue.reset()
+        else:
+            retried = queue.retry(LOGIN)
+            if retried:
+                print(f"{retried} 个需要登录的任务已重新排队")
+        added = coordinator.seed(urls)
+        print(f"已加入 {added} 个起始URL，等待工作节点处理...")
+        coordinator.monitor()
+        print("\n队列中的任务已全部处理完成")
+        logins = coordinator.write_login_report(args.login_report, args.output)
+        if logins:
+            print(f"{logins} 个页面需要登录，列表: {args.login_report}（登录后使用 -R 续爬即可重新处理）")
+        return
+
+    if args.engine != 'selenium':
+        print("提示：分布式工作节点使用Selenium引擎，-w 指定本节点的浏览器数量")
+    crawler_kwargs = dict(crawler_kwargs, state=None)  # 进度由共享队列记录
+    node = DistributedWorker(queue, [WebCrawler(**crawler_kwargs) for _ in range(max(1, args.workers))],
+                             output_root=args.output, lease=args.lease)
+    active_crawlers.append(node)
+    print(f"工作节点 {node.worker_id} 已启动，正在从队列领取任务...")
+    node.run()
+    node.print_summary()
+
 
 def main():
     """主程序入口"""
+    profile_startup = False
     try:
         # 设置颜色 - 统一使用浅红色
         text_color = Fore.LIGHTRED_EX + Style.BRIGHT
@@ -487,6 +1665,21 @@ def main():
   %(prog)s -d 2 -t 3 -D             # 递归2层，延迟3秒，显示调试信息
   %(prog)s -d 3 -v                  # 递归3层，显示浏览器窗口
   %(prog)s -D -v                    # 显示调试信息和浏览器窗口
+  %(prog)s -d 2 -w 8                # 递归2层，8个浏览器并行爬取
+  %(prog)s -R                       # 从上次中断处继续爬取
+  %(prog)s -I                       # 每日增量爬取：只渲染索引页和新增、更新的文章
+  %(prog)s -d 3 -M 500 --depth-budget 1:50,2:200   # 广度优先，最多500页，第1层50页、第2层200页
+  %(prog)s -e cdp -w 16             # 不经过chromedriver，一个Chrome开16个标签页
+  %(prog)s --queue sqlite:////mnt/share/queue.db --role coordinator --output /mnt/share/pdfs   # 协调者
+  %(prog)s --queue sqlite:////mnt/share/queue.db -w 4 --output /mnt/share/pdfs   # 在每台机器上运行
+  %(prog)s -P light -m run.jsonl    # 拦截非必要资源，并记录吞吐量以便对比
+  %(prog)s -P light --print-mode article   # 批量归档：只打印正文
+  %(prog)s -f mhtml -w 4            # 只保存MHTML离线副本，不打印PDF
+  %(prog)s --to-pdf                 # 之后再把保存的快照批量打印为PDF
+  %(prog)s -O --dpi 150 --merge     # 压缩PDF、图片降到150DPI，结束后按目录合并
+  %(prog)s -v -L 300                # 爬取结束后在浏览器中登录一次，重试需要登录的页面
+  %(prog)s -w 4 --host-interval 1 --retries 4   # 站点限流时放慢请求并多重试几次
+  %(prog)s -R --profile-startup     # 输出启动各阶段耗时，排查启动慢的原因
 ''')
         
         # 使用 ArgumentDefaultsHelpFormatter 的方式来格式化参数说明
@@ -497,34 +1690,319 @@ def main():
         parser.add_argument('-d', '--depth',    type=int, default=3, metavar='num',
                           help='递归深度 (默认: 3)')
         parser.add_argument('-t', '--delay',    type=int, default=3, metavar='sec',
-                          help='页面加载延迟秒数 (默认: 3)')
+                          help='页面就绪最长等待秒数，页面提前就绪时立即继续 (默认: 3)')
         parser.add_argument('-D', '--debug',    action='store_true',
                           help='启用调试模式，显示详细日志')
         parser.add_argument('-v', '--visible',  action='store_true',
                           help='显示浏览器窗口')
+        parser.add_argument('-r', '--recycle',  type=int, default=200, metavar='num',
+                          help='每个浏览器会话处理多少页面后回收重启，0表示不回收 (默认: 200)')
+        parser.add_argument('-i', '--image-timeout', type=int, default=10, metavar='sec',
+                          help='打印前等待正文图片加载的最长秒数 (默认: 10)')
+        parser.add_argument('-p', '--prefetch', action='store_true',
+                          help='先用HTTP预取文章，跳过失效文章、直接跟随迁移链接并提取页面链接')
+        parser.add_argument('-R', '--resume',   action='store_true',
+                          help='从上次中断处继续，跳过已完成的页面')
+        parser.add_argument('--state',          metavar='file',
+                          help='爬取状态数据库路径，分布式模式下不使用 (默认: <输出目录>/.crawl_state.db)')
+        parser.add_argument('--cache',          metavar='file',
+                          help='PDF缓存索引路径 (默认: <输出目录>/.pdf_cache.db，分布式模式下为 ~/.cache/webpagetopdf/.pdf_cache.db)')
+        parser.add_argument('--no-cache',       action='store_true',
+                          help='不使用PDF缓存，每个页面都重新加载')
+        parser.add_argument('-I', '--incremental', action='store_true',
+                          help='增量爬取：已保存的文章用条件请求确认未变化后跳过，只重新渲染索引页和有更新的文章')
+        parser.add_argument('--asset-cache',    metavar='dir',
+                          help='图片、CSS等静态资源的磁盘缓存目录，跨运行复用 (默认: <输出目录>/.asset_cache，分布式模式下为 ~/.cache/webpagetopdf/.asset_cache)')
+        parser.add_argument('--asset-cache-size', type=int, default=1024, metavar='MB',
+                          help='静态资源缓存总容量，超出时按最近使用淘汰 (默认: 1024)')
+        parser.add_argument('--no-asset-cache', action='store_true',
+                          help='不使用静态资源缓存，每个浏览器使用临时缓存')
+        parser.add_argument('-S', '--stream-pdf', action='store_true',
+                          help='以流方式分块接收PDF并直接写入磁盘，降低大文件的内存占用')
+        parser.add_argument('-o', '--order',    choices=ORDERS, default='bfs',
+                          help='爬取顺序：广度优先、深度优先或按优先级 (默认: bfs)')
+        parser.add_argument('-M', '--max-pages', type=int, default=0, metavar='num',
+                          help='最多处理的页面数，0表示不限制 (默认: 0)')
+        parser.add_argument('--depth-budget',   metavar='spec',
+                          help='每层最多处理的页面数，例如 1:50,2:200')
+        parser.add_argument('-P', '--render-profile', choices=PROFILES, default='full',
+                          help='渲染配置：full 为Chrome默认行为，light 拦截统计/广告/评论/视频/字体等请求 (默认: full)')
+        parser.add_argument('-b', '--block',    action='append', default=[], metavar='pattern',
+                          help='额外拦截的URL通配符模式，可多次指定，例如 "*.gif"')
+        parser.add_argument('-O', '--optimize', action='store_true',
+                          help='保存后在后台进程中压缩PDF并合并重复图片（需要 pikepdf）')
+        parser.add_argument('--dpi',            type=int, metavar='num',
+                          help='与 -O 同用，将图片降采样到指定DPI（需要 Pillow）')
+        parser.add_argument('--postprocess-workers', type=int, default=2, metavar='num',
+                          help='PDF后处理的进程数 (默认: 2)')
+        parser.add_argument('--merge',          action='store_true',
+                          help='爬取结束后将 pdfs 下每个一级目录合并为带书签的合集PDF')
+        parser.add_argument('--print-mode',     choices=PRINT_MODES, default='full',
+                          help='打印方式：full 打印整个页面，article 只打印标题、作者信息和正文，速度更快、文件更小 (默认: full)')
+        parser.add_argument('-f', '--format',   choices=FORMATS, default='pdf',
+                          help='保存格式：pdf、mhtml 快照、内联图片的单文件 html，或 both（MHTML和PDF），'
+                               '快照不经过打印，速度快得多 (默认: pdf)')
+        parser.add_argument('--to-pdf',         action='store_true',
+                          help='延后的打印任务：将 --output 下还没有PDF的MHTML/HTML快照打印为PDF后退出')
+        parser.add_argument('-W', '--writers',  type=int, default=1, metavar='num',
+                          help='PDF写入线程数，0表示在浏览器线程中直接写盘 (默认: 1)')
+        parser.add_argument('--write-queue',    type=int, default=8, metavar='num',
+                          help='等待写入的PDF数量上限，队列满时浏览器暂停 (默认: 8)')
+        parser.add_argument('--cookies',        metavar='file',
+                          help='保存登录Cookie的文件，所有浏览器和后续运行共用 (默认: <输出目录>/.cookies.json)')
+        parser.add_argument('--no-cookies',     action='store_true',
+                          help='不导入也不保存Cookie')
+        parser.add_argument('--profile-dir',    metavar='dir',
+                          help='使用持久的Chrome用户目录保存登录状态（仅单个浏览器）')
+        parser.add_argument('-L', '--login-timeout', type=int, default=120, metavar='sec',
+                          help='爬取结束后在浏览器窗口中等待登录的最长时间，0表示不等待 (默认: 120)')
+        parser.add_argument('--login-report',   metavar='file',
+                          help='仍需登录的页面列表 (默认: <输出目录>/login_required.txt)')
+        parser.add_argument('-T', '--page-timeout', type=int, default=30, metavar='sec',
+                          help='页面加载超时秒数，超时的页面按临时性错误重试 (默认: 30)')
+        parser.add_argument('--script-timeout', type=int, default=30, metavar='sec',
+                          help='页面脚本执行超时秒数 (默认: 30)')
+        parser.add_argument('--retries',        type=int, default=2, metavar='num',
+                          help='超时、网络错误、限流和浏览器崩溃时的重试次数 (默认: 2)')
+        parser.add_argument('--backoff',        type=float, default=2.0, metavar='sec',
+                          help='首次重试前的基础等待秒数，之后每次加倍并加入随机抖动 (默认: 2)')
+        parser.add_argument('--host-interval',  type=float, default=0.0, metavar='sec',
+                          help='同一主机两次请求的最小间隔，站点限流时自动加大 (默认: 0)')
+        parser.add_argument('--breaker',        type=int, default=5, metavar='num',
+                          help='同一主机连续失败多少次后暂停访问，0表示不熔断 (默认: 5)')
+        parser.add_argument('--breaker-cooldown', type=float, default=30.0, metavar='sec',
+                          help='熔断后暂停访问该主机的秒数，试探失败时加倍 (默认: 30)')
+        parser.add_argument('-m', '--metrics',  metavar='file',
+                          help='将每个页面各阶段的耗时以JSON Lines格式写入文件，结尾附运行汇总')
+        parser.add_argument('--output',         default='pdfs', metavar='dir',
+                          help='PDF输出根目录，分布式模式下为各节点共享的目录 (默认: pdfs)')
+        parser.add_argument('--no-manifest',    action='store_true',
+                          help='不写输出清单 (<输出目录>/.manifest.jsonl 与 .manifest.db)，跳过检查直接查看磁盘')
+        parser.add_argument('--queue',          metavar='url',
+                          help='分布式任务队列：sqlite:///共享路径/queue.db 或 redis://host:6379/0')
+        parser.add_argument('--role',           choices=['coordinator', 'worker'], default='worker',
+                          help='与 --queue 同用：coordinator 写入起始URL并监控进度，worker 领取任务 (默认: worker)')
+        parser.add_argument('--lease',          type=int, default=300, metavar='sec',
+                          help='任务租约秒数，节点失联超过该时间后任务重新排队 (默认: 300)')
+        parser.add_argument('-w', '--workers',  type=int, default=1, metavar='num',
+                          help='并行浏览器数量（CDP引擎下为标签页数量），大于1时启用并行爬取 (默认: 1)')
+        parser.add_argument('-e', '--engine',   choices=['selenium', 'cdp'], default='selenium',
+                          help='浏览器控制方式：selenium 或直接连接DevTools的 cdp (默认: selenium)')
+        parser.add_argument('--no-prewarm',     action='store_true',
+                          help='不在读取URL列表和续爬状态的同时提前启动浏览器')
+        parser.add_argument('--driver-cache',   metavar='file',
+                          help='chromedriver 与 Chrome 路径缓存，跳过每次启动时的 Selenium Manager 解析 (默认: <输出目录>/.driver_paths.json，分布式模式下为 ~/.cache/webpagetopdf/.driver_paths.json)')
+        parser.add_argument('--no-driver-cache', action='store_true',
+                          help='不使用驱动路径缓存，每次启动浏览器都由 Selenium Manager 解析')
+        parser.add_argument('--profile-startup', action='store_true',
+                          help='结束时输出从进程启动到第一个浏览器可用之间各阶段的耗时')
         args = parser.parse_args()
+        profile_startup = args.profile_startup
+        profile.mark("解析命令行")
 
         if args.debug:
             print(f"开始运行... (最大深度: {args.depth}, 延迟: {args.delay}秒)")
         
-        if not os.path.exists("urls.txt"):
+        # 分布式工作节点从共享队列领取任务，转换快照时只处理已保存的文件，都不需要 urls.txt
+        is_worker = args.queue and args.role == 'worker'
+        needs_urls = not is_worker and not args.to_pdf
+        if needs_urls and not os.path.exists("urls.txt"):
             print("错误：urls.txt文件不存在！")
             return
+
+        if args.incremental and args.no_cache:
+            print("错误：增量模式 (-I) 依赖PDF缓存，不能与 --no-cache 同时使用")
+            return
         
-        os.makedirs("pdfs", exist_ok=True)
-        
-        with open("urls.txt", "r") as file:
-            urls = [line.strip() for line in file.readlines() if line.strip()]
+        os.makedirs(args.output, exist_ok=True)
+
+        # 状态库、缓存、Cookie等默认放在输出根目录下，--output 指向其他目录时随之移动；
+        # 分布式模式下节点自用的文件留在本机
+        for name, default in OUTPUT_FILES.items():
+            if getattr(args, name) is None:
+                root = NODE_LOCAL_ROOT if args.queue and name in NODE_LOCAL_FILES else args.output
+                setattr(args, name, os.path.join(root, default))
+            parent = os.path.dirname(getattr(args, name))
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+
+        # 持久化爬取状态：续爬时跳过已完成的页面，从待处理任务继续。
+        # 分布式模式下进度由共享任务队列记录，不打开状态库，也不清空
+        state = None
+        if not args.queue:
+            state = CrawlState(args.state)
+            active_stores.append(state)
+
+        # PDF缓存：已保存过的文章在加载前跳过，相同内容硬链接
+        cache = None
+        if not args.no_cache:
+            cache = PdfCache(args.cache)
+            active_stores.append(cache)
+
+        # 静态资源缓存：每个浏览器一个磁盘缓存槽位，跨运行复用
+        asset_cache = None
+        if not args.no_asset_cache:
+            slots = args.workers if args.engine == 'selenium' else 1
+            asset_cache = AssetCache(args.asset_cache, args.asset_cache_size << 20, slots=slots)
+
+        # PDF后处理：在独立进程池中压缩、降采样、去重，爬取结束后可按目录合并
+        postprocessor = None
+        if args.optimize or args.merge:
+            from postprocess import PostProcessor
+            try:
+                postprocessor = PostProcessor(workers=args.postprocess_workers, dpi=args.dpi,
+                                              optimize=args.optimize,
+                                              merge_root=args.output if args.merge else None)
+            except RuntimeError as e:
+                print(f"错误：{e}")
+                return
+            active_postprocessors.append(postprocessor)
+
+        # 写入阶段：浏览器打印完即处理下一个页面，解码写盘在写入线程中进行（流式打印时不使用）
+        writer = None
+        if args.writers and not args.stream_pdf and args.engine == 'selenium':
+            writer = PdfWriter(workers=args.writers, maxsize=args.write_queue, browsers=args.workers)
+            active_stores.insert(0, writer)  # 先于状态库关闭，剩余的写入完成后才记录状态
+
+        # 登录状态：Cookie在浏览器之间和多次运行之间共享，需要登录的页面延后处理
+        cookie_store = None if args.no_cookies else CookieStore(args.cookies)
+        profile_dir = args.profile_dir
+        if profile_dir and (args.workers > 1 or args.engine != 'selenium'):
+            print("提示：--profile-dir 只能用于单个Selenium浏览器，已改用Cookie文件共享登录状态")
+            profile_dir = None
+
+        # 容错：超时、临时性错误重试，按主机限速和熔断（所有浏览器共享）
+        retry_policy = RetryPolicy(retries=args.retries, base_delay=args.backoff)
+        host_guard = HostGuard(min_interval=args.host_interval, failure_threshold=args.breaker,
+                               cooldown=args.breaker_cooldown)
+
+        # 浏览器驱动路径：缓存 Selenium Manager 的解析结果，跨运行复用
+        driver_paths = None if args.no_driver_cache else DriverPaths(args.driver_cache)
+
+        # 输出清单：每保存一个文件登记一条记录，跳过检查和下游查询不需要遍历输出目录
+        manifest = None
+        if not args.no_manifest:
+            manifest = Manifest(args.output)
+            active_manifests.append(manifest)
+
+        # 阶段耗时统计，指定 --metrics 时同时写出JSON Lines
+        metrics = Instrumentation(args.metrics)
+        active_stores.append(metrics)
+
+        # 爬取边界：入队时去重，按 --order 调度，受每层预算和总页数限制
+        frontier = Frontier(order=args.order, max_pages=args.max_pages,
+                            depth_budgets=parse_depth_budgets(args.depth_budget),
+                            on_drop=state.mark_dropped if state else None)
+
+        crawler_kwargs = dict(max_depth=args.depth, delay=args.delay,
+                              debug=args.debug, visible=args.visible,
+                              max_pages_per_session=args.recycle,
+                              image_timeout=args.image_timeout,
+                              prefetch=args.prefetch, state=state, cache=cache,
+                              stream_pdf=args.stream_pdf, metrics=metrics, frontier=frontier,
+                              render_profile=args.render_profile, block_patterns=args.block,
+                              asset_cache=asset_cache, postprocessor=postprocessor, writer=writer,
+                              cookie_store=cookie_store, deferred_logins=DeferredLogins(),
+                              login_timeout=args.login_timeout, login_report=args.login_report,
+                              profile_dir=profile_dir, page_load_timeout=args.page_timeout,
+                              script_timeout=args.script_timeout, retry_policy=retry_policy,
+                              host_guard=host_guard, incremental=args.incremental,
+                              print_mode=args.print_mode, output_format=args.format, manifest=manifest,
+                              driver_paths=driver_paths)
+
+        profile.mark("初始化存储与配置")
+
+        # 先创建Selenium爬虫并在后台启动浏览器，读取URL列表、加载续爬状态和裁剪资源缓存与之并行
+        crawler = None
+        if args.to_pdf:
+            # 只打印本地快照，不访问站点，也不更新爬取状态和缓存
+            crawler = WebCrawler(**dict(crawler_kwargs, state=None, cache=None, prefetch=False, incremental=False))
+        elif args.engine == 'selenium' and not args.queue:
+            if args.workers > 1:
+                # 并行模式：每个工作线程一个浏览器，共享 frontier 和已访问集合
+                crawler = ParallelCrawler(workers=args.workers, **crawler_kwargs)
+            else:
+                # 所有起始URL共用一个爬虫：同一个浏览器会话和同一个已访问集合
+                crawler = WebCrawler(**crawler_kwargs)
+        if crawler:
+            active_crawlers.append(crawler)
+            if not args.no_prewarm:
+                crawler.prewarm()
+
+        urls = []
+        if needs_urls:
+            with open("urls.txt", "r") as file:
+                urls = [line.strip() for line in file.readlines() if line.strip()]
             if args.debug:
                 print(f"从urls.txt读取到 {len(urls)} 个URL")
                 print("URLs:", urls)
-        
+
+        jobs, finished = [], {}
+        if state and args.resume:
+            jobs = state.pending_jobs()
+            finished = state.finished_urls()
+            print(f"续爬：已完成 {len(finished)} 个页面，待处理 {len(jobs)} 个任务")
+        elif state and not args.to_pdf:
+            state.reset()
+        frontier.mark_seen(finished)
+        if asset_cache:
+            asset_cache.prune()
+        profile.mark("读取URL列表与续爬状态")
+
+        if args.to_pdf:
+            crawler.convert_captures(args.output)
+            crawler.print_summary()
+            return
+
+        if args.queue:
+            return run_distributed(args, urls, crawler_kwargs)
+
+        if args.engine == 'cdp':
+            # CDP引擎：一个Chrome进程，多个标签页并发
+            from cdp_engine import CDPCrawler
+            crawler = CDPCrawler(WebCrawler(**crawler_kwargs), tabs=args.workers)
+            crawler.crawler.visited_urls.update(finished)
+            active_crawlers.append(crawler)
+            try:
+                crawler.run(urls, parent_dir=args.output, jobs=jobs)
+            except Exception as e:
+                if args.debug:
+                    print(f"程序运行出错: {str(e)}")
+                    print(traceback.format_exc())
+                else:
+                    print(f"程序运行出错: {str(e)}")
+            crawler.print_summary()
+            if args.debug:
+                print("\n所有任务处理完成！")
+            return
+
+        if args.workers > 1:
+            crawler.visited_urls.update(finished)
+            try:
+                crawler.run(urls, parent_dir=args.output, jobs=jobs)
+            except Exception as e:
+                if args.debug:
+                    print(f"程序运行出错: {str(e)}")
+                    print(traceback.format_exc())
+                else:
+                    print("程序运行出错")
+            crawler.print_summary()
+            if args.debug:
+                print("\n所有任务处理完成！")
+            return
+
+        crawler.visited_urls.update(finished)
+
         try:
+            for url, depth, parent_dir in jobs:
+                frontier.push(url, depth, parent_dir)
+            crawler.drain_frontier()
+
             for url in urls:
-                crawler = WebCrawler(max_depth=args.depth, delay=args.delay, 
-                                   debug=args.debug, visible=args.visible)
+                if crawler._stop:
+                    break
                 try:
-                    crawler.process_url(url)
+                    crawler.process_url(url, args.output)
                 except Exception as e:
                     if args.debug:
                         print(f"处理URL时出错: {url}")
@@ -534,6 +2012,10 @@ def main():
                         print(traceback.format_exc())
                     else:
                         print(f"处理URL失败: {url}")
+
+            # 需要登录的页面：等待用户登录一次后重新处理
+            if crawler.login_and_requeue(frontier.retry):
+                crawler.drain_frontier()
         except Exception as e:
             if args.debug:
                 print(f"程序运行出错: {str(e)}")
@@ -542,12 +2024,15 @@ def main():
                 print(traceback.format_exc())
             else:
                 print("程序运行出错")
-        
+
+        crawler.print_summary()
         if args.debug:
             print("\n所有任务处理完成！")
 
     except KeyboardInterrupt:
         print("\n\n程序被用户中断，正在清理资源并退出...")
+        for postprocessor in active_postprocessors:
+            postprocessor.merge_root = None  # 中断时不合并不完整的目录
         sys.exit(0)
     except Exception as e:
         if args.debug:
@@ -557,9 +2042,20 @@ def main():
             print("程序运行出错")
     finally:
         # 确保所有资源都被清理
-        for crawler in active_crawlers: # type: ignore
-            if crawler.driver:
-                crawler.driver.quit()
+        for crawler in active_crawlers:
+            crawler.close()
+        for store in active_stores:
+            store.close()
+        for postprocessor in active_postprocessors:
+            print("\n等待PDF后处理完成...")
+            postprocessor.close()
+            summary = postprocessor.format_summary()
+            if summary:
+                print(f"\n{summary}")
+        for manifest in active_manifests:
+            manifest.close()
+        if profile_startup:
+            print(f"\n{profile.format()}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,328 @@
+"""输出清单：每保存一个文件追加一条记录，跳过检查和下游查询都不需要遍历输出目录
+
+清单以追加写入的 JSON Lines（<输出目录>/.manifest.jsonl）为准，同时维护一个SQLite索引
+（<输出目录>/.manifest.db），按路径、URL和文章ID直接查询；索引丢失或损坏时由 JSON Lines 重建。
+路径以相对输出根目录的形式保存，输出目录整体移动或在各节点挂载到不同位置后清单仍然有效。
+
+    python manifest.py stats                           # 按类型统计文件数和总大小
+    python manifest.py has <URL>                       # 是否已保存，退出码 0 表示已保存
+    python manifest.py query --title 周报 --since 2026-10-01
+    python manifest.py export -f csv -o manifest.csv   # 导出全部记录
+    python manifest.py scan                            # 一次性登记建立清单之前保存的文件
+    python manifest.py verify                          # 删除文件已不存在的记录
+    python manifest.py rebuild                         # 由 JSON Lines 重建索引
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from cache import article_id, canonical_article_url
+
+JSONL_NAME = ".manifest.jsonl"
+INDEX_NAME = ".manifest.db"
+KINDS = ("pdf", "mhtml", "html")
+
+FIELDS = ("path", "url", "canonical_url", "article_id", "title", "depth", "parent",
+          "kind", "size", "sha256", "saved_at")
+
+# 输出目录可能位于网络文件系统上，不使用WAL，与分布式任务队列相同
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY,
+    url TEXT,
+    canonical_url TEXT,
+    article_id TEXT,
+    title TEXT,
+    depth INTEGER,
+    parent TEXT,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    saved_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outputs_url ON outputs(canonical_url);
+CREATE INDEX IF NOT EXISTS idx_outputs_article ON outputs(article_id);
+"""
+
+
+def file_checksum(path):
+    """返回文件的 (字节数, SHA-256)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+class Manifest:
+    """输出清单，多个工作线程共享同一实例"""
+
+    def __init__(self, root):
+        self.root = root
+        self.jsonl_path = os.path.join(root, JSONL_NAME)
+        self.index_path = os.path.join(root, INDEX_NAME)
+        os.makedirs(root, exist_ok=True)
+        fresh = not os.path.exists(self.index_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.index_path, timeout=60, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._file = open(self.jsonl_path, "a", encoding="utf-8")
+        if fresh and os.path.getsize(self.jsonl_path):
+            self.rebuild()
+
+    def relative(self, path):
+        """输出根目录下的相对路径，统一使用 / 分隔"""
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.root)).replace(os.sep, "/")
+
+    def absolute(self, path):
+        return os.path.join(self.root, *path.split("/"))
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _upsert(self, entry):
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO outputs ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+            [entry.get(field) for field in FIELDS])
+
+    def has(self, path):
+        """该文件是否已登记且仍在磁盘上；文件已被删除或移走时同时删除这条失效记录"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM outputs WHERE path = ?", (self.relative(path),)).fetchone()
+        if row is None:
+            return False
+        if not os.path.exists(path):
+            self.remove(path)
+            return False
+        return True
+
+    def get(self, path):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM outputs WHERE path = ?", (self.relative(path),)).fetchone()
+        return dict(row) if row else None
+
+    def record(self, path, url=None, title=None, depth=None, parent=None, size=None, checksum=None):
+        """登记一个已保存的文件；未给出大小和校验和时读取文件计算"""
+        if size is None or checksum is None:
+            size, checksum = file_checksum(path)
+        entry = {
+            "path": self.relative(path),
+            "url": url,
+            "canonical_url": canonical_article_url(url) if url else None,
+            "article_id": article_id(url) if url else None,
+            "title": title,
+            "depth": depth,
+            "parent": self.relative(parent) if parent is not None else None,
+            "kind": os.path.splitext(path)[1][1:].lower(),
+            "size": size,
+            "sha256": checksum,
+            "saved_at": time.time(),
+        }
+        with self._lock:
+            self._append(entry)
+            self._upsert(entry)
+            self._conn.commit()
+        return entry
+
+    def refresh(self, path):
+        """文件被改写后（例如PDF后处理）重新登记大小和校验和，其余字段不变"""
+        entry = self.get(path)
+        if entry is None:
+            return None
+        parent = self.absolute(entry["parent"]) if entry["parent"] is not None else None
+        return self.record(path, entry["url"], entry["title"], entry["depth"], parent)
+
+    def remove(self, path):
+        """删除记录，在 JSON Lines 中追加删除标记"""
+        relative = self.relative(path)
+        with self._lock:
+            self._append({"path": relative, "deleted": True, "saved_at": time.time()})
+            self._conn.execute("DELETE FROM outputs WHERE path = ?", (relative,))
+            self._conn.commit()
+
+    def find(self, url):
+        """返回该文章已保存的全部文件，同一篇文章可能出现在多个目录中"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM outputs WHERE canonical_url = ? ORDER BY saved_at",
+                                      (canonical_article_url(url),)).fetchall()
+        return [dict(row) for row in rows]
+
+    def query(self, url=None, article=None, title=None, kind=None, since=None, limit=None):
+        """按条件查询记录，title 为子串匹配，since 为时间戳"""
+        clauses, params = [], []
+        if url:
+            clauses.append("canonical_url = ?")
+            params.append(canonical_article_url(url))
+        if article:
+            clauses.append("article_id = ?")
+            params.append(article)
+        if title:
+            clauses.append("title LIKE ?")
+            params.append(f"%{title}%")
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if since is not None:
+            clauses.append("saved_at >= ?")
+            params.append(since)
+        sql = "SELECT * FROM outputs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY saved_at"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def pending_captures(self):
+        """已登记但还没有同名PDF的快照（绝对路径）；同一篇文章同时有MHTML和HTML时只取MHTML"""
+        with self._lock:
+            rows = self._conn.execute("SELECT path, kind FROM outputs").fetchall()
+        paths = {row["path"] for row in rows}
+        stems = {}
+        for row in sorted(rows, key=lambda row: (row["path"].rsplit(".", 1)[0], row["kind"] != "mhtml")):
+            stem = row["path"].rsplit(".", 1)[0]
+            if row["kind"] in ("mhtml", "html") and f"{stem}.pdf" not in paths:
+                stems.setdefault(stem, self.absolute(row["path"]))
+        return list(stems.values())
+
+    def stats(self):
+        """按文件类型统计 {类型: (文件数, 总字节数)}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, COUNT(*) AS files, SUM(size) AS bytes FROM outputs "
+                                      "GROUP BY kind ORDER BY kind").fetchall()
+        return {row["kind"]: (row["files"], row["bytes"] or 0) for row in rows}
+
+    def scan(self):
+        """登记输出目录中尚未登记的文件（建立清单之前保存的文件），返回新登记的数量"""
+        added = 0
+        for directory, dirs, files in os.walk(self.root):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in files:
+                path = os.path.join(directory, name)
+                if os.path.splitext(name)[1][1:].lower() in KINDS and not self.has(path):
+                    self.record(path, title=os.path.splitext(name)[0])  # URL、深度和父目录未知
+                    added += 1
+        return added
+
+    def verify(self):
+        """删除文件已不存在的记录，返回删除的数量"""
+        missing = [row["path"] for row in self.query() if not os.path.exists(self.absolute(row["path"]))]
+        for path in missing:
+            self.remove(self.absolute(path))
+        return len(missing)
+
+    def rebuild(self):
+        """清空索引，按顺序重放 JSON Lines，返回记录数"""
+        with self._lock:
+            self._file.flush()
+            self._conn.execute("DELETE FROM outputs")
+            with open(self.jsonl_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 写入中断留下的不完整行
+                    if entry.get("deleted"):
+                        self._conn.execute("DELETE FROM outputs WHERE path = ?", (entry["path"],))
+                    else:
+                        self._upsert(entry)
+            self._conn.commit()
+            return self._conn.execute("SELECT COUNT(*) FROM outputs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._conn.close()
+
+
+def parse_since(value):
+    """YYYY-MM-DD 或 YYYY-MM-DD HH:MM 转为时间戳"""
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"无法解析时间: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='输出清单：查询和导出已保存的文件，无需遍历输出目录')
+    parser.add_argument('--root', default='pdfs', metavar='dir', help='输出根目录 (默认: pdfs)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help='按类型统计文件数和总大小')
+    has = commands.add_parser('has', help='文章是否已保存，已保存时输出文件路径，退出码 0')
+    has.add_argument('url')
+    query = commands.add_parser('query', help='按条件查询记录')
+    query.add_argument('--url', help='文章URL（按规范化URL匹配）')
+    query.add_argument('--id', dest='article', metavar='id', help='文章ID，例如 __biz:mid:idx')
+    query.add_argument('--title', metavar='text', help='标题包含的文本')
+    query.add_argument('--kind', choices=KINDS, help='文件类型')
+    query.add_argument('--since', type=parse_since, metavar='time', help='只列出该时间之后保存的文件')
+    query.add_argument('-n', '--limit', type=int, metavar='num', help='最多列出的记录数')
+    query.add_argument('--json', action='store_true', help='以 JSON Lines 输出完整记录')
+    export = commands.add_parser('export', help='导出全部记录')
+    export.add_argument('-f', '--format', choices=['jsonl', 'csv'], default='jsonl', help='导出格式 (默认: jsonl)')
+    export.add_argument('-o', '--output', metavar='file', help='输出文件，不指定时写到标准输出')
+    commands.add_parser('scan', help='一次性登记建立清单之前保存的文件')
+    commands.add_parser('verify', help='删除文件已不存在的记录')
+    commands.add_parser('rebuild', help='由 JSON Lines 重建SQLite索引')
+    args = parser.parse_args()
+
+    manifest = Manifest(args.root)
+    try:
+        if args.command == 'stats':
+            stats = manifest.stats()
+            for kind, (files, size) in stats.items():
+                print(f"{kind:<6}{files:>10} 个  {size / 1048576:>10.1f} MB")
+            if not stats:
+                print("清单为空")
+        elif args.command == 'has':
+            rows = [row for row in manifest.find(args.url) if manifest.has(manifest.absolute(row['path']))]
+            for row in rows:
+                print(manifest.absolute(row['path']))
+            return 0 if rows else 1
+        elif args.command == 'query':
+            rows = manifest.query(args.url, args.article, args.title, args.kind, args.since, args.limit)
+            for row in rows:
+                if args.json:
+                    print(json.dumps(row, ensure_ascii=False))
+                else:
+                    print(f"{manifest.absolute(row['path'])}\t{row['size']}\t{row['url'] or ''}")
+        elif args.command == 'export':
+            out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+            try:
+                if args.format == 'csv':
+                    writer = csv.DictWriter(out, fieldnames=FIELDS)
+                    writer.writeheader()
+                    writer.writerows(manifest.query())
+                else:
+                    for row in manifest.query():
+                        out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            finally:
+                if args.output:
+                    out.close()
+        elif args.command == 'scan':
+            print(f"新登记 {manifest.scan()} 个文件")
+        elif args.command == 'verify':
+            print(f"删除失效记录 {manifest.verify()} 条")
+        elif args.command == 'rebuild':
+            print(f"索引已重建: {manifest.rebuild()} 条记录")
+    finally:
+        manifest.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""运行指标：按页面记录各阶段耗时，输出JSON Lines并在运行结束时汇总"""
+import json
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# 汇总表中各阶段的显示顺序
+STAGES = (
+    "driver_start",      # 启动浏览器
+    "host_wait",         # 等待主机限速或熔断放行
+    "prefetch",          # HTTP预取
+    "cache_restore",     # 从PDF缓存恢复
+    "revalidate",        # 增量模式的条件请求
+    "page_load",         # driver.get
+    "ready_wait",        # 等待页面就绪
+    "probe",             # 一次性页面探测
+    "status_check",      # 文章状态检查
+    "migration_check",   # 文章迁移检查
+    "login_check",       # 登录检查
+    "title",             # 标题提取
+    "lazy_images",       # 懒加载图片
+    "article_document",  # 生成正文打印文档
+    "print_pdf",         # Page.printToPDF
+    "write_pdf",         # 解码并写入磁盘
+    "capture",           # 截取MHTML/HTML快照
+    "write_capture",     # 写入快照
+    "link_extraction",   # 链接提取
+)
+
+
+def percentile(values, pct):
+    """最近秩法计算百分位数，values需已排序"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+class Instrumentation:
+    """线程安全的阶段计时器，多个工作线程共享同一实例"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8") if path else None
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.durations = defaultdict(list)
+        self.pages = 0
+        self.bytes_written = 0
+        self.failures = Counter()
+        self.retries = Counter()
+
+    def _emit(self, record):
+        if self._file:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    @contextmanager
+    def span(self, stage, url=None, depth=None, **fields):
+        """记录一个阶段的耗时；可在 with 块内向返回的字典补充字段（如 bytes）"""
+        record = {"event": "span", "stage": stage, "url": url, "depth": depth}
+        record.update(fields)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["duration"] = round(time.perf_counter() - start, 6)
+            record["ts"] = round(time.time(), 3)
+            record["thread"] = threading.current_thread().name
+            with self._lock:
+                self.durations[stage].append(record["duration"])
+                self._emit(record)
+
+    def page_done(self, url, depth, bytes_written=0):
+        """记录一个页面处理完成"""
+        with self._lock:
+            self.pages += 1
+            self.bytes_written += bytes_written or 0
+            self._emit({"event": "page", "url": url, "depth": depth,
+                        "bytes": bytes_written or 0, "ts": round(time.time(), 3)})
+
+    def failure(self, url, depth, reason):
+        """按原因记录失败或跳过的页面"""
+        with self._lock:
+            self.failures[reason] += 1
+            self._emit({"event": "failure", "url": url, "depth": depth,
+                        "reason": reason, "ts": round(time.time(), 3)})
+
+    def retry(self, url, depth, reason, attempt, delay):
+        """记录一次重试及其退避时间"""
+        with self._lock:
+            self.retries[reason] += 1
+            self._emit({"event": "retry", "url": url, "depth": depth, "reason": reason,
+                        "attempt": attempt, "delay": round(delay, 3), "ts": round(time.time(), 3)})
+
+    def summary(self):
+        """汇总各阶段的 p50/p95/p99、吞吐量、写入字节数和失败原因"""
+        with self._lock:
+            elapsed = max(time.time() - self.started, 1e-6)
+            stages = {}
+            names = list(STAGES) + sorted(set(self.durations) - set(STAGES))
+            for stage in names:
+                values = sorted(self.durations.get(stage, ()))
+                if not values:
+                    continue
+                stages[stage] = {
+                    "count": len(values),
+                    "total": round(sum(values), 3),
+                    "p50": round(percentile(values, 50), 3),
+                    "p95": round(percentile(values, 95), 3),
+                    "p99": round(percentile(values, 99), 3),
+                }
+            return {
+                "elapsed": round(elapsed, 3),
+                "pages": self.pages,
+                "pages_per_min": round(self.pages * 60 / elapsed, 2),
+                "bytes_written": self.bytes_written,
+                "failures": dict(self.failures),
+                "retries": dict(self.retries),
+                "stages": stages,
+            }
+
+    def format_summary(self, summary=None):
+        """将汇总结果格式化为文本表格"""
+        summary = summary or self.summary()
+        lines = [
+            f"耗时: {summary['elapsed']:.1f} 秒, 页面: {summary['pages']}, "
+            f"吞吐: {summary['pages_per_min']:.1f} 页/分钟, "
+            f"写入: {summary['bytes_written'] / 1048576:.1f} MB",
+            "",
+            f"{'阶段':<18}{'次数':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'总计':>8}",
+        ]
+        for stage, item in summary["stages"].items():
+            lines.append(f"{stage:<20}{item['count']:>8}{item['p50']:>10.3f}"
+                         f"{item['p95']:>10.3f}{item['p99']:>10.3f}{item['total']:>10.1f}")
+        if summary["failures"]:
+            lines.append("")
+            lines.append("失败/跳过原因:")
+            for reason, count in sorted(summary["failures"].items(), key=lambda item: -item[1]):
+                lines.append(f"  {count:>5}  {reason}")
+        if summary.get("retries"):
+            lines.append("")
+            lines.append("重试原因:")
+            for reason, count in sorted(summary["retries"].items(), key=lambda item: -item[1]):
+                lines.append(f"  {count:>5}  {reason}")
+        return "\n".join(lines)
+
+    def close(self):
+        """写入最终汇总并关闭输出文件"""
+        if self._file:
+            summary = self.summary()
+            summary["event"] = "summary"
+            with self._lock:
+                self._emit(summary)
+                self._file.close()
+                self._file = None
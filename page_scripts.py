@@ -0,0 +1,308 @@
+"""注入页面执行的脚本及打印参数，Selenium与CDP两种引擎共用
+
+脚本按 Selenium execute_script 的约定编写：参数通过 arguments 传入，
+异步脚本以最后一个参数作为完成回调。
+"""
+
+NETWORK_IDLE_SECONDS = 0.5  # 无进行中请求持续多久视为网络空闲
+READY_POLL_INTERVAL = 0.1   # 就绪检测的轮询间隔
+PDF_STREAM_CHUNK = 1 << 20  # 流式读取PDF时每次 IO.read 的字节数
+
+# Page.printToPDF 参数：A4纸张、无边距、保留背景
+PRINT_OPTIONS = {
+    'landscape': False,
+    'displayHeaderFooter': False,
+    'printBackground': True,
+    'preferCSSPageSize': True,
+    'paperWidth': 8.27,
+    'paperHeight': 11.69,
+    'marginTop': 0,
+    'marginBottom': 0,
+    'marginLeft': 0,
+    'marginRight': 0,
+    'scale': 1.0,
+}
+
+PRINT_MODES = ("full", "article")
+
+# 正文打印模式：页面替换为只含标题、作者信息和正文的精简文档，页边距由打印参数控制
+ARTICLE_PRINT_OPTIONS = dict(PRINT_OPTIONS, marginTop=0.6, marginBottom=0.6, marginLeft=0.55, marginRight=0.55)
+
+ARTICLE_PRINT_CSS = """
+@page { size: A4; }
+html { -webkit-print-color-adjust: exact; print-color-adjust: exact; }
+body {
+    margin: 0;
+    font-family: -apple-system, "PingFang SC", "Hiragino Sans GB", "Microsoft YaHei", sans-serif;
+    font-size: 16px;
+    line-height: 1.75;
+    color: #333;
+    overflow-wrap: break-word;
+}
+h1 { font-size: 22px; line-height: 1.4; margin: 0 0 10px; }
+.meta { color: rgba(0, 0, 0, 0.5); font-size: 14px; margin-bottom: 24px; }
+.meta span + span { margin-left: 10px; }
+#js_content { visibility: visible !important; opacity: 1 !important; }
+#js_content * { max-width: 100% !important; box-sizing: border-box; }
+#js_content img { height: auto !important; break-inside: avoid; }
+pre, code { white-space: pre-wrap; }
+"""
+
+# 取出标题、公众号名称、作者、发布时间和 #js_content，生成精简的打印文档（HTML字符串）；
+# 去掉脚本、iframe（视频、评论）、音频和小程序卡片等打印时无意义的元素。页面没有正文时返回null
+ARTICLE_DOCUMENT_JS = """
+var css = arguments[0];
+var content = document.querySelector('#js_content');
+if (!content) {
+    return null;
+}
+
+function text(selectors) {
+    for (var i = 0; i < selectors.length; i++) {
+        var el = document.querySelector(selectors[i]);
+        if (el && el.textContent.trim()) {
+            return el.textContent.trim();
+        }
+    }
+    return '';
+}
+
+var doc = document.implementation.createHTMLDocument(document.title);
+var charset = doc.createElement('meta');
+charset.setAttribute('charset', 'utf-8');
+doc.head.appendChild(charset);
+var base = doc.createElement('base');
+base.href = location.href;  // 图片等相对地址按原页面解析，直接命中已加载的缓存
+doc.head.appendChild(base);
+var style = doc.createElement('style');
+style.textContent = css;
+doc.head.appendChild(style);
+
+var title = doc.createElement('h1');
+title.textContent = text(['#activity-name', '.rich_media_title']) || document.title;
+doc.body.appendChild(title);
+
+var meta = doc.createElement('div');
+meta.className = 'meta';
+[text(['#js_author_name', '.rich_media_meta_text']), text(['#js_name', '.rich_media_meta_nickname']),
+ text(['#publish_time'])].forEach(function (value) {
+    if (value) {
+        var span = doc.createElement('span');
+        span.textContent = value;
+        meta.appendChild(span);
+    }
+});
+doc.body.appendChild(meta);
+
+var body = doc.importNode(content, true);
+body.removeAttribute('style');  // 微信在脚本执行前以 visibility:hidden 隐藏正文
+body.querySelectorAll('script, noscript, iframe, mpvoice, mp-common-mpaudio, qqmusic, mp-miniprogram, ' +
+                      'mp-common-profile, .qr_code_pc').forEach(function (el) {
+    el.parentNode.removeChild(el);
+});
+doc.body.appendChild(body);
+return '<!DOCTYPE html>' + doc.documentElement.outerHTML;
+"""
+
+# 将当前页面序列化为单文件HTML：arguments[0] 为 图片URL -> data URI，arguments[1] 为 样式表URL -> CSS文本，
+# 均取自已加载页面的资源，不重新下载；未能内联的资源改为绝对地址。去掉脚本，避免离线打开时重新渲染或跳转
+SINGLE_FILE_HTML_JS = """
+var images = arguments[0], styles = arguments[1];
+var root = document.documentElement.cloneNode(true);
+var originals = document.getElementsByTagName('img');
+var clones = root.getElementsByTagName('img');
+for (var i = 0; i < clones.length && i < originals.length; i++) {
+    var src = originals[i].currentSrc || originals[i].src;
+    if (src) {
+        clones[i].setAttribute('src', images[src] || src);
+    }
+    clones[i].removeAttribute('srcset');
+    clones[i].removeAttribute('data-src');
+}
+root.querySelectorAll('link[rel~=stylesheet]').forEach(function (link) {
+    var css = styles[link.href];
+    if (css !== undefined) {
+        var style = document.createElement('style');
+        style.textContent = css;
+        link.parentNode.replaceChild(style, link);
+    } else if (link.href) {
+        link.setAttribute('href', link.href);
+    }
+});
+root.querySelectorAll('script, noscript, link[rel=preload], link[rel=prefetch], ' +
+                      'meta[charset], meta[http-equiv]').forEach(function (el) {
+    el.parentNode.removeChild(el);
+});
+
+var head = root.querySelector('head');
+if (!head.querySelector('base')) {
+    var base = document.createElement('base');
+    base.href = location.href;  // 链接和未内联资源的相对地址按原页面解析
+    head.insertBefore(base, head.firstChild);
+}
+var charset = document.createElement('meta');
+charset.setAttribute('charset', 'utf-8');
+head.insertBefore(charset, head.firstChild);
+return '<!DOCTYPE html>\\n' + root.outerHTML;
+"""
+
+# 一次性读取页面就绪相关的状态
+READY_STATE_JS = """
+var pending = 0;
+document.querySelectorAll('img[data-src]').forEach(function (img) {
+    var src = img.getAttribute('src') || '';
+    if (src && src.indexOf('data:') !== 0 && !img.complete) {
+        pending += 1;
+    }
+});
+return {
+    readyState: document.readyState,
+    hasContent: !!(document.querySelector('.rich_media_title') || document.querySelector('#js_content')),
+    pendingImages: pending
+};
+"""
+
+# 将正文中懒加载图片的 data-src 提升为 src，并等待这些图片加载完成
+LAZY_IMAGES_JS = """
+var done = arguments[arguments.length - 1];
+var timeoutMs = arguments[0];
+var images = Array.prototype.slice.call(document.querySelectorAll('#js_content img[data-src]'));
+var result = {total: images.length, loaded: 0, failed: 0, timedOut: false};
+var pending = 0;
+var finished = false;
+
+function finish(timedOut) {
+    if (finished) {
+        return;
+    }
+    finished = true;
+    result.timedOut = timedOut;
+    done(result);
+}
+
+function settle(ok) {
+    if (ok) {
+        result.loaded += 1;
+    } else {
+        result.failed += 1;
+    }
+    pending -= 1;
+    if (pending === 0) {
+        finish(false);
+    }
+}
+
+images.forEach(function (img) {
+    var dataSrc = img.getAttribute('data-src');
+    var src = img.getAttribute('src') || '';
+    img.loading = 'eager';
+    if (!src || src.indexOf('data:') === 0 || src.indexOf(dataSrc) !== 0) {
+        img.setAttribute('src', dataSrc);
+    }
+    if (img.complete) {
+        if (img.naturalWidth > 0) {
+            result.loaded += 1;
+        } else {
+            result.failed += 1;
+        }
+        return;
+    }
+    pending += 1;
+    img.addEventListener('load', function () { settle(true); }, {once: true});
+    img.addEventListener('error', function () { settle(false); }, {once: true});
+});
+
+if (pending === 0) {
+    finish(false);
+} else {
+    setTimeout(function () { finish(true); }, timeoutMs);
+}
+"""
+
+
+# 一次注入即可取得页面状态、迁移链接、标题、登录标志和去重后的链接列表
+PAGE_PROBE_JS = """
+var errorPatterns = arguments[0];
+var migrationText = arguments[1];
+var buttonText = arguments[2];
+var loginPatterns = arguments[3] || [];
+
+function clean(text) {
+    return (text || '').trim();
+}
+
+var texts = [];
+if (document.body) {
+    var walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT, {
+        acceptNode: function (node) {
+            var tag = node.parentNode && node.parentNode.nodeName;
+            return tag === 'SCRIPT' || tag === 'STYLE' ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_ACCEPT;
+        }
+    });
+    while (walker.nextNode()) {
+        texts.push(walker.currentNode.nodeValue);
+    }
+}
+var pageText = texts.join('\\n');
+
+var status = null;
+for (var i = 0; i < errorPatterns.length; i++) {
+    if (pageText.indexOf(errorPatterns[i]) !== -1) {
+        status = errorPatterns[i];
+        break;
+    }
+}
+
+var migrated = pageText.indexOf(migrationText) !== -1;
+var migrationUrl = null;
+if (migrated) {
+    var anchors = document.querySelectorAll('a');
+    for (var j = 0; j < anchors.length; j++) {
+        if (anchors[j].textContent.indexOf(buttonText) !== -1) {
+            var target = anchors[j].href || (anchors[j].parentNode && anchors[j].parentNode.href);
+            migrationUrl = target || null;
+            break;
+        }
+    }
+}
+
+var richTitle = document.querySelector('.rich_media_title');
+var h1 = document.querySelector('h1');
+var title = clean(richTitle && richTitle.innerText)
+    || clean(h1 && h1.innerText)
+    || clean(document.title)
+    || '未命名文章';
+
+var content = document.querySelector('#js_content');
+
+// 出现登录/验证提示，或微信文章页（/s 与 /s/...）既无标题也无正文时才视为需要登录；
+// 合集、主页等索引页和其他站点的普通页面没有 rich_media_title 也照常保存
+var needsLogin = !!document.querySelector('input[type=password]');
+for (var k = 0; !needsLogin && k < loginPatterns.length; k++) {
+    needsLogin = pageText.indexOf(loginPatterns[k]) !== -1;
+}
+var articlePath = location.pathname === '/s' || location.pathname.indexOf('/s/') === 0;
+if (!needsLogin && location.hostname === 'mp.weixin.qq.com' && articlePath && !status && !migrated) {
+    needsLogin = !richTitle && !content;
+}
+
+var seen = {};
+var links = [];
+document.querySelectorAll('a').forEach(function (a) {
+    var href = a.href;
+    if (href && !seen[href]) {
+        seen[href] = true;
+        links.push(href);
+    }
+});
+
+return {
+    status: status,
+    migrated: migrated,
+    migrationUrl: migrationUrl,
+    title: title,
+    needsLogin: needsLogin,
+    content: content ? content.textContent.trim() : null,
+    links: links
+};
+"""
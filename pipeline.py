@@ -0,0 +1,152 @@
+"""流水线阶段：浏览器线程打印完PDF即转向下一个URL，解码和写盘交给写入线程
+
+阶段之间是有界队列：写入线程跟不上时 submit 阻塞（背压），
+避免尚未写盘的base64数据在内存中无限堆积。每个阶段统计处理数、队列深度和利用率。
+"""
+import base64
+import hashlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class StageStats:
+    """单个阶段的统计：处理数、忙碌时间、队列深度和背压等待时间"""
+
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.depth_max = 0
+        self.depth_total = 0
+        self.depth_samples = 0
+        self._lock = threading.Lock()
+
+    def record(self, duration):
+        with self._lock:
+            self.items += 1
+            self.busy += duration
+
+    def sample_depth(self, depth, blocked=0.0):
+        with self._lock:
+            self.depth_max = max(self.depth_max, depth)
+            self.depth_total += depth
+            self.depth_samples += 1
+            self.blocked += blocked
+
+    def summary(self, elapsed):
+        with self._lock:
+            capacity = max(elapsed, 1e-6) * self.workers
+            return {
+                "stage": self.name,
+                "items": self.items,
+                "busy": round(self.busy, 3),
+                "utilization": round(min(self.busy / capacity, 1.0), 3),
+                "queue_max": self.depth_max,
+                "queue_avg": round(self.depth_total / self.depth_samples, 2) if self.depth_samples else 0,
+                "blocked": round(self.blocked, 3),
+            }
+
+
+class Stage:
+    """有界队列 + 固定数量的工作线程，任务为无参可调用对象，结果通过 Future 返回"""
+
+    def __init__(self, name, workers=1, maxsize=8):
+        self.name = name
+        self.stats = StageStats(name, workers)
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(1, max(1, workers) + 1)
+        ]
+        self._closed = False
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, task):
+        """放入一个任务；队列已满时阻塞到有空位，返回 Future"""
+        future = Future()
+        start = time.perf_counter()
+        self._queue.put((task, future))
+        self.stats.sample_depth(self._queue.qsize(), time.perf_counter() - start)
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            task, future = item
+            start = time.perf_counter()
+            try:
+                if future.set_running_or_notify_cancel():
+                    future.set_result(task())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self.stats.record(time.perf_counter() - start)
+                self._queue.task_done()
+
+    def drain(self):
+        """等待已提交的任务全部完成"""
+        self._queue.join()
+
+    def close(self):
+        """处理完剩余任务后结束工作线程"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+def write_pdf(pdf_path, data):
+    """解码 Page.printToPDF 返回的base64数据，写入临时文件后原子重命名，返回 (内容哈希, 字节数)"""
+    raw = base64.b64decode(data)
+    tmp_path = pdf_path + ".part"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(raw)
+        os.replace(tmp_path, pdf_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return hashlib.sha256(raw).hexdigest(), len(raw)
+
+
+class PdfWriter(Stage):
+    """PDF写入阶段，多个浏览器线程共享"""
+
+    def __init__(self, workers=1, maxsize=8, browsers=1):
+        super().__init__("write", workers, maxsize)
+        self.started = time.time()
+        self.render = StageStats("render", browsers)  # 浏览器线程处理页面的时间，由爬虫记录
+
+    def write(self, pdf_path, data, metrics=None, url=None, depth=None):
+        """异步写入PDF，返回结果为 (内容哈希, 字节数) 的 Future"""
+        def task():
+            if metrics is None:
+                return write_pdf(pdf_path, data)
+            with metrics.span("write_pdf", url=url, depth=depth, queued=True) as record:
+                digest, size = write_pdf(pdf_path, data)
+                record["bytes"] = size
+            return digest, size
+        return self.submit(task)
+
+    def summary(self):
+        elapsed = time.time() - self.started
+        return [self.render.summary(elapsed), self.stats.summary(elapsed)]
+
+    def format_summary(self):
+        lines = [f"{'阶段':<8}{'处理数':>6}{'利用率':>8}{'队列峰值':>8}{'平均队列':>8}{'背压等待':>8}"]
+        for item in self.summary():
+            lines.append(f"{item['stage']:<10}{item['items']:>9}{item['utilization'] * 100:>10.1f}%"
+                         f"{item['queue_max']:>11}{item['queue_avg']:>12}{item['blocked']:>11.1f}s")
+        return "\n".join(lines)
@@ -0,0 +1,345 @@
+"""PDF后处理：流重新压缩、图片按目标DPI降采样、重复图片去重，以及按目录合并为带书签的合集
+
+依赖 pikepdf（降采样另需 Pillow），均为可选依赖。爬取时后处理在独立进程池中执行，
+不阻塞浏览器；也可以单独运行：
+
+    python postprocess.py pdfs                 # 压缩 pdfs 下的所有PDF
+    python postprocess.py pdfs --dpi 120       # 同时将图片降采样到 120 DPI
+    python postprocess.py pdfs --merge         # 每个一级目录合并为一个带书签的合集
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+MERGED_SUFFIX = "_合集.pdf"
+MIN_DOWNSAMPLE_RATIO = 1.1  # 图片分辨率超过目标至少这么多时才降采样
+
+
+def _require_pikepdf():
+    try:
+        import pikepdf
+    except ImportError:
+        raise RuntimeError("PDF后处理需要 pikepdf 包，请运行：pip install pikepdf pillow")
+    return pikepdf
+
+
+def _xobjects(resources, seen=None):
+    """遍历资源字典中的图片，包括嵌套在表单XObject中的图片，产出 (XObject字典, 名称, 图片)"""
+    pikepdf = _require_pikepdf()
+    seen = set() if seen is None else seen
+    xobjects = resources.get("/XObject") if resources is not None else None
+    if xobjects is None:
+        return
+    for name in list(xobjects.keys()):
+        xobj = xobjects[name]
+        if not isinstance(xobj, pikepdf.Stream):
+            continue
+        subtype = xobj.get("/Subtype")
+        if subtype == pikepdf.Name.Image:
+            yield xobjects, name, xobj
+        elif subtype == pikepdf.Name.Form and xobj.objgen not in seen:
+            seen.add(xobj.objgen)
+            yield from _xobjects(xobj.get("/Resources"), seen)
+
+
+def _image_key(xobj):
+    """图片内容指纹：原始流字节、尺寸、编码、颜色空间和透明蒙版"""
+    digest = hashlib.sha256(xobj.read_raw_bytes())
+    for key in ("/Width", "/Height", "/BitsPerComponent", "/Filter", "/ColorSpace", "/Decode"):
+        digest.update(repr(xobj.get(key)).encode())
+    smask = xobj.get("/SMask")
+    if smask is not None:
+        digest.update(smask.read_raw_bytes())
+    return digest.hexdigest()
+
+
+def dedup_images(pdf):
+    """让内容相同的图片共用同一个对象，返回被替换的引用数"""
+    canonical, replaced = {}, 0
+    for page in pdf.pages:
+        for xobjects, name, xobj in _xobjects(page.obj.get("/Resources")):
+            key = _image_key(xobj)
+            first = canonical.setdefault(key, xobj)
+            if first.objgen != xobj.objgen:
+                xobjects[name] = first
+                replaced += 1
+    return replaced
+
+
+def _write_flate(xobj, image, colorspace):
+    import pikepdf
+    xobj.write(zlib.compress(image.tobytes(), 9), filter=pikepdf.Name.FlateDecode)
+    xobj.Width, xobj.Height = image.size
+    xobj.ColorSpace = colorspace
+    xobj.BitsPerComponent = 8
+
+
+def downsample_images(pdf, dpi=150, jpeg_quality=80):
+    """将超过页面宽度所需分辨率的图片缩小到目标DPI，返回处理的图片数
+
+    只处理8位RGB/灰度图片：原为JPEG的重新编码为JPEG，其余保持无损压缩；透明蒙版同步缩小。
+    """
+    import io
+
+    pikepdf = _require_pikepdf()
+    from PIL import Image
+
+    done, handled = 0, set()
+    for page in pdf.pages:
+        width_in = float(page.mediabox[2] - page.mediabox[0]) / 72
+        max_width = max(1, int(width_in * dpi))
+        for _, _, xobj in _xobjects(page.obj.get("/Resources")):
+            if xobj.objgen in handled:
+                continue
+            handled.add(xobj.objgen)
+            if int(xobj.get("/Width", 0)) < max_width * MIN_DOWNSAMPLE_RATIO:
+                continue
+            if xobj.get("/BitsPerComponent") != 8 or "/Decode" in xobj or "/Mask" in xobj:
+                continue
+            try:
+                image = pikepdf.PdfImage(xobj).as_pil_image()
+            except Exception:
+                continue
+            if image.mode not in ("RGB", "L"):
+                continue
+
+            size = (max_width, max(1, round(image.height * max_width / image.width)))
+            resized = image.resize(size, Image.LANCZOS)
+            colorspace = pikepdf.Name.DeviceRGB if image.mode == "RGB" else pikepdf.Name.DeviceGray
+            smask = xobj.get("/SMask")
+            if smask is not None:
+                try:
+                    mask = pikepdf.PdfImage(smask).as_pil_image().convert("L")
+                except Exception:
+                    continue
+                _write_flate(smask, mask.resize(size, Image.LANCZOS), pikepdf.Name.DeviceGray)
+
+            if xobj.get("/Filter") == pikepdf.Name.DCTDecode:
+                buffer = io.BytesIO()
+                resized.save(buffer, "JPEG", quality=jpeg_quality, optimize=True)
+                xobj.write(buffer.getvalue(), filter=pikepdf.Name.DCTDecode)
+                xobj.Width, xobj.Height = size
+                xobj.ColorSpace = colorspace
+                xobj.BitsPerComponent = 8
+            else:
+                _write_flate(xobj, resized, colorspace)
+            if "/DecodeParms" in xobj:
+                del xobj["/DecodeParms"]
+            done += 1
+    return done
+
+
+def _save(pdf, path):
+    """重新压缩所有流并生成对象流，写入临时文件后原子替换"""
+    pikepdf = _require_pikepdf()
+    tmp_path = path + ".part"
+    pdf.save(tmp_path, compress_streams=True, recompress_flate=True,
+             object_stream_mode=pikepdf.ObjectStreamMode.generate)
+    return tmp_path
+
+
+def optimize_pdf(path, dpi=None, jpeg_quality=80, dedup=True):
+    """后处理单个PDF，结果更小时替换原文件。返回 (路径, 原大小, 新大小)
+
+    在进程池的工作进程中执行，只接收可序列化的参数。
+    """
+    pikepdf = _require_pikepdf()
+    before = os.path.getsize(path)
+    with pikepdf.open(path) as pdf:
+        if dedup:
+            dedup_images(pdf)
+        if dpi:
+            downsample_images(pdf, dpi, jpeg_quality)
+        pdf.remove_unreferenced_resources()
+        tmp_path = _save(pdf, path)
+    after = os.path.getsize(tmp_path)
+    if after < before:
+        os.replace(tmp_path, path)
+        return path, before, after
+    os.remove(tmp_path)
+    return path, before, before
+
+
+def _tree_entries(directory):
+    """目录中按保存顺序排列的条目：目录自身的PDF、其他PDF和子目录"""
+    name = os.path.basename(directory)
+    own_pdf = os.path.join(directory, f"{name}.pdf")
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.startswith("."):
+            continue
+        if entry.is_dir():
+            entries.append(entry.path)
+        elif entry.name.endswith(".pdf") and entry.path != own_pdf \
+                and not entry.name.endswith(MERGED_SUFFIX):
+            entries.append(entry.path)
+
+    def saved_at(path):
+        # 子目录以其中同名PDF的保存时间排序，与爬取顺序一致
+        pdf = os.path.join(path, f"{os.path.basename(path)}.pdf") if os.path.isdir(path) else path
+        return os.path.getmtime(pdf if os.path.exists(pdf) else path)
+
+    return (own_pdf if os.path.exists(own_pdf) else None), sorted(entries, key=saved_at)
+
+
+def merge_tree(directory, output=None, dedup=True):
+    """将 pdfs/<标题>/ 目录树合并为一个PDF，书签层级与爬取深度一致。返回 (输出路径, 页数)"""
+    pikepdf = _require_pikepdf()
+    output = output or directory.rstrip(os.sep) + MERGED_SUFFIX
+    merged = pikepdf.new()
+    sources = []
+
+    def append(path):
+        source = pikepdf.open(path)
+        sources.append(source)
+        first_page = len(merged.pages)
+        merged.pages.extend(source.pages)
+        return first_page
+
+    def build(path):
+        """返回该目录或文件对应的书签，没有任何页面时返回None"""
+        if not os.path.isdir(path):
+            title = os.path.splitext(os.path.basename(path))[0]
+            return pikepdf.OutlineItem(title, append(path))
+        own_pdf, entries = _tree_entries(path)
+        item = pikepdf.OutlineItem(os.path.basename(path), append(own_pdf) if own_pdf else len(merged.pages))
+        for entry in entries:
+            child = build(entry)
+            if child is not None:
+                item.children.append(child)
+        if not own_pdf and not item.children:
+            return None
+        if not own_pdf:
+            item.destination = item.children[0].destination
+        return item
+
+    try:
+        root = build(directory)
+        if root is None:
+            return None, 0
+        with merged.open_outline() as outline:
+            outline.root.append(root)
+        if dedup:
+            # 同一公众号的文章共用大量头图、二维码，合集中只保留一份
+            dedup_images(merged)
+            merged.remove_unreferenced_resources()
+        os.replace(_save(merged, output), output)
+        return output, len(merged.pages)
+    finally:
+        for source in sources:
+            source.close()
+        merged.close()
+
+
+def merge_all(root="pdfs", dedup=True):
+    """将 root 下每个一级目录合并为 <目录名>_合集.pdf，返回 [(输出路径, 页数)]"""
+    results = []
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if entry.is_dir() and not entry.name.startswith("."):
+            output, pages = merge_tree(entry.path, dedup=dedup)
+            if output:
+                results.append((output, pages))
+    return results
+
+
+class PostProcessor:
+    """在进程池中异步后处理爬取得到的PDF，close 时等待全部完成；指定 merge_root 时随后合并目录"""
+
+    def __init__(self, workers=2, dpi=None, jpeg_quality=80, dedup=True, optimize=True,
+                 merge_root=None, log=None):
+        _require_pikepdf()
+        if dpi:
+            try:
+                import PIL  # noqa: F401
+            except ImportError:
+                raise RuntimeError("图片降采样需要 Pillow 包，请运行：pip install pillow")
+        self.options = dict(dpi=dpi, jpeg_quality=jpeg_quality, dedup=dedup)
+        self.log = log or (lambda message: None)
+        self.merge_root = merge_root
+        self.merged = []
+        # 爬虫主进程有多个线程，使用 spawn 而不是 fork 启动工作进程
+        self._executor = None
+        if optimize:
+            self._executor = ProcessPoolExecutor(max_workers=max(1, workers),
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        self._lock = threading.Lock()
+        self._futures = []
+        self.stats = {"files": 0, "before": 0, "after": 0, "errors": 0}
+
+    def submit(self, path):
+        """提交一个PDF，立即返回"""
+        if not self._executor:
+            return None
+        future = self._executor.submit(optimize_pdf, path, **self.options)
+        future.add_done_callback(self._done)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            try:
+                _, before, after = future.result()
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.log(f"PDF后处理失败: {e}")
+                return
+            self.stats["files"] += 1
+            self.stats["before"] += before
+            self.stats["after"] += after
+
+    def close(self):
+        """等待已提交的任务完成并关闭进程池，然后合并 merge_root 下的目录"""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.merge_root and os.path.isdir(self.merge_root):
+            self.merged = merge_all(self.merge_root, dedup=self.options["dedup"])
+            self.merge_root = None
+        return self.stats
+
+    def format_summary(self):
+        stats = self.stats
+        saved = stats["before"] - stats["after"]
+        ratio = saved / stats["before"] * 100 if stats["before"] else 0
+        lines = []
+        if stats["files"] or stats["errors"]:
+            lines.append(f"处理文件: {stats['files']} 个，失败: {stats['errors']} 个")
+            lines.append(f"原大小: {stats['before'] / 1048576:.1f} MB，处理后: {stats['after'] / 1048576:.1f} MB，"
+                         f"节省 {ratio:.1f}%")
+        for output, pages in self.merged:
+            lines.append(f"已合并: {output} ({pages} 页)")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PDF后处理：压缩、降采样、去重和合并')
+    parser.add_argument('root', nargs='?', default='pdfs', help='PDF目录 (默认: pdfs)')
+    parser.add_argument('--dpi', type=int, metavar='num', help='图片降采样的目标DPI，不指定时不降采样')
+    parser.add_argument('-q', '--jpeg-quality', type=int, default=80, metavar='num',
+                        help='重新编码JPEG的质量 (默认: 80)')
+    parser.add_argument('--no-dedup', action='store_true', help='不合并重复图片')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 2, metavar='num',
+                        help='工作进程数 (默认: CPU核数)')
+    parser.add_argument('--merge', action='store_true', help='每个一级目录合并为一个带书签的合集')
+    parser.add_argument('--skip-optimize', action='store_true', help='只合并，不处理单个PDF')
+    args = parser.parse_args()
+
+    processor = PostProcessor(workers=args.workers, dpi=args.dpi, jpeg_quality=args.jpeg_quality,
+                              dedup=not args.no_dedup, optimize=not args.skip_optimize,
+                              merge_root=args.root if args.merge else None, log=print)
+    for directory, dirs, files in os.walk(args.root):
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        for name in files:
+            if name.endswith(".pdf") and not name.endswith(MERGED_SUFFIX):
+                processor.submit(os.path.join(directory, name))
+    processor.close()
+    print(processor.format_summary())
+
+
+if __name__ == "__main__":
+    main()
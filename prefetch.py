@@ -0,0 +1,233 @@
+"""HTTP预取：不打开浏览器，先用requests判断文章状态、解析迁移链接并提取页面链接"""
+import hashlib
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+from resilience import is_throttled
+
+# 文章失效时页面中出现的提示文本
+ERROR_PATTERNS = [
+    "该内容已被发布者删除",
+    "此内容因违规无法查看",
+    "该公众号已被屏蔽",
+    "该内容已被投诉",
+    "抱歉，此内容已被删除",
+]
+
+# 需要登录或验证才能查看时页面中出现的提示文本
+LOGIN_PATTERNS = [
+    "请在微信客户端打开链接",
+    "环境异常",
+    "完成验证后即可继续访问",
+    "请登录后查看",
+    "登录后查看",
+]
+
+MIGRATION_TEXT = "该公众号已迁移"
+MIGRATION_BUTTON_TEXT = "访问文章"
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+class _ArticleParser(HTMLParser):
+    """从HTML中收集可见文本、链接及文章特征元素"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.texts = []
+        self.links = []          # [(href, 链接文本)]
+        self.has_title = False   # 是否存在 rich_media_title
+        self.has_content = False  # 是否存在 #js_content
+        self.content = []        # #js_content 内的文本
+        self._skip_depth = 0     # script/style 内的文本不计入
+        self._anchor = None
+        self._content_tag = None  # #js_content 的标签名及其同名标签的嵌套层数
+        self._content_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in ("script", "style"):
+            self._skip_depth += 1
+            return
+        classes = (attrs.get("class") or "").split()
+        if "rich_media_title" in classes:
+            self.has_title = True
+        if attrs.get("id") == "js_content":
+            self.has_content = True
+            self._content_tag, self._content_depth = tag, 1
+        elif tag == self._content_tag:
+            self._content_depth += 1
+        if tag == "a":
+            self._anchor = [attrs.get("href") or "", []]
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if tag == self._content_tag:
+            self._content_depth -= 1
+            if not self._content_depth:
+                self._content_tag = None
+        if tag == "a" and self._anchor is not None:
+            href, text = self._anchor
+            self.links.append((href, "".join(text).strip()))
+            self._anchor = None
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        self.texts.append(data)
+        if self._content_tag:
+            self.content.append(data)
+        if self._anchor is not None:
+            self._anchor[1].append(data)
+
+    @property
+    def text(self):
+        return "".join(self.texts)
+
+
+def content_digest(text):
+    """正文文本的哈希，忽略空白差异；没有正文时返回None"""
+    normalized = "".join(text.split())
+    if not normalized:
+        return None
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+VALIDATOR_KEYS = ("etag", "last_modified", "body_hash")
+
+
+class PrefetchResult:
+    """一次预取的结果
+
+    status 取值：
+        ok      - 页面正常，需要交给浏览器渲染
+        invalid - 文章已删除/屏蔽/迁移失败，无需打开浏览器
+        throttled - 站点限流（HTTP 429/503 或限流提示页），应稍后重试
+        unchanged - 条件请求确认文章与上次保存时相同（仅在传入 validators 时出现）
+        error   - 预取失败（网络错误等），应退回浏览器处理
+
+    etag / last_modified / body_hash 是下次条件请求使用的校验信息。
+    """
+
+    def __init__(self, url, status, reason=None, migrated_from=None,
+                 is_article=False, links=None, html=None, etag=None, last_modified=None, body_hash=None):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.migrated_from = migrated_from
+        self.is_article = is_article
+        self.links = links or []
+        self.html = html
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash  # #js_content 文本的哈希，服务器不返回 ETag 时据此判断是否变化
+
+    @property
+    def migrated(self):
+        return self.migrated_from is not None
+
+    @property
+    def validators(self):
+        return {key: getattr(self, key) for key in VALIDATOR_KEYS}
+
+
+class Prefetcher:
+    """基于requests的轻量预取器"""
+
+    def __init__(self, timeout=10, max_migrations=3, user_agent=DEFAULT_USER_AGENT):
+        self.timeout = timeout
+        self.max_migrations = max_migrations
+        import requests  # 只在启用预取时导入，不拖慢启动
+
+        self.request_error = requests.RequestException
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+
+    def fetch(self, url, validators=None):
+        """预取URL，识别失效与迁移文章，迁移时自动跟随到新链接
+
+        传入上次保存的 validators 时发送条件请求（If-None-Match / If-Modified-Since），
+        服务器返回304或正文哈希相同时结果为 unchanged。
+        """
+        original = url
+        headers = {}
+        if validators and validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators and validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        for _ in range(self.max_migrations + 1):
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except self.request_error as e:
+                return PrefetchResult(url, "error", reason=str(e))
+            headers = {}  # 迁移后的新链接不带条件
+            if response.status_code == 304:
+                return PrefetchResult(url, "unchanged", **validators)
+            if response.status_code in (429, 503):
+                return PrefetchResult(url, "throttled", reason=f"HTTP {response.status_code}")
+            if response.status_code != 200:
+                return PrefetchResult(url, "error", reason=f"HTTP {response.status_code}")
+            if response.encoding is None or response.encoding.lower() == "iso-8859-1":
+                response.encoding = response.apparent_encoding
+
+            parser = _ArticleParser()
+            try:
+                parser.feed(response.text)
+                parser.close()
+            except Exception as e:
+                return PrefetchResult(url, "error", reason=f"HTML解析失败: {e}")
+
+            text = parser.text
+            if is_throttled(text):
+                return PrefetchResult(url, "throttled", reason="访问过于频繁")
+            for pattern in ERROR_PATTERNS:
+                if pattern in text:
+                    return PrefetchResult(url, "invalid", reason=pattern)
+
+            if MIGRATION_TEXT in text:
+                new_url = self._find_migration_target(response.url, parser.links)
+                if not new_url:
+                    return PrefetchResult(url, "invalid", reason="文章已迁移，但未找到新链接")
+                url = new_url
+                continue
+
+            result = PrefetchResult(
+                response.url, "ok",
+                migrated_from=original if url != original else None,
+                is_article=parser.has_title or parser.has_content,
+                links=self._absolute_links(response.url, parser.links),
+                html=response.text,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                body_hash=content_digest("".join(parser.content)),
+            )
+            if (validators and not result.migrated and result.body_hash
+                    and result.body_hash == validators.get("body_hash")):
+                result.status = "unchanged"
+            return result
+
+        return PrefetchResult(url, "invalid", reason="迁移跳转次数过多")
+
+    @staticmethod
+    def _find_migration_target(base_url, links):
+        for href, text in links:
+            if MIGRATION_BUTTON_TEXT in text and href and not href.startswith("javascript:"):
+                return urljoin(base_url, href)
+        return None
+
+    @staticmethod
+    def _absolute_links(base_url, links):
+        result = []
+        for href, _ in links:
+            href = href.strip()
+            if not href or href.startswith(("javascript:", "void(0)", "#", "mailto:")):
+                continue
+            absolute = urljoin(base_url, href)
+            if urlparse(absolute).scheme in ("http", "https"):
+                result.append(absolute)
+        return result
@@ -0,0 +1,71 @@
+"""渲染配置：只为打印正文加载页面时，拦截统计、广告、评论、视频和字体等非必要资源
+
+full  保持Chrome默认行为，不拦截任何请求
+light 拦截 BLOCKED_URL_PATTERNS 中的请求，CDP引擎另按资源类型拦截，并关闭不需要的浏览器功能
+"""
+
+PROFILES = ("full", "light")
+
+# Network.setBlockedURLs 的通配符模式，匹配完整URL
+BLOCKED_URL_PATTERNS = [
+    # 微信文章页中与正文打印无关的接口：阅读数/点赞、评论、广告、上报
+    "*/mp/getappmsgext*",
+    "*/mp/appmsg_comment*",
+    "*/mp/getcommentreply*",
+    "*/mp/appmsgreport*",
+    "*/mp/webcommreport*",
+    "*/mp/jsmonitor*",
+    "*/mp/ad_*",
+    "*/mp/advertisement_report*",
+    "*/mp/videoplayer*",
+    "*/mp/readtemplate?t=pages/video_player*",
+    # 视频与音频
+    "*.mp4*", "*.m3u8*", "*.ts?*", "*.mp3*", "*.m4a*",
+    "*v.qq.com/*", "*vpic.video.qq.com/*", "*mpvideo.qpic.cn/*",
+    # 网页字体：正文使用系统字体即可
+    "*.woff", "*.woff?*", "*.woff2", "*.woff2?*", "*.ttf", "*.ttf?*", "*.otf", "*.otf?*",
+    # 第三方统计与广告
+    "*google-analytics.com/*", "*googletagmanager.com/*", "*doubleclick.net/*",
+    "*googlesyndication.com/*", "*hm.baidu.com/*", "*cnzz.com/*", "*51.la/*",
+    "*gdt.qq.com/*", "*pingjs.qq.com/*", "*beacon.qq.com/*", "*report.url.cn/*",
+]
+
+# CDP引擎通过 Fetch 域按资源类型拦截的请求
+BLOCKED_RESOURCE_TYPES = ("Media", "Font", "Ping", "CSPViolationReport", "Manifest", "TextTrack")
+
+# 打印不需要的浏览器功能
+CHROME_ARGS = [
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-client-side-phishing-detection",
+    "--disable-domain-reliability",
+    "--disable-breakpad",
+    "--disable-notifications",
+    "--metrics-recording-only",
+    "--no-pings",
+    "--mute-audio",
+    "--autoplay-policy=user-gesture-required",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,InterestFeedContentSuggestions",
+]
+
+
+def chrome_args(profile):
+    """该配置需要的Chrome启动参数"""
+    return list(CHROME_ARGS) if profile == "light" else []
+
+
+def blocked_url_patterns(profile, extra=()):
+    """该配置拦截的URL模式，extra 为命令行追加的模式"""
+    patterns = list(BLOCKED_URL_PATTERNS) if profile == "light" else []
+    return patterns + [pattern for pattern in extra if pattern not in patterns]
+
+
+def fetch_patterns(profile):
+    """Fetch.enable 的请求模式：只暂停需要按类型拦截的请求，其余请求不经过客户端"""
+    if profile != "light":
+        return []
+    return [{"urlPattern": "*", "resourceType": kind, "requestStage": "Request"}
+            for kind in BLOCKED_RESOURCE_TYPES]
@@ -0,0 +1,226 @@
+"""容错策略：错误分类、指数退避重试，以及按主机的限速和熔断
+
+临时性错误（超时、网络错误、站点限流、浏览器崩溃）按指数退避加随机抖动重试，
+浏览器崩溃时先重启浏览器。每个主机有独立的请求间隔和熔断器：
+站点限流时自动拉长请求间隔，连续失败达到阈值后暂停访问该主机一段时间，
+冷却结束后只放行一个试探请求，成功才恢复正常，从而在限流期间放慢速度而不是把URL列表全部耗成失败。
+"""
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+# 错误类别
+THROTTLED = "throttled"  # 站点限流
+CRASH = "crash"          # 浏览器或标签页崩溃、会话丢失
+TIMEOUT = "timeout"      # 页面加载或脚本超时
+NETWORK = "network"      # 连接失败等网络错误
+
+KIND_LABELS = {
+    THROTTLED: "站点限流",
+    CRASH: "浏览器崩溃",
+    TIMEOUT: "加载超时",
+    NETWORK: "网络错误",
+}
+
+# 计入主机熔断的错误类别；浏览器崩溃与主机无关
+HOST_ERRORS = (THROTTLED, TIMEOUT, NETWORK)
+
+# 站点限流时页面中出现的提示文本
+THROTTLE_PATTERNS = [
+    "访问过于频繁",
+    "操作过于频繁",
+    "请求过于频繁",
+    "操作频繁，请稍后再试",
+]
+
+CRASH_MARKERS = (
+    "tab crashed",
+    "session deleted",
+    "invalid session id",
+    "chrome not reachable",
+    "disconnected: not connected to devtools",
+    "target window already closed",
+    "no such window",
+    "target closed",
+)
+# 连接被拒绝通常是目标站点的网络错误，只有发往 chromedriver 的 WebDriver 请求
+# （url: /session/...）被拒绝时才说明 chromedriver 进程已退出
+REFUSED_MARKERS = ("connection refused", "econnrefused")
+DRIVER_REQUEST_MARKER = "url: /session"
+TIMEOUT_MARKERS = ("timed out", "timeout", "net::err_timed_out")
+NETWORK_MARKERS = ("net::err_", "connection reset", "connection aborted", "connection refused", "econnrefused",
+                   "remote end closed")
+
+
+class Throttled(Exception):
+    """页面或预取结果表明站点正在限流"""
+
+
+def classify_error(error):
+    """返回错误类别，不可重试的错误返回None"""
+    if isinstance(error, Throttled):
+        return THROTTLED
+    name = type(error).__name__
+    message = str(error).lower()
+    if any(marker in message for marker in CRASH_MARKERS) or name in ("InvalidSessionIdException",
+                                                                     "NoSuchWindowException"):
+        return CRASH
+    if DRIVER_REQUEST_MARKER in message and any(marker in message for marker in REFUSED_MARKERS):
+        return CRASH
+    if name in ("TimeoutException", "TimeoutError", "ReadTimeoutError") or \
+            any(marker in message for marker in TIMEOUT_MARKERS):
+        return TIMEOUT
+    if name in ("ConnectionError", "ConnectionResetError", "ConnectionRefusedError", "MaxRetryError",
+                "ProtocolError") or \
+            any(marker in message for marker in NETWORK_MARKERS):
+        return NETWORK
+    return None
+
+
+def is_throttled(text):
+    """页面状态文本是否为限流提示"""
+    return bool(text) and any(pattern in text for pattern in THROTTLE_PATTERNS)
+
+
+def sleep(seconds, stop=None):
+    """分段睡眠，stop() 返回True时提前结束"""
+    deadline = time.monotonic() + seconds
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or (stop and stop()):
+            return
+        time.sleep(min(remaining, 0.5))
+
+
+class RetryPolicy:
+    """临时性错误的重试次数和退避时间"""
+
+    def __init__(self, retries=2, base_delay=2.0, max_delay=60.0):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, kind, attempt):
+        return kind is not None and attempt < self.retries
+
+    def delay(self, attempt):
+        """第 attempt 次重试前的等待秒数：指数增长，在后一半区间内随机抖动，避免多个浏览器同时重试"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(ceiling / 2, ceiling)
+
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class _Host:
+    def __init__(self, interval, cooldown):
+        self.interval = interval    # 当前请求间隔，限流时加倍，成功后逐步回落
+        self.next_slot = 0.0        # 下一个请求最早的开始时间
+        self.state = CLOSED
+        self.failures = 0           # 连续失败次数
+        self.open_until = 0.0
+        self.cooldown = cooldown    # 下次熔断的冷却时间，试探失败时加倍
+        self.trial = False          # 半开状态下试探请求是否在进行中
+        self.requests = 0
+        self.throttled = 0
+        self.trips = 0              # 熔断次数
+
+
+class HostGuard:
+    """按主机限速和熔断，多个工作线程共享同一实例"""
+
+    def __init__(self, min_interval=0.0, max_interval=60.0, failure_threshold=5,
+                 cooldown=30.0, max_cooldown=600.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.failure_threshold = failure_threshold  # 0 表示不熔断
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url):
+        return urlparse(url).netloc.lower()
+
+    def _host(self, url):
+        host = self.host_of(url)
+        if host not in self._hosts:
+            self._hosts[host] = _Host(self.min_interval, self.base_cooldown)
+        return self._hosts[host]
+
+    def reserve(self, url):
+        """尝试占用该主机的下一个请求时段：可以立即请求时返回0，否则返回需要等待的秒数"""
+        with self._lock:
+            h = self._host(url)
+            now = time.monotonic()
+            if h.state == OPEN:
+                if now < h.open_until:
+                    return h.open_until - now
+                h.state = HALF_OPEN
+            if h.state == HALF_OPEN and h.trial:
+                return 0.5
+            if now < h.next_slot:
+                return h.next_slot - now
+            h.next_slot = now + h.interval
+            h.requests += 1
+            if h.state == HALF_OPEN:
+                h.trial = True
+            return 0
+
+    def acquire(self, url, stop=None):
+        """阻塞到可以请求该主机为止，返回等待的秒数"""
+        start = time.monotonic()
+        while not (stop and stop()):
+            wait = self.reserve(url)
+            if not wait:
+                break
+            sleep(min(wait, 1.0), stop)
+        return time.monotonic() - start
+
+    def success(self, url):
+        with self._lock:
+            h = self._host(url)
+            self._close(h)
+            h.interval = max(self.min_interval, h.interval * 0.8)
+
+    def failure(self, url, kind):
+        """记录一次失败；与主机无关的错误只结束试探，不计入熔断"""
+        with self._lock:
+            h = self._host(url)
+            if kind not in HOST_ERRORS:
+                if h.state == HALF_OPEN:
+                    self._close(h)
+                return
+            if kind == THROTTLED:
+                h.throttled += 1
+                h.interval = min(self.max_interval, max(h.interval * 2, 1.0))
+                h.next_slot = max(h.next_slot, time.monotonic() + h.interval)
+            h.failures += 1
+            if h.state == HALF_OPEN:
+                # 试探失败，冷却时间加倍后再次熔断
+                h.cooldown = min(h.cooldown * 2, self.max_cooldown)
+                self._open(h)
+            elif self.failure_threshold and h.failures >= self.failure_threshold:
+                self._open(h)
+
+    def _open(self, h):
+        h.state = OPEN
+        h.open_until = time.monotonic() + h.cooldown
+        h.trial = False
+        h.trips += 1
+
+    def _close(self, h):
+        if h.state == HALF_OPEN:
+            h.cooldown = self.base_cooldown
+        h.state = CLOSED
+        h.failures = 0
+        h.trial = False
+
+    def summary(self):
+        """各主机的请求数、限流次数、熔断次数和当前请求间隔"""
+        with self._lock:
+            return {host: {"requests": h.requests, "throttled": h.throttled, "trips": h.trips,
+                           "interval": round(h.interval, 2), "state": h.state}
+                    for host, h in self._hosts.items()}
@@ -0,0 +1,125 @@
+"""启动加速：缓存浏览器驱动路径，并统计启动各阶段的耗时
+
+webdriver.Chrome() 每次都会运行 Selenium Manager 解析 chromedriver 和 Chrome 的路径。
+DriverPaths 把解析结果连同两个文件的大小和修改时间保存下来，之后的运行直接使用；
+任一文件发生变化（例如Chrome自动更新）或用缓存路径启动失败时重新解析。
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PATH_KEYS = ("driver_path", "browser_path")
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+class DriverPaths:
+    """chromedriver 和 Chrome 路径的持久缓存，同一进程的多个浏览器共享"""
+
+    def __init__(self, path):
+        self.path = path
+        self.resolved = False  # 本次运行是否调用过 Selenium Manager
+        self._paths = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """读取缓存，文件缺失、路径不存在或文件已变化时返回None"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            for key in PATH_KEYS:
+                if not os.path.isfile(data[key]) or _stamp(data[key]) != data[f"{key}_stamp"]:
+                    return None
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return {key: data[key] for key in PATH_KEYS}
+
+    def get(self, options):
+        """返回 {'driver_path', 'browser_path'}，缓存无效时调用 Selenium Manager 解析并写回"""
+        with self._lock:
+            if self._paths is None:
+                with profile.span("解析驱动路径（缓存）"):
+                    self._paths = self.load()
+            if self._paths is None:
+                with profile.span("解析驱动路径（Selenium Manager）"):
+                    self._paths = self._resolve(options)
+            return self._paths
+
+    def _resolve(self, options):
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.common.driver_finder import DriverFinder
+
+        finder = DriverFinder(Service(), options)
+        paths = {"driver_path": finder.get_driver_path(), "browser_path": finder.get_browser_path()}
+        self.resolved = True
+        data = dict(paths)
+        for key in PATH_KEYS:
+            data[f"{key}_stamp"] = _stamp(paths[key])
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".part"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # 缓存写不进去时下次运行重新解析
+        return paths
+
+    def invalidate(self):
+        """丢弃缓存的路径，下次取用时重新解析"""
+        with self._lock:
+            self._paths = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class StartupProfile:
+    """记录从进程启动到第一个浏览器可用之间各阶段的耗时，之后的记录被忽略"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks = []  # (阶段, 结束时相对启动的秒数, 耗时)
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def mark(self, stage, duration=None):
+        with self._lock:
+            if not self.finished:
+                self.marks.append((stage, time.perf_counter() - self.started, duration))
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(stage, time.perf_counter() - start)
+
+    def finish(self, stage):
+        """记录最后一个阶段并停止记录"""
+        self.mark(stage)
+        with self._lock:
+            self.finished = True
+
+    def format(self):
+        lines = ["启动耗时", "", f"{'阶段':<30}{'耗时':>6}{'累计':>8}"]
+        with self._lock:
+            marks = sorted(self.marks, key=lambda mark: mark[1])
+        for stage, at, duration in marks:
+            spent = f"{duration:.3f}s" if duration is not None else "-"
+            # 中文字符按两个字符宽度对齐
+            width = 32 - sum(1 for char in stage if ord(char) > 127)
+            lines.append(f"{stage:<{width}}{spent:>8}{at:>9.3f}s")
+        return "\n".join(lines)
+
+
+profile = StartupProfile()  # 进程内共享，--profile-startup 时输出
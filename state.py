@@ -0,0 +1,133 @@
+"""持久化爬取状态：基于SQLite记录每个URL的处理进度，支持中断后续爬"""
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"    # 已发现，尚未处理
+RUNNING = "running"    # 处理中（中断时停留在此状态，续爬时重新处理）
+DONE = "done"          # 已保存
+SKIPPED = "skipped"    # 文章失效等原因跳过
+FAILED = "failed"      # 处理出错
+LOGIN = "login"        # 需要登录，续爬时重新处理
+DROPPED = "dropped"    # 超出页数上限或每层预算、或是已入队页面的另一种链接形式，未入队
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    parent_dir TEXT NOT NULL,
+    output_path TEXT,
+    content_hash TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_urls_status ON urls(status);
+"""
+
+
+class CrawlState:
+    """SQLite状态库，多个工作线程可共享同一实例"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def reset(self):
+        """清空状态，开始一次全新的爬取"""
+        self._execute("DELETE FROM urls")
+
+    def add_pending(self, url, depth, parent_dir):
+        """记录新发现的URL，已存在的记录保持不变"""
+        now = time.time()
+        self._execute(
+            "INSERT OR IGNORE INTO urls (url, status, depth, parent_dir, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, PENDING, depth, parent_dir, now, now),
+        )
+
+    def mark_running(self, url, depth, parent_dir):
+        """标记URL开始处理"""
+        now = time.time()
+        self._execute(
+            "INSERT INTO urls (url, status, depth, parent_dir, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET status = excluded.status, depth = excluded.depth, "
+            "parent_dir = excluded.parent_dir, error = NULL, updated_at = excluded.updated_at",
+            (url, RUNNING, depth, parent_dir, now, now),
+        )
+
+    def mark_done(self, url, output_path=None, content_hash=None):
+        """标记URL已保存"""
+        self._execute(
+            "UPDATE urls SET status = ?, output_path = ?, content_hash = ?, updated_at = ? WHERE url = ?",
+            (DONE, output_path, content_hash, time.time(), url),
+        )
+
+    def mark_skipped(self, url, reason=None):
+        """标记URL因文章失效等原因被跳过"""
+        self._execute(
+            "UPDATE urls SET status = ?, error = ?, updated_at = ? WHERE url = ?",
+            (SKIPPED, reason, time.time(), url),
+        )
+
+    def mark_dropped(self, url, reason=None):
+        """标记未被 frontier 接受的链接；只改写尚未处理的记录，续爬时不再重放"""
+        self._execute(
+            "UPDATE urls SET status = ?, error = ?, updated_at = ? WHERE url = ? AND status = ?",
+            (DROPPED, reason, time.time(), url, PENDING),
+        )
+
+    def mark_failed(self, url, error=None):
+        """标记URL处理失败"""
+        self._execute(
+            "UPDATE urls SET status = ?, error = ?, updated_at = ? WHERE url = ?",
+            (FAILED, error, time.time(), url),
+        )
+
+    def mark_login(self, url):
+        """标记URL需要登录才能查看"""
+        self._execute(
+            "UPDATE urls SET status = ?, error = ?, updated_at = ? WHERE url = ?",
+            (LOGIN, "需要登录", time.time(), url),
+        )
+
+    def get(self, url):
+        """返回URL的状态记录，不存在时返回None"""
+        row = self._execute("SELECT * FROM urls WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def finished_urls(self):
+        """已完成（保存或跳过）的URL及其深度 {url: 深度}，续爬时不再处理，并计入页数预算"""
+        rows = self._execute("SELECT url, depth FROM urls WHERE status IN (?, ?)", (DONE, SKIPPED)).fetchall()
+        return {row["url"]: row["depth"] for row in rows}
+
+    def pending_jobs(self):
+        """待处理的任务 (url, 深度, 父目录)，包括中断时正在处理、失败和需要登录的URL"""
+        rows = self._execute(
+            "SELECT url, depth, parent_dir FROM urls WHERE status IN (?, ?, ?, ?) ORDER BY depth, created_at",
+            (PENDING, RUNNING, FAILED, LOGIN),
+        ).fetchall()
+        return [(row["url"], row["depth"], row["parent_dir"]) for row in rows]
+
+    def counts(self):
+        """各状态的URL数量"""
+        rows = self._execute("SELECT status, COUNT(*) AS n FROM urls GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,107 @@
+"""distributed.py：SQLite任务队列的租约、续约和结果写回"""
+import time
+
+import pytest
+
+from distributed import DONE, FAILED, LEASED, LOGIN, PENDING, Coordinator, SqliteQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = SqliteQueue(str(tmp_path / "queue.db"), max_attempts=3)
+    yield queue
+    queue.close()
+
+
+def expire(queue, job):
+    """让任务的租约立即过期"""
+    queue._conn.execute("UPDATE jobs SET lease_until = ? WHERE key = ?", (time.time() - 1, job.key))
+
+
+def test_push_dedups_canonical_url(queue):
+    assert queue.push("https://example.com/a?utm_source=x", 0, ".")
+    assert not queue.push("https://example.com/a", 0, ".")
+    assert queue.stats()[PENDING] == 1
+
+
+def test_claim_shallow_first_and_exclusive(queue):
+    queue.push("https://example.com/deep", 2, ".")
+    queue.push("https://example.com/root", 0, ".")
+    job = queue.claim("w1", 60)
+    assert (job.url, job.depth, job.attempts) == ("https://example.com/root", 0, 1)
+    assert queue.claim("w2", 60).url == "https://example.com/deep"
+    assert queue.claim("w3", 60) is None
+
+
+def test_renew_only_by_owner(queue):
+    queue.push("https://example.com/a", 0, ".")
+    job = queue.claim("w1", 60)
+    assert queue.renew(job, "w1", 60)
+    assert not queue.renew(job, "w2", 60)
+
+
+def test_expired_lease_is_reclaimed(queue):
+    queue.push("https://example.com/a", 0, ".")
+    job = queue.claim("w1", 60)
+    expire(queue, job)
+    again = queue.claim("w2", 60)
+    assert again.key == job.key and again.attempts == 2
+    assert not queue.renew(job, "w1", 60)
+
+
+def test_repeatedly_expired_job_fails(queue):
+    queue.push("https://example.com/a", 0, ".")
+    for worker in ("w1", "w2", "w3"):
+        expire(queue, queue.claim(worker, 60))
+    assert queue.claim("w4", 60) is None
+    assert queue.stats()[FAILED] == 1
+
+
+def test_complete_adds_links(queue):
+    queue.push("https://example.com/a", 0, ".")
+    job = queue.claim("w1", 60)
+    assert queue.complete(job, "w1", DONE, links=[("https://example.com/b", 1, "a")], output_path="a/A.pdf")
+    assert queue.stats() == {DONE: 1, PENDING: 1}
+    assert queue.finished() is False
+
+
+def test_late_complete_from_expired_lease_is_rejected(queue):
+    queue.push("https://example.com/a", 0, ".")
+    stale = queue.claim("w1", 60)
+    expire(queue, stale)
+    current = queue.claim("w2", 60)
+    assert not queue.complete(stale, "w1", DONE, links=[("https://example.com/b", 1, ".")])
+    assert queue.stats() == {LEASED: 1}  # 迟到结果中的链接也被丢弃
+    assert queue.renew(current, "w2", 60)
+    assert queue.complete(current, "w2", DONE)
+
+
+def test_complete_does_not_overwrite_result(queue):
+    queue.push("https://example.com/a", 0, ".")
+    job = queue.claim("w1", 60)
+    assert queue.complete(job, "w1", DONE)
+    assert not queue.complete(job, "w1", FAILED, error="late")
+    assert queue.stats() == {DONE: 1}
+
+
+def test_requeue_expired(queue):
+    queue.push("https://example.com/a", 0, ".")
+    job = queue.claim("w1", 60)
+    expire(queue, job)
+    assert queue.requeue_expired() == 1
+    assert not queue.complete(job, "w1", DONE)
+    assert queue.stats() == {PENDING: 1}
+
+
+def test_login_jobs_reported_and_retried(queue, tmp_path):
+    queue.push("https://example.com/a", 1, "sub")
+    job = queue.claim("w1", 60)
+    assert queue.complete(job, "w1", LOGIN, error="需要登录")
+    assert queue.finished()
+
+    report = tmp_path / "login_required.txt"
+    assert Coordinator(queue).write_login_report(str(report), "/out") == 1
+    assert report.read_text(encoding="utf-8") == "https://example.com/a\t1\t/out/sub\n"
+
+    assert queue.retry(LOGIN) == 1
+    assert queue.claim("w2", 60).attempts == 1
@@ -0,0 +1,121 @@
+"""frontier.py：URL规范化、调度顺序和页数预算"""
+import pytest
+
+from frontier import Frontier, canonicalize_url, parse_depth_budgets
+
+ARTICLE = "https://mp.weixin.qq.com/s?__biz=MzA&mid=100&idx=1&sn=abc"
+
+
+def drain(frontier):
+    jobs = []
+    while True:
+        job = frontier.pop()
+        if job is None:
+            return jobs
+        jobs.append(job[0])
+
+
+def test_canonicalize_keeps_page_params_on_other_hosts():
+    assert canonicalize_url("https://example.com/search?key=python") == "https://example.com/search?key=python"
+    assert canonicalize_url("https://example.com/page?id=1&version=2&from=home&lang=en") == \
+        "https://example.com/page?from=home&id=1&lang=en&version=2"
+
+
+def test_canonicalize_strips_utm_and_fragment_everywhere():
+    assert canonicalize_url("https://example.com/a?utm_source=x&utm_id=3&b=2#top") == "https://example.com/a?b=2"
+
+
+def test_canonicalize_wechat_article():
+    shared = ARTICLE + "&chksm=ff&scene=21&key=k&pass_ticket=t#rd"
+    assert canonicalize_url(shared) == ARTICLE
+
+
+def test_canonicalize_wechat_article_is_stable():
+    assert canonicalize_url(ARTICLE) == ARTICLE
+    assert canonicalize_url("https://mp.weixin.qq.com/s/AbC123?scene=1#x") == "https://mp.weixin.qq.com/s/AbC123"
+
+
+def test_canonicalize_strips_share_params_on_wechat_pages():
+    url = "https://mp.weixin.qq.com/mp/appmsgalbum?__biz=MzA&album_id=7&scene=1&from=timeline&lang=zh_CN"
+    assert canonicalize_url(url) == "https://mp.weixin.qq.com/mp/appmsgalbum?__biz=MzA&album_id=7"
+
+
+def test_bfs_order():
+    frontier = Frontier(order="bfs")
+    frontier.push("https://a/2", 2, ".")
+    frontier.push("https://a/0", 0, ".")
+    frontier.push("https://a/1", 1, ".")
+    frontier.push("https://a/0b", 0, ".")
+    assert drain(frontier) == ["https://a/0", "https://a/0b", "https://a/1", "https://a/2"]
+
+
+def test_dfs_order():
+    frontier = Frontier(order="dfs")
+    for url in ("https://a/1", "https://a/2", "https://a/3"):
+        frontier.push(url, 1, ".")
+    assert drain(frontier) == ["https://a/3", "https://a/2", "https://a/1"]
+
+
+def test_priority_prefers_articles_within_a_depth():
+    frontier = Frontier(order="priority")
+    frontier.push("https://mp.weixin.qq.com/mp/profile?__biz=MzA", 1, ".")
+    frontier.push(ARTICLE, 1, ".")
+    frontier.push("https://a/0", 0, ".")
+    assert drain(frontier) == ["https://a/0", ARTICLE, "https://mp.weixin.qq.com/mp/profile?__biz=MzA"]
+
+
+def test_unknown_order():
+    with pytest.raises(ValueError):
+        Frontier(order="random")
+
+
+def test_dedup_by_canonical_url():
+    dropped = []
+    frontier = Frontier(on_drop=lambda url, reason: dropped.append(url))
+    assert frontier.push(ARTICLE, 1, ".")
+    assert not frontier.push(ARTICLE, 1, ".")
+    assert not frontier.push(ARTICLE + "&scene=21", 1, ".")
+    # 同一个链接不报告，另一种形式的链接报告为未入队
+    assert dropped == [ARTICLE + "&scene=21"]
+    assert len(frontier) == 1
+    assert frontier.dropped == 0
+
+
+def test_max_pages():
+    dropped = []
+    frontier = Frontier(max_pages=2, on_drop=lambda url, reason: dropped.append((url, reason)))
+    assert [frontier.push(f"https://a/{i}", 1, ".") for i in range(4)] == [True, True, False, False]
+    assert frontier.dropped == 2
+    assert [url for url, _ in dropped] == ["https://a/2", "https://a/3"]
+
+
+def test_depth_budgets():
+    frontier = Frontier(depth_budgets=parse_depth_budgets("1:1,2:2"))
+    assert frontier.push("https://a/0", 0, ".")
+    assert frontier.push("https://a/1", 1, ".")
+    assert not frontier.push("https://a/1b", 1, ".")
+    assert frontier.push("https://a/2", 2, ".")
+    assert frontier.push("https://a/2b", 2, ".")
+    assert not frontier.push("https://a/2c", 2, ".")
+
+
+def test_parse_depth_budgets():
+    assert parse_depth_budgets("1:50,2:200") == {1: 50, 2: 200}
+    assert parse_depth_budgets(None) == {}
+
+
+def test_mark_seen_counts_toward_budgets():
+    frontier = Frontier(max_pages=3, depth_budgets={1: 1})
+    frontier.mark_seen({"https://a/0": 0, "https://a/1": 1})
+    assert not frontier.push("https://a/0", 0, ".")
+    assert not frontier.push("https://a/1b", 1, ".")  # 第1层预算已被上次运行用完
+    assert frontier.push("https://a/2", 2, ".")
+    assert not frontier.push("https://a/2b", 2, ".")  # 总页数已达上限
+
+
+def test_retry_bypasses_dedup():
+    frontier = Frontier()
+    frontier.push("https://a/1", 1, ".")
+    drain(frontier)
+    frontier.retry("https://a/1", 1, ".")
+    assert drain(frontier) == ["https://a/1"]
@@ -0,0 +1,110 @@
+"""增量模式：已更新的文章和索引页覆盖旧文件，PDF缓存按文件类型查找"""
+import base64
+import os
+
+import pytest
+
+from cache import PdfCache
+from main import WebCrawler
+from pipeline import write_pdf
+
+ARTICLE = "https://mp.weixin.qq.com/s?__biz=MzA&mid=100&idx=1&sn=abc"
+OTHER = "https://mp.weixin.qq.com/s?__biz=MzA&mid=200&idx=1&sn=def"
+INDEX = "https://mp.weixin.qq.com/mp/appmsgalbum?__biz=MzA&album_id=7"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PdfCache(str(tmp_path / "cache.db"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def crawler(cache):
+    return WebCrawler(cache=cache, incremental=True)
+
+
+def saved(cache, url, path, fingerprint, data=b"old"):
+    with open(path, "wb") as f:
+        f.write(data)
+    cache.store(url, "Title", path, fingerprint, validators={"etag": '"v1"'})
+    return path
+
+
+def test_new_file(crawler, tmp_path):
+    assert crawler.resolve_output_path(ARTICLE, str(tmp_path), "Title", "h1") == \
+        (str(tmp_path / "Title.pdf"), False)
+
+
+def test_existing_file_reused_without_refresh(crawler, cache, tmp_path):
+    path = saved(cache, ARTICLE, str(tmp_path / "Title.pdf"), "h1")
+    assert crawler.resolve_output_path(ARTICLE, str(tmp_path), "Title", "h2") == (path, True)
+
+
+def test_changed_article_overwritten_on_refresh(crawler, cache, tmp_path):
+    path = saved(cache, ARTICLE, str(tmp_path / "Title.pdf"), "h1")
+    assert crawler.resolve_output_path(ARTICLE, str(tmp_path), "Title", "h2", refresh=True) == (path, False)
+
+
+def test_unchanged_article_reused_on_refresh(crawler, cache, tmp_path):
+    path = saved(cache, ARTICLE, str(tmp_path / "Title.pdf"), "h1")
+    assert crawler.resolve_output_path(ARTICLE, str(tmp_path), "Title", "h1", refresh=True) == (path, True)
+
+
+def test_index_page_overwritten_on_refresh(crawler, cache, tmp_path):
+    path = saved(cache, INDEX, str(tmp_path / "Title.pdf"), None)
+    assert crawler.resolve_output_path(INDEX, str(tmp_path), "Title", None, refresh=True) == (path, False)
+
+
+def test_refresh_never_overwrites_another_page(crawler, cache, tmp_path):
+    path = saved(cache, OTHER, str(tmp_path / "Title.pdf"), None)
+    assert crawler.resolve_output_path(ARTICLE, str(tmp_path), "Title", None, refresh=True) == (path, True)
+
+
+def test_same_title_other_article_gets_suffix(crawler, cache, tmp_path):
+    saved(cache, OTHER, str(tmp_path / "Title.pdf"), "h1")
+    path, reused = crawler.resolve_output_path(ARTICLE, str(tmp_path), "Title", "h2abcdef99")
+    assert (path, reused) == (str(tmp_path / "Title_h2abcdef.pdf"), False)
+
+
+def test_capture_ownership_follows_primary_file(cache, tmp_path):
+    crawler = WebCrawler(cache=cache, incremental=True, output_format="both")
+    saved(cache, ARTICLE, str(tmp_path / "Title.pdf"), "h1")
+    mhtml = tmp_path / "Title.mhtml"
+    mhtml.write_text("old")
+    assert crawler.resolve_output_path(ARTICLE, str(tmp_path), "Title", "h2", "mhtml", refresh=True) == \
+        (str(mhtml), False)
+
+
+def test_same_content_hard_linked(crawler, cache, tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    saved(cache, ARTICLE, str(tmp_path / "a" / "Title.pdf"), "h1")
+    path, reused = crawler.resolve_output_path(ARTICLE + "&scene=1", str(tmp_path / "b"), "Title", "h1")
+    assert reused and os.path.samefile(path, tmp_path / "a" / "Title.pdf")
+
+
+def test_overwrite_does_not_touch_hard_links(tmp_path):
+    original = tmp_path / "a.pdf"
+    linked = tmp_path / "b.pdf"
+    original.write_bytes(b"old")
+    os.link(original, linked)
+    digest, size = write_pdf(str(original), base64.b64encode(b"new content").decode())
+    assert original.read_bytes() == b"new content" and size == 11
+    assert linked.read_bytes() == b"old"
+    assert not os.path.exists(str(original) + ".part")
+
+
+def test_cache_lookup_by_kind(cache, tmp_path):
+    saved(cache, ARTICLE, str(tmp_path / "Title.mhtml"), "h1")
+    assert cache.lookup(ARTICLE, "pdf") is None
+    entry = cache.lookup(ARTICLE + "&chksm=1", "mhtml")
+    assert entry["pdf_path"] == str(tmp_path / "Title.mhtml") and entry["etag"] == '"v1"'
+
+
+def test_cache_store_replaces_validators(cache, tmp_path):
+    path = saved(cache, ARTICLE, str(tmp_path / "Title.pdf"), "h1")
+    cache.store(ARTICLE, "Title", path, "h2", validators={"etag": '"v2"', "body_hash": "b2"})
+    entry = cache.lookup(ARTICLE)
+    assert (entry["content_hash"], entry["etag"], entry["body_hash"]) == ("h2", '"v2"', "b2")
@@ -0,0 +1,90 @@
+"""manifest.py：登记、失效记录、索引重建和导出"""
+import csv
+import json
+import os
+import sys
+
+import pytest
+
+import manifest as manifest_cli
+from manifest import INDEX_NAME, Manifest
+
+ARTICLE = "https://mp.weixin.qq.com/s?__biz=MzA&mid=100&idx=1&sn=abc"
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = Manifest(str(tmp_path))
+    yield manifest
+    manifest.close()
+
+
+def save(root, name, data=b"%PDF-1.4"):
+    path = os.path.join(str(root), name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_has_registered_file(manifest, tmp_path):
+    path = save(tmp_path, "a/文章.pdf")
+    assert not manifest.has(path)
+    entry = manifest.record(path, ARTICLE + "&chksm=ff#rd", "文章", 1, str(tmp_path / "a"))
+    assert entry["path"] == "a/文章.pdf"
+    assert entry["parent"] == "a"
+    assert entry["size"] == 8
+    assert manifest.has(path)
+    assert [row["path"] for row in manifest.find(ARTICLE)] == ["a/文章.pdf"]
+
+
+def test_has_drops_row_of_deleted_file(manifest, tmp_path):
+    path = save(tmp_path, "a/文章.pdf")
+    manifest.record(path, ARTICLE, "文章")
+    os.remove(path)
+    assert not manifest.has(path)
+    assert manifest.get(path) is None
+    # 删除标记写入 JSON Lines，重建后记录不会复活
+    assert manifest.rebuild() == 0
+
+
+def test_rebuild_replays_jsonl(tmp_path):
+    manifest = Manifest(str(tmp_path))
+    first = save(tmp_path, "a.pdf")
+    second = save(tmp_path, "b.pdf")
+    manifest.record(first, ARTICLE, "a")
+    manifest.record(second, None, "b")
+    manifest.remove(first)
+    manifest.close()
+    with open(tmp_path / ".manifest.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"path": "c.pdf", "kind"')  # 写入中断留下的不完整行
+
+    os.remove(tmp_path / INDEX_NAME)
+    manifest = Manifest(str(tmp_path))  # 索引丢失时由 JSON Lines 重建
+    try:
+        assert manifest.get(first) is None
+        assert manifest.get(second)["title"] == "b"
+        assert manifest.rebuild() == 1
+    finally:
+        manifest.close()
+
+
+def test_export(tmp_path, monkeypatch, capsys):
+    manifest = Manifest(str(tmp_path))
+    manifest.record(save(tmp_path, "a.pdf"), ARTICLE, "a", 0)
+    manifest.record(save(tmp_path, "a.html", b"<html>"), ARTICLE, "a", 0)
+    manifest.close()
+
+    monkeypatch.setattr(sys, "argv", ["manifest.py", "--root", str(tmp_path), "export"])
+    assert manifest_cli.main() == 0
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [row["path"] for row in rows] == ["a.pdf", "a.html"]
+    assert {row["kind"] for row in rows} == {"pdf", "html"}
+
+    out = tmp_path / "manifest.csv"
+    monkeypatch.setattr(sys, "argv", ["manifest.py", "--root", str(tmp_path), "export", "-f", "csv", "-o", str(out)])
+    assert manifest_cli.main() == 0
+    with open(out, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["path"] for row in rows] == ["a.pdf", "a.html"]
+    assert rows[0]["article_id"] == rows[1]["article_id"] != ""
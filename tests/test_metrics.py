@@ -0,0 +1,42 @@
+"""metrics.py：百分位数和运行汇总"""
+import json
+
+from metrics import Instrumentation, percentile
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 11))
+    assert percentile(values, 50) == 5
+    assert percentile(values, 30) == 3
+    assert percentile(values, 95) == 10
+    assert percentile(values, 0) == 1
+    assert percentile([1, 2], 50) == 1
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) == 0.0
+
+
+def test_summary_stats(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    metrics = Instrumentation(str(path))
+    metrics.durations["page_load"] = [0.1 * i for i in range(1, 21)]
+    metrics.page_done("https://example.com/a", 0, bytes_written=100)
+    metrics.page_done("https://example.com/b", 1, bytes_written=50)
+    metrics.failure("https://example.com/c", 1, "TimeoutException")
+    metrics.retry("https://example.com/c", 1, "network", 1, 0.5)
+
+    summary = metrics.summary()
+    page_load = summary["stages"]["page_load"]
+    assert page_load["count"] == 20
+    assert page_load["p50"] == 1.0
+    assert page_load["p95"] == 1.9
+    assert page_load["p99"] == 2.0
+    assert page_load["total"] == 21.0
+    assert summary["pages"] == 2
+    assert summary["bytes_written"] == 150
+    assert summary["failures"] == {"TimeoutException": 1}
+    assert summary["retries"] == {"network": 1}
+    assert "page_load" in metrics.format_summary(summary)
+
+    metrics.close()
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [record["event"] for record in records] == ["page", "page", "failure", "retry", "summary"]
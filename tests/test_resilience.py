@@ -0,0 +1,112 @@
+"""resilience.py：错误分类、重试退避和按主机熔断"""
+import pytest
+
+import resilience
+from resilience import CLOSED, CRASH, HALF_OPEN, NETWORK, OPEN, THROTTLED, TIMEOUT, HostGuard, RetryPolicy, \
+    Throttled, classify_error
+
+URL = "https://mp.weixin.qq.com/s?__biz=MzA&mid=100&idx=1&sn=abc"
+
+
+class MaxRetryError(Exception):
+    pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_classify_errors():
+    assert classify_error(Throttled("访问过于频繁")) == THROTTLED
+    assert classify_error(Exception("tab crashed")) == CRASH
+    assert classify_error(Exception("Timed out receiving message from renderer")) == TIMEOUT
+    assert classify_error(Exception("unknown error: net::ERR_CONNECTION_REFUSED")) == NETWORK
+    assert classify_error(ValueError("bad title")) is None
+
+
+def test_refused_connection_is_network_unless_chromedriver():
+    site = MaxRetryError("HTTPSConnectionPool(host='example.com', port=443): Max retries exceeded with url: /a "
+                         "(Caused by NewConnectionError('Failed to establish a new connection: "
+                         "[Errno 111] Connection refused'))")
+    assert classify_error(site) == NETWORK
+    assert classify_error(ConnectionRefusedError(111, "Connection refused")) == NETWORK
+    driver = MaxRetryError("HTTPConnectionPool(host='localhost', port=54321): Max retries exceeded with url: "
+                           "/session/abc/url (Caused by NewConnectionError('Failed to establish a new connection: "
+                           "[Errno 111] Connection refused'))")
+    assert classify_error(driver) == CRASH
+
+
+def test_retry_policy_backoff_bounds():
+    policy = RetryPolicy(retries=3, base_delay=2.0, max_delay=10.0)
+    for attempt, ceiling in enumerate([2.0, 4.0, 8.0, 10.0, 10.0]):
+        for _ in range(50):
+            assert ceiling / 2 <= policy.delay(attempt) <= ceiling
+    assert policy.should_retry(NETWORK, 2)
+    assert not policy.should_retry(NETWORK, 3)
+    assert not policy.should_retry(None, 0)
+
+
+def test_host_guard_spaces_requests(clock):
+    guard = HostGuard(min_interval=2.0)
+    assert guard.reserve(URL) == 0
+    assert guard.reserve(URL) == pytest.approx(2.0)
+    assert guard.reserve("https://example.com/") == 0  # 其他主机不受影响
+    clock.now += 2.0
+    assert guard.reserve(URL) == 0
+
+
+def test_host_guard_circuit_breaker(clock):
+    guard = HostGuard(failure_threshold=2, cooldown=30.0)
+    host = HostGuard.host_of(URL)
+    assert guard.reserve(URL) == 0
+    guard.failure(URL, NETWORK)
+    guard.failure(URL, CRASH)  # 与主机无关的错误不计入熔断
+    assert guard.summary()[host]["state"] == CLOSED
+    guard.failure(URL, TIMEOUT)
+    assert guard.summary()[host]["state"] == OPEN
+    assert guard.reserve(URL) == pytest.approx(30.0)
+
+    # 冷却结束后半开，只放行一个试探请求
+    clock.now += 30.0
+    assert guard.reserve(URL) == 0
+    assert guard.summary()[host]["state"] == HALF_OPEN
+    assert guard.reserve(URL) > 0
+
+    # 试探失败，冷却时间加倍
+    guard.failure(URL, NETWORK)
+    assert guard.summary()[host]["state"] == OPEN
+    assert guard.reserve(URL) == pytest.approx(60.0)
+
+    clock.now += 60.0
+    assert guard.reserve(URL) == 0
+    guard.success(URL)
+    summary = guard.summary()[host]
+    assert summary["state"] == CLOSED
+    assert summary["trips"] == 2
+    assert guard.reserve(URL) == 0
+
+
+def test_host_guard_slows_down_when_throttled(clock):
+    guard = HostGuard(min_interval=0.0, failure_threshold=0)
+    host = HostGuard.host_of(URL)
+    guard.reserve(URL)
+    guard.failure(URL, THROTTLED)
+    guard.failure(URL, THROTTLED)
+    summary = guard.summary()[host]
+    assert summary["interval"] == 2.0
+    assert summary["throttled"] == 2
+    assert summary["state"] == CLOSED  # 阈值为0时不熔断
+    assert guard.reserve(URL) == pytest.approx(2.0)
+    guard.success(URL)
+    assert guard.summary()[host]["interval"] == 1.6